@@ -0,0 +1,64 @@
+"""
+Benchmark for how long starting the TUI takes to import, and which of the
+slow modules it pulls in before the first form is shown
+
+    python2.7 benchmarks/bench_startup.py [runs]
+"""
+import subprocess
+import sys
+
+# imported by the forms and the api, none of them is needed to show MAIN
+HEAVY = ('docker', 'vent.api.actions', 'vent.api.plugins',
+         'vent.menus.add', 'vent.menus.inventory_forms', 'vent.menus.logs',
+         'vent.menus.tools')
+
+# python2 has no -X importtime, so the child times each import itself
+CHILD = """
+import sys
+import time
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+real_import = builtins.__import__
+times = {}
+depth = [0]
+def timed_import(name, *args, **kwargs):
+    depth[0] += 1
+    start = time.time()
+    try:
+        return real_import(name, *args, **kwargs)
+    finally:
+        depth[0] -= 1
+        if name.startswith('vent') or depth[0] == 0:
+            times[name] = times.get(name, 0) + time.time() - start
+builtins.__import__ = timed_import
+start = time.time()
+import vent.menu
+total = time.time() - start
+builtins.__import__ = real_import
+print(total)
+print(' '.join(name for name in %r if name in sys.modules))
+for name, took in sorted(times.items(), key=lambda item: -item[1])[:10]:
+    print('%%s %%f' %% (name, took))
+""" % (HEAVY,)
+
+
+def run():
+    output = subprocess.check_output([sys.executable, '-c', CHILD])
+    lines = output.decode('utf-8').splitlines()
+    imports = [line.rsplit(' ', 1) for line in lines[2:]]
+    return float(lines[0]), lines[1].split(), imports
+
+
+def main(runs=5):
+    results = [run() for _ in range(runs)]
+    best = min(result[0] for result in results)
+    print('import vent.menu: best of {0} {1:.1f}ms'.format(runs, best * 1000))
+    print('slow modules imported: ' + (', '.join(results[0][1]) or 'none'))
+    for name, took in results[0][2]:
+        print('  {0:40} {1:.1f}ms'.format(name, float(took) * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
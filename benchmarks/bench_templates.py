@@ -0,0 +1,101 @@
+"""
+Micro-benchmarks for Template.constrained_sections and for loading the
+routing table of a large manifest
+
+    python2.7 benchmarks/bench_templates.py [sections]
+"""
+import shutil
+import sys
+import tempfile
+import timeit
+
+from os.path import join
+
+from vent.api.templates import invalidate
+from vent.api.templates import manifest_routes
+from vent.api.templates import Template
+
+
+def scan(template, constraints, options):
+    """ The previous implementation, scans every section per constraint """
+    sections = {}
+    for a_section in template.sections()[1]:
+        include = True
+        for constraint in constraints:
+            result = template.option(a_section, constraint)
+            if not result[0] or result[1] != constraints[constraint]:
+                include = False
+            if (result[0] and constraint == 'groups' and
+                    constraints[constraint] in result[1]):
+                include = True
+        if include:
+            sections[a_section] = {}
+            for option in options:
+                result = template.option(a_section, option)
+                if result[0]:
+                    sections[a_section][option] = result[1]
+    return sections
+
+
+def routes(path):
+    """ Compares parsing the manifest per job with loading its snapshot """
+    template = Template(template=path)
+    template.set_option(template.sections()[1][0], 'settings',
+                        '{"ext_types": "pcap"}')
+    template.write_config()
+
+    def parse():
+        invalidate(path)
+        manifest = Template(template=path)
+        return manifest.tool_records()
+
+    number = 10
+    old = timeit.timeit(parse, number=number) / number
+    number = 1000
+    new = timeit.timeit(lambda: manifest_routes(path),
+                        number=number) / number
+    print('routes: parse {0:.2f}ms, snapshot {1:.1f}us'.format(
+        old * 1000, new * 1000000))
+
+
+def main(count=5000):
+    tmp = tempfile.mkdtemp()
+    path = join(tmp, 'plugin_manifest.cfg')
+    try:
+        with open(path, 'w') as f:
+            for i in range(count):
+                f.write('[repo' + str(i % 50) + ':tool' + str(i) + ':master'
+                        ':HEAD]\n')
+                f.write('name = tool' + str(i) + '\n')
+                f.write('branch = master\nversion = HEAD\n')
+                f.write('repo = https://github.com/org/repo' + str(i % 50) +
+                        '\n')
+                f.write('enabled = yes\nbuilt = yes\ntype = repository\n')
+                f.write('groups = ' + ('core,files' if i % 10 else 'network') +
+                        '\n')
+        template = Template(template=path)
+        queries = [{'name': 'tool4321', 'branch': 'master',
+                    'version': 'HEAD'},
+                   {'repo': 'https://github.com/org/repo7', 'enabled': 'yes'},
+                   {'groups': 'network', 'built': 'yes'}]
+        options = ['name', 'groups', 'built']
+        for query in queries:
+            assert (template.constrained_sections(constraints=query,
+                                                  options=options) ==
+                    scan(template, query, options))
+        number = 10
+        for query in queries:
+            old = timeit.timeit(lambda: scan(template, query, options),
+                                number=number) / number
+            new = timeit.timeit(lambda: template.constrained_sections(
+                constraints=query, options=options), number=number) / number
+            print('{0}: scan {1:.2f}ms, indexed {2:.2f}ms, {3:.0f}x'.format(
+                sorted(query.keys()), old * 1000, new * 1000,
+                old / max(new, 1e-9)))
+        routes(path)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
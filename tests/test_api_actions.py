@@ -1,6 +1,7 @@
 import os
 
 from vent.api.actions import Action
+from vent.api.templates import Template
 
 def test_startup():
     """
@@ -46,6 +47,10 @@ def test_save_configure():
     with open(instance.p_helper.manifest) as man:
         assert 'testing123' in man.read()
 
+    manifest = Template(instance.p_helper.manifest)
+    base = list(manifest.constrained_sections(
+        constraints={'name': 'elasticsearch'}))[0]
+    base_options = manifest.section(base)[1]
     status = instance.save_configure(name='elasticsearch',
                                      config_val='[docker]\nrandom = instance',
                                      instances=2)
@@ -55,6 +60,14 @@ def test_save_configure():
         man_contents = man.read()
         assert 'random' in man_contents
         assert 'elasticsearch2' in man_contents
+    # the new instance gets the template, the running tool keeps its own
+    manifest = Template(instance.p_helper.manifest)
+    second = base.replace('elasticsearch:', 'elasticsearch2:', 1)
+    assert 'random' in manifest.option(second, 'docker')[1]
+    assert 'random' not in manifest.option(base, 'docker')[1]
+    assert [option for option in manifest.section(base)[1]
+            if option[0] != 'settings'] == \
+        [option for option in base_options if option[0] != 'settings']
 
 def test_remove():
     """ Test the remove function """
@@ -0,0 +1,57 @@
+from vent.api.image_build import ShortId
+from vent.api.image_build import StreamBuild
+
+
+class FakeApi:
+    """ Streams a build's output the way the docker SDK decodes it """
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.built = None
+        self.tagged = []
+
+    def build(self, **kargs):
+        self.built = kargs
+        for chunk in self.chunks:
+            yield chunk
+
+    def tag(self, image, repository, tag=None):
+        self.tagged.append((image, repository, tag))
+
+
+class FakeClient:
+    def __init__(self, chunks):
+        self.api = FakeApi(chunks)
+
+
+def test_short_id():
+    """ Test the ShortId function """
+    assert ShortId('sha256:0123456789abcdef') == '0123456789ab'
+    assert ShortId('0123456789ab') == '0123456789ab'
+
+
+def test_stream_build():
+    """ Test the StreamBuild function """
+    chunks = [{'stream': 'Step 1/2 : FROM alpine\n'},
+              {'stream': ' ---> 3fd9065eaf02\n'},
+              {'stream': 'Step 2/2 : LABEL foo=bar\n'},
+              {'aux': {'ID': 'sha256:0123456789abcdef'}},
+              {'stream': 'Successfully built 0123456789ab\n'}]
+    client = FakeClient(chunks)
+    calls = []
+    status = StreamBuild(client, '/tmp', 'foo:HEAD', labels={'vent': ''},
+                         tags=['foo:abc123'],
+                         progress=lambda *args: calls.append(args))
+    assert status == (True, '0123456789ab')
+    assert client.api.built['labels'] == {'vent': ''}
+    assert client.api.built['decode']
+    assert client.api.tagged == [('0123456789ab', 'foo', 'abc123')]
+    assert [call[1:3] for call in calls] == [(0, 2), (1, 2), (2, 2)]
+    assert len(calls[-1][3]) == 2
+
+    chunks = [{'stream': 'Step 1/1 : FROM missing\n'},
+              {'error': 'pull access denied for missing\n'}]
+    client = FakeClient(chunks)
+    status = StreamBuild(client, '/tmp', 'foo:HEAD')
+    assert not status[0]
+    assert 'pull access denied' in status[1]
+    assert client.api.tagged == []
@@ -0,0 +1,38 @@
+from vent.api.inventory import Inventory
+from vent.api.templates import ToolRecord
+
+
+def test_inventory():
+    """ Test filling the inventory choices in one pass """
+    records = [ToolRecord('cyberreboot:vent:/redis:master:HEAD',
+                          [('name', 'redis'), ('groups', 'core'),
+                           ('repo', 'https://github.com/cyberreboot/vent'),
+                           ('image_name', 'cyberreboot/vent-redis:master'),
+                           ('version', 'HEAD'), ('built', 'yes'),
+                           ('enabled', 'yes')]),
+               ToolRecord('org:plugins:/pcap:master:v1',
+                          [('name', 'pcap'), ('groups', 'pcap,files'),
+                           ('repo', 'https://github.com/org/plugins'),
+                           ('image_name', 'org/plugins-pcap:v1'),
+                           ('version', 'v1'), ('built', 'no'),
+                           ('enabled', 'no')]),
+               ToolRecord('org:plugins:/csv:master:HEAD',
+                          [('name', 'csv'),
+                           ('repo', 'https://github.com/org/plugins')])]
+    containers = [('cyberreboot-vent-redis-master', 'running'),
+                  ('org-plugins-pcap-v1', 'exited')]
+    items = Inventory(records, containers, ['repos', 'core', 'tools',
+                                            'running', 'built', 'groups'])
+    assert items['repos'] == ['https://github.com/cyberreboot/vent',
+                              'https://github.com/org/plugins']
+    assert items['core'] == {'cyberreboot:vent:/redis:master:HEAD': 'redis'}
+    assert items['tools'] == {'org:plugins:/pcap:master:v1': 'pcap',
+                              'org:plugins:/csv:master:HEAD': 'csv'}
+    assert items['running'] == {
+        'cyberreboot:vent:/redis:master:HEAD': 'running',
+        'org:plugins:/pcap:master:v1': 'exited',
+        'org:plugins:/csv:master:HEAD': 'not running'}
+    assert items['built']['org:plugins:/pcap:master:v1'] == 'no'
+    assert items['groups']['org:plugins:/pcap:master:v1'] == 'pcap,files'
+    assert items['images'] == {}
+    assert items['enabled'] == {}
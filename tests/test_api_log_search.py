@@ -0,0 +1,107 @@
+from vent.api.log_search import ContainerLines
+from vent.api.log_search import LogCursor
+from vent.api.log_search import LogSearch
+from vent.api.log_search import Matcher
+
+
+class FakeContainer:
+    def __init__(self, name, chunks):
+        self.name = name
+        self.chunks = chunks
+        self.kargs = None
+
+    def logs(self, **kargs):
+        self.kargs = kargs
+        return iter(self.chunks)
+
+
+def test_matcher():
+    """ Test matching any of a list of expressions at once """
+    matches = Matcher(['foo', 'a.b'])
+    assert matches('has foo in it')
+    assert matches('has a.b in it')
+    assert not matches('has axb in it')
+    assert Matcher()('anything')
+
+
+def test_container_lines():
+    """ Test splitting streamed logs into lines """
+    container = FakeContainer('c1', ['first\nsec', 'ond\n', 'third'])
+    assert list(ContainerLines(container, tail=10)) == ['first', 'second',
+                                                        'third']
+    assert container.kargs == {'stream': True, 'follow': False, 'tail': 10}
+
+
+def test_log_search():
+    """ Test searching the logs of several containers """
+    containers = [FakeContainer('c' + str(i),
+                                ['foo ' + str(i) + '\nbar\n', 'baz foo\n'])
+                  for i in range(20)]
+    found = list(LogSearch(containers, grep_list=['foo', 'baz'],
+                           threads=4).results())
+    assert len(found) == 40
+    for i in range(20):
+        lines = [line for name, line in found if name == 'c' + str(i)]
+        assert lines == ['foo ' + str(i), 'baz foo']
+    # the search stops once the results are no longer read
+    results = LogSearch(containers, threads=2).results()
+    assert next(results)
+    results.close()
+    assert list(LogSearch([]).results()) == []
+
+
+class FakeLogs:
+    def __init__(self, name, count):
+        self.name = name
+        # a line every half a second
+        self.lines = [('2017-10-10T12:%02d:%02d.%dZ' % (i // 120,
+                                                        (i // 2) % 60,
+                                                        (i % 2) * 5),
+                       'line ' + str(i)) for i in range(count)]
+
+    @staticmethod
+    def _seconds(timestamp):
+        return (int(timestamp[14:16]) * 60 + int(timestamp[17:19]) +
+                int(timestamp[20]) / 10.0)
+
+    def logs(self, stream=False, follow=False, timestamps=False, since=None,
+             until=None, tail='all'):
+        lines = self.lines
+        if since is not None:
+            lines = [line for line in lines if
+                     self._seconds(line[0]) >= since - 1507636800]
+        if until is not None:
+            lines = [line for line in lines if
+                     self._seconds(line[0]) <= until - 1507636800]
+        if tail != 'all':
+            lines = lines[-tail:] if tail else []
+        return iter([timestamp + ' ' + text + '\n'
+                     for timestamp, text in lines])
+
+
+def test_log_cursor():
+    """ Test paging through the logs of a container """
+    container = FakeLogs('c1', 25)
+    cursor = LogCursor(container, page=10, window=15)
+    assert cursor.text() == []
+    assert cursor.tail() == ['line ' + str(i) for i in range(15, 25)]
+    assert not cursor.complete
+    assert cursor.older() == 10
+    assert cursor.text() == ['line ' + str(i) for i in range(5, 20)]
+    assert cursor.older() == 5
+    assert cursor.complete
+    assert cursor.text() == ['line ' + str(i) for i in range(0, 15)]
+    assert cursor.older() == 0
+    # lines are added right after the last line in the window, a page at a
+    # time, so none are skipped even though the window was moved back
+    container.lines = FakeLogs('c1', 30).lines
+    assert cursor.newer() == ['line ' + str(i) for i in range(15, 25)]
+    assert cursor.text() == ['line ' + str(i) for i in range(10, 25)]
+    assert not cursor.complete
+    assert cursor.newer() == ['line ' + str(i) for i in range(25, 30)]
+    assert cursor.text() == ['line ' + str(i) for i in range(15, 30)]
+    assert cursor.newer() == []
+    # the page before the window is fetched on its own
+    container.lines = FakeLogs('c1', 100).lines
+    assert cursor.older() == 10
+    assert cursor.text() == ['line ' + str(i) for i in range(5, 20)]
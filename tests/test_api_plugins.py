@@ -1,7 +1,10 @@
 import os
+import threading
+import time
 
 from vent.api.plugins import Plugin
 from vent.api.templates import Template
+from vent.helpers.logs import Logger
 
 def test_add():
     """ Test the add function """
@@ -109,3 +112,44 @@ def test_update():
     status = instance.update()
     assert isinstance(status, tuple)
     assert status[0] == False
+
+def test_run_image_jobs():
+    """ Test the _run_image_jobs function """
+    instance = Plugin()
+    jobs = [{'build': False, 'section': str(i)} for i in range(10)]
+    results = instance._run_image_jobs(jobs)
+    assert results == [{'built': 'no', 'status': True}] * 10
+
+class StubBuilds(Plugin):
+    """ Plugin whose builds finish in reverse order, some of them failing """
+    def __init__(self):
+        self.logger = Logger(__name__)
+        self.finished = []
+        self.lock = threading.Lock()
+
+    def _build_workers(self):
+        return 4
+
+    def _run_image_job(self, job):
+        time.sleep(0.01 * (4 - job['index'] % 4))
+        with self.lock:
+            self.finished.append(job['index'])
+        if job['index'] % 3 == 0:
+            raise RuntimeError('build ' + str(job['index']) + ' broke')
+        return {'built': 'yes', 'image_id': str(job['index']),
+                'status': True}
+
+def test_run_image_jobs_out_of_order():
+    """ Test that builds keep their job's place and fail on their own """
+    instance = StubBuilds()
+    jobs = [{'section': str(i), 'index': i} for i in range(8)]
+    results = instance._run_image_jobs(jobs)
+    assert instance.finished != sorted(instance.finished)
+    assert sorted(instance.finished) == list(range(8))
+    for i, result in enumerate(results):
+        if i % 3 == 0:
+            assert result == {'built': 'failed',
+                              'status': (False, 'build ' + str(i) + ' broke')}
+        else:
+            assert result == {'built': 'yes', 'image_id': str(i),
+                              'status': True}
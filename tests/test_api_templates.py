@@ -1,3 +1,6 @@
+import os
+
+from vent.api.templates import manifest_routes
 from vent.api.templates import Template
 
 def test_options():
@@ -34,3 +37,324 @@ def test_set_option():
     """ Test the set_option function """
     instance = Template()
     instance.set_option('bad', 'x', 'x')
+
+def test_cached_template(tmpdir):
+    """ Test that unchanged templates are parsed once and copied on write """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nbar = baz\n')
+    # files modified within the last RACY seconds are parsed every time
+    os.utime(path, (os.path.getmtime(path) - 10,) * 2)
+    first = Template(template=path)
+    second = Template(template=path)
+    assert first.config is second.config
+    first.set_option('foo', 'bar', 'changed')
+    assert first.config is not second.config
+    assert second.option('foo', 'bar') == (True, 'baz')
+    first.write_config()
+    third = Template(template=path)
+    assert third.option('foo', 'bar') == (True, 'changed')
+    assert third.config is not second.config
+
+def test_constrained_sections(tmpdir):
+    """ Test that indexed constrained_sections matches a full scan """
+    def scan(template, constraints):
+        found = set()
+        for section in template.config.sections():
+            include = True
+            for option in constraints:
+                if (not template.config.has_option(section, option) or
+                        template.config.get(section, option) !=
+                        constraints[option]):
+                    include = False
+                if (option == 'groups' and
+                        template.config.has_option(section, option) and
+                        constraints[option] in
+                        template.config.get(section, option)):
+                    include = True
+            if include:
+                found.add(section)
+        return found
+
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        for i in range(20):
+            f.write('[tool' + str(i) + ']\n')
+            f.write('name = tool' + str(i % 5) + '\n')
+            f.write('enabled = ' + ('yes' if i % 2 else 'no') + '\n')
+            f.write('groups = ' + ('core,files' if i % 3 else 'network'))
+            f.write('\n')
+    instance = Template(template=path)
+    queries = [{}, {'name': 'tool1'}, {'enabled': 'yes', 'name': 'tool2'},
+               {'groups': 'core'}, {'groups': 'work'},
+               {'groups': 'core', 'enabled': 'no'}, {'running': 'yes'}]
+
+    def check():
+        for query in queries:
+            sections = instance.constrained_sections(constraints=query,
+                                                     options=['name'])
+            assert set(sections) == scan(instance, query)
+
+    check()
+    instance.set_option('tool1', 'groups', 'network')
+    instance.set_option('tool3', 'running', 'yes')
+    instance.add_option('tool20', 'name', 'tool1')
+    instance.del_section('tool4')
+    instance.del_option('tool5', 'enabled')
+    check()
+    status = instance.group_members('network')
+    assert status[0]
+    assert 'tool1' in status[1] and 'tool3' in status[1]
+    assert (set(Template(template=path).constrained_sections(
+        constraints={'name': 'tool1'})) !=
+        set(instance.constrained_sections(constraints={'name': 'tool1'})))
+
+def test_racy_template(tmpdir):
+    """ Test that a same size rewrite within one mtime tick is noticed """
+    path = str(tmpdir.join('vent.template'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nbar = baz\n')
+    stat = os.stat(path)
+    assert Template(template=path).option('foo', 'bar') == (True, 'baz')
+    with open(path, 'r+') as f:
+        f.write('[foo]\nbar = qux\n')
+    os.utime(path, (stat.st_atime, stat.st_mtime))
+    assert Template(template=path).option('foo', 'bar') == (True, 'qux')
+
+
+def test_template_lock_files(tmpdir):
+    """ Test that writing a plugin's template leaves no files next to it """
+    path = str(tmpdir.join('vent.template'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nbar = baz\n')
+    template = Template(template=path)
+    template.set_option('foo', 'bar', 'changed')
+    template.write_config()
+    assert [f.basename for f in tmpdir.listdir()] == ['vent.template']
+    assert Template(template=path).option('foo', 'bar') == (True, 'changed')
+
+
+def test_transaction(tmpdir):
+    """ Test that transactions write once and writers don't lose changes """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nbar = baz\n[other]\nrunning = no\n')
+    first = Template(template=path)
+    second = Template(template=path)
+    with first.transaction():
+        for i in range(5):
+            first.set_option('foo', 'bar', str(i))
+            first.write_config()
+        assert Template(template=path).option('foo', 'bar') == (True, 'baz')
+    assert Template(template=path).option('foo', 'bar') == (True, '4')
+    # second was read before first wrote, its changes are merged with first's
+    second.set_option('other', 'running', 'yes')
+    second.del_option('foo', 'missing')
+    second.write_config()
+    third = Template(template=path)
+    assert third.option('foo', 'bar') == (True, '4')
+    assert third.option('other', 'running') == (True, 'yes')
+    assert [f for f in tmpdir.listdir()
+            if f.basename.startswith('.plugin_manifest.cfg')] == []
+
+def test_sqlite_manifest(tmpdir):
+    """ Test the sqlite backend for the plugin manifest """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nname = foo\nrunning = no\n')
+    with open(str(tmpdir.join('vent.cfg')), 'w') as f:
+        f.write('[main]\nmanifest_backend = sqlite\n')
+    first = Template(template=path)
+    second = Template(template=path)
+    assert tmpdir.join('plugin_manifest.db').check()
+    assert first.option('foo', 'running') == (True, 'no')
+    first.set_option('foo', 'running', 'yes')
+    first.write_config()
+    # second was loaded before first committed, its changes are merged
+    second.add_option('bar', 'name', 'bar')
+    second.write_config()
+    third = Template(template=path)
+    assert third.option('foo', 'running') == (True, 'yes')
+    assert third.constrained_sections(constraints={'name': 'bar'}) == \
+        {'bar': {}}
+    # the manifest file is kept up to date for readers of the INI format
+    with open(str(tmpdir.join('vent.cfg')), 'w') as f:
+        f.write('[main]\n')
+    ini = Template(template=path)
+    assert ini.option('foo', 'running') == (True, 'yes')
+    assert ini.option('bar', 'name') == (True, 'bar')
+    # workers route from the snapshot or the file, never the database
+    assert tmpdir.join('plugin_manifest.snapshot').check()
+    with open(str(tmpdir.join('vent.cfg')), 'w') as f:
+        f.write('[main]\nmanifest_backend = sqlite\n')
+    for name in ['plugin_manifest.db', 'plugin_manifest.db-wal',
+                 'plugin_manifest.db-shm', 'plugin_manifest.snapshot']:
+        if tmpdir.join(name).check():
+            tmpdir.join(name).remove()
+    assert manifest_routes(path)['manifest'] is not None
+    assert not tmpdir.join('plugin_manifest.db').check()
+
+def test_tool_records(tmpdir):
+    """ Test that tool records are decoded once per version """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nname = foo\nrunning = yes\n')
+        f.write('docker = {"links": "{\\"Redis\\": \\"redis\\"}"}\n')
+        f.write('settings = {"instances": "2"}\ngpu = bad\n')
+    os.utime(path, (os.path.getmtime(path) - 10,) * 2)
+    first = Template(template=path)
+    record = first.tool_records()['foo']
+    assert record.name == 'foo'
+    assert record.running == 'yes'
+    assert record.links == ('Redis',)
+    assert record.settings == {'instances': '2'}
+    assert record.gpu is None
+    assert record.service is None
+    assert Template(template=path).tool_records(['foo'])['foo'] is record
+    first.set_option('foo', 'running', 'no')
+    assert first.tool_records()['foo'].running == 'no'
+    assert Template(template=path).tool_records()['foo'] is record
+
+def test_refresh(tmpdir):
+    """ Test that refresh applies changes from the manifest journal """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[foo]\nname = foo\nrunning = no\n[bar]\nname = bar\n')
+    reader = Template(template=path)
+    assert reader.refresh() == (True, False)
+    assert reader.constrained_sections(constraints={'running': 'no'}) == \
+        {'foo': {}}
+    writer = Template(template=path)
+    writer.set_option('foo', 'running', 'yes')
+    writer.del_section('bar')
+    writer.add_option('baz', 'name', 'baz')
+    writer.write_config()
+    reader.add_option('foo', 'local', 'yes')
+    assert reader.refresh() == (True, True)
+    assert reader.option('foo', 'running') == (True, 'yes')
+    assert reader.option('foo', 'local') == (True, 'yes')
+    assert not reader.section('bar')[0]
+    assert reader.constrained_sections(constraints={'running': 'yes'}) == \
+        {'foo': {}}
+    assert set(reader.constrained_sections(constraints={})) == \
+        set(['foo', 'baz'])
+    assert reader.refresh() == (True, False)
+    # compacting the journal makes readers read the manifest again
+    journal = tmpdir.join('plugin_manifest.journal')
+    journal.write('{"epoch": "new"}\n')
+    assert reader.refresh() == (True, True)
+    assert reader.option('foo', 'local') == (True, 'yes')
+    assert reader.option('baz', 'name') == (True, 'baz')
+
+def test_instances(tmpdir):
+    """ Test that instance sections only store what they override """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[org:repo:/tool:master:HEAD]\nname = tool\nrunning = yes\n')
+        f.write('image_id = abc\nsettings = {"instances": "3"}\n')
+    base = 'org:repo:/tool:master:HEAD'
+    second = 'org:repo:/tool2:master:HEAD'
+    third = 'org:repo:/tool3:master:HEAD'
+    instance = Template(template=path)
+    assert instance.constrained_sections(constraints={'image_id': 'abc'}) == \
+        {base: {}}
+    assert instance.add_instance(second, base, 'tool2') == (True, second)
+    assert instance.add_instance(third, base, 'tool3') == (True, third)
+    assert instance.add_instance(third, base, 'tool3')[0] is False
+    assert instance.option(second, 'image_id') == (True, 'abc')
+    assert instance.option(second, 'running') == (True, 'no')
+    assert instance.overrides(second) == \
+        (True, ['inherits', 'name', 'running'])
+    assert instance.tool_records([second])[second].settings == \
+        {'instances': '3'}
+    instance.set_option(base, 'image_id', 'def')
+    assert instance.constrained_sections(constraints={'image_id': 'def'},
+                                         options=['name']) == \
+        {base: {'name': 'tool'}, second: {'name': 'tool2'},
+         third: {'name': 'tool3'}}
+    assert instance.tool_records([second])[second].name == 'tool2'
+    instance.write_config()
+    with open(path) as f:
+        assert f.read().count('image_id') == 1
+    reread = Template(template=path)
+    assert reread.option(third, 'image_id') == (True, 'def')
+    # removing the base keeps what instances inherited
+    reread.rename_section(second, 'org:repo:/tool9:master:HEAD')
+    assert reread.option('org:repo:/tool9:master:HEAD', 'inherits') == \
+        (True, base)
+    reread.del_section(base)
+    assert reread.option(third, 'image_id') == (True, 'def')
+    assert not reread.option(third, 'inherits')[0]
+    assert reread.constrained_sections(constraints={'image_id': 'def'},
+                                       options=['name']) == \
+        {'org:repo:/tool9:master:HEAD': {'name': 'tool2'},
+         third: {'name': 'tool3'}}
+
+def test_manifest_routes(tmpdir):
+    """ Test the routing table compiled from the plugin manifest """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    instance = Template(template=path)
+    instance.add_section('org:repo:/pcap:master:HEAD')
+    instance.set_option('org:repo:/pcap:master:HEAD', 'link_name', 'pcap')
+    instance.set_option('org:repo:/pcap:master:HEAD', 'image_name',
+                        'org/pcap:HEAD')
+    instance.set_option('org:repo:/pcap:master:HEAD', 'settings',
+                        '{"ext_types": "pcap,pcapng"}')
+    instance.set_option('org:repo:/pcap:master:HEAD', 'docker',
+                        '{"links": "{\'redis\': \'redis\'}", '
+                        '"environment": "[\'A=1\']"}')
+    instance.add_section('org:repo:/redis:master:HEAD')
+    instance.set_option('org:repo:/redis:master:HEAD', 'link_name', 'redis')
+    instance.set_option('org:repo:/redis:master:HEAD', 'image_name',
+                        'org/redis:HEAD')
+    instance.write_config()
+    assert os.path.exists(str(tmpdir.join('plugin_manifest.snapshot')))
+    routes = manifest_routes(path)
+    assert routes['manifest'] is not None
+    assert routes['extensions'] == [('pcap', [0]), ('pcapng', [0])]
+    assert len(routes['tools']) == 1
+    tool = routes['tools'][0]
+    assert tool['process_base']
+    assert tool['docker'] == {'links': {'org-redis-HEAD': 'redis'},
+                              'environment': ['A=1']}
+    # the snapshot is replaced on every write
+    instance.set_option('org:repo:/redis:master:HEAD', 'settings',
+                        '{"ext_types": "log", "process_base": "no"}')
+    instance.write_config()
+    routes = manifest_routes(path)
+    assert routes['extensions'] == [('log', [1]), ('pcap', [0]),
+                                    ('pcapng', [0])]
+    assert not routes['tools'][1]['process_base']
+    # a manifest written without a snapshot is compiled from the file
+    with open(path, 'a') as f:
+        f.write('\n[org:repo:/csv:master:HEAD]\nimage_name = org/csv\n'
+                'settings = {"ext_types": "csv"}\n')
+    routes = manifest_routes(path)
+    assert ('csv', [2]) in routes['extensions']
+
+def test_dependency_graph(tmpdir):
+    """ Test the graph of which tools need which others """
+    path = str(tmpdir.join('plugin_manifest.cfg'))
+    with open(path, 'w') as f:
+        f.write('[redis]\nlink_name = redis\n')
+        f.write('[rq]\nlink_name = rq\n')
+        f.write('docker = {"links": "{\\"redis\\": \\"redis\\"}"}\n')
+        f.write('[worker]\nlink_name = worker\n')
+        f.write('docker = {"volumes_from": "[\'rq:ro\']"}\n')
+        f.write('[tap]\nlink_name = tap\n')
+        f.write('docker = {"network_mode": "container:redis"}\n')
+        f.write('[other]\nlink_name = other\n')
+    instance = Template(template=path)
+    graph = instance.dependency_graph()
+    assert graph.sections(['redis']) == set(['redis'])
+    assert graph.dependents(['redis']) == set(['rq', 'worker', 'tap'])
+    assert graph.dependents(['rq']) == set(['worker'])
+    assert graph.dependents(['other']) == set()
+    assert graph.levels(['worker', 'tap', 'rq', 'redis']) == [
+        ['redis'], ['rq', 'tap'], ['worker']]
+    assert instance.dependency_graph() is graph
+    instance.set_option('other', 'docker',
+                        '{"links": "{\\"tap\\": \\"tap\\"}"}')
+    graph = instance.dependency_graph()
+    assert graph.dependents(['redis']) == set(['rq', 'worker', 'tap',
+                                               'other'])
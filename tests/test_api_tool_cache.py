@@ -0,0 +1,31 @@
+import shlex
+
+from subprocess import check_call
+
+from vent.api.tool_cache import ToolCache
+
+
+def git(path, command):
+    check_call(shlex.split('git -C ' + path + ' -c user.name=vent '
+                           '-c user.email=vent@localhost ' + command))
+
+
+def test_tool_cache(tmpdir):
+    """ Test that found tools are kept until the repo's commit changes """
+    repo_path = str(tmpdir.mkdir('repo'))
+    git(repo_path, 'init -q')
+    tmpdir.join('repo', 'Dockerfile').write('FROM alpine\n')
+    git(repo_path, 'add Dockerfile')
+    git(repo_path, 'commit -q -m first')
+    git(repo_path, 'branch -M master')
+    cache = ToolCache(str(tmpdir.join('tool_cache.json')))
+    repo = 'https://github.com/org/repo'
+    assert ToolCache.commit(repo_path)
+    assert ToolCache.commit(str(tmpdir)) is None
+    assert cache.get(repo, repo_path) is None
+    cache.put(repo, repo_path, [('', 'HEAD')])
+    assert cache.get(repo, repo_path) == [('', 'HEAD')]
+    assert cache.get(repo, repo_path, groups='core') is None
+    assert cache.get(repo, repo_path, branch='other') is None
+    git(repo_path, 'commit -q --allow-empty -m second')
+    assert cache.get(repo, repo_path) is None
@@ -0,0 +1,20 @@
+from vent.helpers.clients import _pool_size
+from vent.helpers.clients import DockerClient
+from vent.helpers.clients import POOL_SIZE
+
+
+def test_docker_client():
+    """ Test that the docker client is shared """
+    d_client = DockerClient()
+    assert d_client is DockerClient()
+    assert d_client.containers.list() is not None
+
+
+def test_pool_size(tmpdir):
+    """ Test reading the pool size from vent.cfg """
+    cfg_file = tmpdir.join('vent.cfg')
+    assert _pool_size(str(cfg_file)) == POOL_SIZE
+    cfg_file.write('[docker]\npool_size = 4\n')
+    assert _pool_size(str(cfg_file)) == 4
+    cfg_file.write('[docker]\npool_size = many\n')
+    assert _pool_size(str(cfg_file)) == POOL_SIZE
@@ -0,0 +1,68 @@
+import time
+
+from vent.helpers.dashboard import StatusAggregator
+
+
+def test_status_aggregator():
+    """ Test that metrics are refreshed in the background at their pace """
+    calls = {'fast': 0, 'slow': 0}
+
+    def fast():
+        calls['fast'] += 1
+        return calls['fast']
+
+    def slow():
+        calls['slow'] += 1
+        return calls['slow']
+
+    def broken():
+        raise ValueError('unavailable')
+
+    aggregator = StatusAggregator({'fast': (fast, 0.01),
+                                   'slow': (slow, 60),
+                                   'broken': (broken, 0.01)})
+    assert aggregator.snapshot() == {}
+    aggregator.start()
+    first = aggregator.snapshot()
+    deadline = time.time() + 5
+    while aggregator.snapshot().get('fast', 0) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    snapshot = aggregator.snapshot()
+    assert snapshot['fast'] >= 3
+    assert snapshot['slow'] == 1
+    assert 'broken' not in snapshot
+    # published snapshots are replaced, never changed
+    assert 'fast' not in first or first['fast'] < snapshot['fast']
+    aggregator.expire('slow')
+    deadline = time.time() + 5
+    while aggregator.snapshot()['slow'] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert aggregator.snapshot()['slow'] == 2
+    aggregator.stop()
+
+
+def test_status_aggregator_together():
+    """ Test that metrics listed together never run at the same time """
+    running = []
+    overlapped = []
+
+    def metric():
+        running.append(1)
+        if len(running) > 1:
+            overlapped.append(1)
+        time.sleep(0.01)
+        running.pop()
+        return True
+
+    aggregator = StatusAggregator({'a': (metric, 0.01), 'b': (metric, 0.01)},
+                                  together=[('a', 'b')])
+    aggregator.start()
+    assert len(aggregator._threads) == 1
+    deadline = time.time() + 5
+    while len(aggregator.snapshot()) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    aggregator.expire('b')
+    time.sleep(0.1)
+    aggregator.stop()
+    assert aggregator.snapshot() == {'a': True, 'b': True}
+    assert not overlapped
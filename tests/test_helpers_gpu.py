@@ -0,0 +1,103 @@
+import BaseHTTPServer
+import json
+import threading
+import time
+
+from vent.helpers.gpu import GpuSampler
+from vent.helpers.gpu import PluginUrl
+from vent.helpers.gpu import ReadInventory
+from vent.helpers.gpu import WriteInventory
+
+
+class PluginHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Stands in for the nvidia-docker-plugin API """
+    responses = {'/v1.0/gpu/info/json':
+                 {'Devices': [{'Memory': {'Global': 12000}, 'Cores': 3072}]},
+                 '/v1.0/gpu/status/json':
+                 {'Devices': [{'Utilization': {'GPU': 5},
+                               'Memory': {'Used': 10}, 'Processes': []}]}}
+
+    def do_GET(self):
+        if self.path not in self.responses:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(self.responses[self.path])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_plugin_url(tmpdir):
+    """ Test resolving the url of the plugin from vent.cfg """
+    cfg_file = tmpdir.join('vent.cfg')
+    cfg_file.write('[nvidia-docker-plugin]\nhost = 10.0.0.1\nport = 1234\n')
+    assert PluginUrl(str(cfg_file)) == 'http://10.0.0.1:1234/v1.0/gpu/'
+
+
+def test_gpu_sampler():
+    """ Test sampling a stand-in plugin into the ring buffer """
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), PluginHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        url = 'http://127.0.0.1:' + str(server.server_port) + '/v1.0/gpu/'
+        sampler = GpuSampler(url, interval=0.01, history=3).start()
+        sample = sampler.latest()
+        assert sample['error'] is None
+        assert sample['info']['Devices'][0]['Cores'] == 3072
+        assert sample['status']['Devices'][0]['Processes'] == []
+        sampler.stop()
+        for _ in range(5):
+            sampler.sample()
+        assert len(sampler.history()) == 3
+        sampler.url = url + 'missing/'
+        assert sampler.sample()['error']
+        assert sampler.latest()['error']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_gpu_sampler_idle():
+    """ Test that sampling stops when nobody reads the samples """
+    server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), PluginHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        url = 'http://127.0.0.1:' + str(server.server_port) + '/v1.0/gpu/'
+        sampler = GpuSampler(url, interval=0.01, idle=0.1).start()
+        assert sampler.latest()['error'] is None
+        deadline = time.time() + 5
+        while sampler._thread is not None and time.time() < deadline:
+            time.sleep(0.01)
+        assert sampler._thread is None
+        # reading again starts sampling again
+        assert sampler.latest()['error'] is None
+        assert sampler._thread is not None
+        sampler.stop()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_inventory(tmpdir):
+    """ Test saving the detected GPUs """
+    path = str(tmpdir.join('gpu_inventory.json'))
+    assert ReadInventory(path) is None
+    WriteInventory(path, (True, 'GPU 0: Tesla K80'))
+    assert ReadInventory(path) == (True, 'GPU 0: Tesla K80')
+    assert ReadInventory(path, ttl=-1) is None
+    # saved before a reboot
+    with open(path) as f:
+        inventory = json.load(f)
+    inventory['host'][0] = 'another-boot'
+    with open(path, 'w') as f:
+        json.dump(inventory, f)
+    assert ReadInventory(path) is None
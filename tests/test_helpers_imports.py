@@ -0,0 +1,12 @@
+from vent.helpers.imports import ImportObject
+from vent.helpers.paths import PathDirs
+
+
+def test_import_object():
+    """ Test the ImportObject function """
+    assert ImportObject('vent.helpers.paths.PathDirs') is PathDirs
+    try:
+        ImportObject('vent.helpers.paths.Missing')
+        assert False
+    except AttributeError:
+        pass
@@ -0,0 +1,41 @@
+import json
+
+from vent.helpers.ledger import JobLedger
+
+
+def run(file_name, plugin, finished_at):
+    return {'FileName': file_name, 'VentPlugin': plugin, 'ID': 'abc',
+            'StartedAt': '2017-10-10T12:00:00Z', 'FinishedAt': finished_at}
+
+
+def test_job_ledger(tmpdir):
+    """ Test recording and counting finished jobs """
+    status = tmpdir.join('status.json')
+    status.write(json.dumps(run('/a', 'one', '2017-10-10T12:00:01.5Z')) +
+                 '\n' +
+                 json.dumps(run('/a', 'two', '2017-10-10T12:00:02Z')) +
+                 '\n')
+    ledger = JobLedger(str(tmpdir.join('jobs.db')))
+    assert ledger.counts() == (0, 0)
+    ledger.import_json(str(status))
+    assert ledger.counts() == (1, 2)
+    # only imported into an empty ledger
+    ledger.import_json(str(status))
+    assert ledger.counts() == (1, 2)
+    added = ledger.record([run('/a', 'one', '2017-10-10T12:00:03Z'),
+                           run('/b', 'one', '2017-10-10T12:00:04Z'),
+                           run('/b', 'one', '2017-10-10T12:00:04Z')])
+    assert [(r['FileName'], r['VentPlugin']) for r in added] == \
+        [('/b', 'one')]
+    assert ledger.counts() == (2, 3)
+    since = 1507636801
+    assert [r['VentPlugin'] for r in ledger.finished(since=since)] == \
+        ['one', 'two', 'one']
+    assert [r['FinishedAt'] for r in
+            ledger.finished(since=since + 1, until=since + 3)] == \
+        ['2017-10-10T12:00:02Z']
+    # pending runs are counted unless they're already recorded
+    assert ledger.counts([run('/a', 'one', '2017-10-10T12:00:05Z'),
+                          run('/b', 'two', '2017-10-10T12:00:05Z'),
+                          run('/c', 'one', '2017-10-10T12:00:05Z')]) == \
+        (3, 5)
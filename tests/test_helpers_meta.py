@@ -8,6 +8,7 @@ from vent.helpers.meta import Containers
 from vent.helpers.meta import Cpu
 from vent.helpers.meta import Docker
 from vent.helpers.meta import Gpu
+from vent.helpers.meta import GpuUsage
 from vent.helpers.meta import Images
 from vent.helpers.meta import Jobs
 from vent.helpers.meta import ParsedSections
@@ -98,6 +99,25 @@ def test_gpu():
     gpu = Gpu(pull=True)
     assert isinstance(gpu, tuple)
 
+class StubSampler:
+    """ GpuSampler whose latest sample is given rather than taken """
+    def __init__(self, sample):
+        self.sample = sample
+        self.read = 0
+
+    def latest(self):
+        self.read += 1
+        return self.sample
+
+def test_gpu_usage():
+    """ Test that the gpu usage is read from a sampler when given one """
+    sampler = StubSampler({'time': 0, 'info': None, 'status': None,
+                           'error': 'unreachable'})
+    assert GpuUsage(sampler=sampler) == (False, 'Error: unreachable')
+    assert GpuUsage(sampler=sampler) == (False, 'Error: unreachable')
+    assert sampler.read == 2
+    assert GpuUsage(sampler=StubSampler(None))[0] is False
+
 def test_jobs():
     """ Test the jobs function """
     jobs = Jobs()
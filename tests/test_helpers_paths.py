@@ -1,4 +1,8 @@
+import threading
+
+from vent.helpers.paths import ChangesWorkingDir
 from vent.helpers.paths import PathDirs
+from vent.helpers.paths import WORKING_DIR_LOCK
 
 def test_pathdirs():
     """ Test the pathdirs class """
@@ -11,3 +15,27 @@ def test_ensure_file():
     status = paths.ensure_file(paths.init_file)
     assert isinstance(status, tuple)
     assert status[0] == True
+
+def test_ensure_dir():
+    """ Test the ensure_dir function """
+    paths = PathDirs()
+    status = paths.ensure_dir(paths.meta_dir)
+    assert status == (True, "exists")
+
+def test_changes_working_dir():
+    """ Test the ChangesWorkingDir decorator """
+    held = []
+
+    def other_thread():
+        # can't be had while the decorated function runs
+        held.append(WORKING_DIR_LOCK.acquire(False))
+
+    @ChangesWorkingDir
+    def function():
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        return 'done'
+
+    assert function() == 'done'
+    assert held == [False]
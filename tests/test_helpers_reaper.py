@@ -0,0 +1,44 @@
+from vent.helpers.reaper import ContainerReaper
+from vent.helpers.reaper import Ledger
+
+
+class FakeContainer:
+    def __init__(self, an_id, finished_at):
+        self.id = an_id
+        self.status = 'exited'
+        self.removed = False
+        self.attrs = {'Id': an_id,
+                      'State': {'StartedAt': '2017-10-10T12:00:00Z',
+                                'FinishedAt': finished_at},
+                      'Config': {'Labels': {'vent-plugin': '',
+                                            'vent.name': 'tool',
+                                            'file': '/files/' + an_id}}}
+
+    def remove(self):
+        self.removed = True
+
+
+class FakeState:
+    def __init__(self, containers):
+        self.found = containers
+
+    def containers(self, all=False, labels=None):
+        return [c for c in self.found if not c.removed]
+
+
+def test_reap(tmpdir):
+    """ Test recording and removing finished tool containers """
+    old = FakeContainer('a', '2017-10-10T12:00:01Z')
+    new = FakeContainer('b', '2999-10-10T12:00:01Z')
+    reaper = ContainerReaper(state=FakeState([old, new]), grace=60,
+                             base_dir=str(tmpdir) + '/',
+                             meta_dir=str(tmpdir))
+    assert reaper.reap() == ['a']
+    assert old.removed and not new.removed
+    assert Ledger(meta_dir=str(tmpdir), base_dir=str(tmpdir) + '/'
+                  ).counts() == (2, 2)
+    # containers in the grace period are only recorded once
+    assert reaper.reap() == []
+    assert Ledger(meta_dir=str(tmpdir), base_dir=str(tmpdir) + '/'
+                  ).counts() == (2, 2)
+    assert tmpdir.join('status.json').read().count('\n') == 2
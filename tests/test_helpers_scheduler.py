@@ -0,0 +1,39 @@
+import threading
+
+from vent.helpers.scheduler import PhaseScheduler
+
+
+def test_phase_scheduler():
+    """ Test the PhaseScheduler class """
+    both = threading.Event()
+    started = []
+    order = []
+
+    def independent(name):
+        started.append(name)
+        if len(started) == 2:
+            both.set()
+        # only returns if the other phase runs at the same time
+        assert both.wait(5)
+        order.append(name)
+        return name
+
+    def last():
+        order.append('last')
+        raise ValueError('failed')
+
+    calls = []
+    phases = PhaseScheduler()
+    phases.add('a', 'first', independent, kwargs={'name': 'a'})
+    phases.add('b', 'second', independent, kwargs={'name': 'b'})
+    phases.add('c', 'third', last, after=('a', 'b'))
+    phases.add('d', 'never', last, after=('missing',))
+    results = phases.run(progress=lambda done, running:
+                         calls.append((done, running)))
+    assert results['a'] == (True, 'a')
+    assert results['b'] == (True, 'b')
+    assert results['c'] == (False, 'failed')
+    assert not results['d'][0]
+    assert order[-1] == 'last'
+    assert calls[0] == ([], ['first', 'second'])
+    assert calls[-1] == (['first', 'second', 'third', 'never'], [])
@@ -0,0 +1,101 @@
+import Queue
+import time
+
+from docker.errors import NotFound
+
+from vent.helpers.state import DockerState
+
+
+class FakeAPI:
+    """ Answers the calls DockerState makes from dictionaries """
+    def __init__(self):
+        self.container_attrs = {}
+        self.image_attrs = {}
+        self.listed = 0
+
+    def containers(self, all=False):
+        self.listed += 1
+        return [{'Id': an_id} for an_id in self.container_attrs]
+
+    def inspect_container(self, an_id):
+        if an_id not in self.container_attrs:
+            raise NotFound(an_id)
+        return self.container_attrs[an_id]
+
+    def images(self):
+        return [{'Id': an_id} for an_id in self.image_attrs]
+
+    def inspect_image(self, an_id):
+        if an_id not in self.image_attrs:
+            raise NotFound(an_id)
+        return self.image_attrs[an_id]
+
+
+class FakeClient:
+    def __init__(self):
+        self.api = FakeAPI()
+
+
+def container(an_id, labels, running=True):
+    return {'Id': an_id, 'Name': '/' + an_id,
+            'State': {'Running': running,
+                      'Status': 'running' if running else 'exited'},
+            'Config': {'Labels': labels}}
+
+
+def test_docker_state():
+    """ Test lookups kept current from events """
+    client = FakeClient()
+    client.api.container_attrs['a'] = container(
+        'a', {'vent': '', 'vent.name': 'one', 'vent.groups': 'core,files'})
+    client.api.container_attrs['b'] = container('b', {'vent-plugin': '',
+                                                      'file': '/f'}, False)
+    client.api.image_attrs['sha256:1'] = {'Id': 'sha256:1',
+                                          'RepoTags': ['one:latest'],
+                                          'Config': {'Labels': {'vent': ''}}}
+    events = Queue.Queue()
+
+    def stream(since):
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+
+    state = DockerState(client=client, events=stream)
+    assert [c.name for c in state.containers()] == ['a']
+    assert len(state.containers(all=True)) == 2
+    assert [c.name for c in
+            state.containers(labels={'vent.groups': 'files'})] == ['a']
+    assert state.containers(labels={'vent.groups': 'core,files'}) == []
+    assert [c.status for c in
+            state.containers(all=True, labels={'vent-plugin': None,
+                                               'file': '/f'})] == ['exited']
+    assert [i.tags for i in state.images(labels={'vent': None})] == \
+        [['one:latest']]
+
+    # changes are applied from events
+    client.api.container_attrs['b'] = container('b', {'vent-plugin': '',
+                                                      'file': '/f'})
+    state.apply({'Type': 'container', 'Action': 'start',
+                 'Actor': {'ID': 'b'}})
+    assert len(state.containers()) == 2
+    del client.api.container_attrs['a']
+    state.apply({'Type': 'container', 'Action': 'destroy',
+                 'Actor': {'ID': 'a'}})
+    assert state.containers(labels={'vent.name': 'one'}) == []
+    del client.api.image_attrs['sha256:1']
+    state.apply({'Type': 'image', 'Action': 'delete',
+                 'Actor': {'ID': 'sha256:1'}})
+    assert state.images() == []
+    assert client.api.listed == 1
+
+    # everything is listed again once the event stream ends
+    events.put(None)
+    for _ in range(100):
+        if not state._live:
+            break
+        time.sleep(0.01)
+    assert len(state.containers()) == 1
+    assert client.api.listed == 2
+    events.put(None)
@@ -1,24 +1,29 @@
 import Queue
 
 import ast
-import docker
 import json
 import os
 import re
 import shutil
 import tempfile
+import threading
 import urllib2
 import yaml
 
+from vent.api.inventory import Inventory
+from vent.api.log_search import LogCursor
+from vent.api.log_search import LogSearch
 from vent.api.plugins import Plugin
 from vent.api.templates import Template
 from vent.helpers.logs import Logger
 from vent.helpers.meta import Containers
-from vent.helpers.meta import Dependencies
+from vent.helpers.meta import DependencyLevels
 from vent.helpers.meta import Images
 from vent.helpers.meta import ParsedSections
 from vent.helpers.meta import Timestamp
+from vent.helpers.paths import ChangesWorkingDir
 from vent.helpers.paths import PathDirs
+from vent.helpers.state import State
 
 
 class Action:
@@ -184,13 +189,17 @@ class Action:
             self.logger.info("group orders: " + str(group_orders))
             self.logger.info("containers remaining: " +
                              str(containers_remaining))
-            # start containers based on priorities
-            p_results = self.p_helper.start_priority_containers(groups,
-                                                                group_orders,
-                                                                tool_d)
-
-            # start the rest of the containers that didn't have any priorities
-            r_results = self.p_helper.start_remaining_containers(containers_remaining, tool_d)
+            # record every container's state in one manifest write
+            manifest = Template(self.p_helper.manifest)
+            with manifest.transaction():
+                # start containers based on priorities
+                p_results = self.p_helper.start_priority_containers(
+                    groups, group_orders, tool_d, manifest=manifest)
+
+                # start the rest of the containers that didn't have any
+                # priorities
+                r_results = self.p_helper.start_remaining_containers(
+                    containers_remaining, tool_d, manifest=manifest)
             results = (p_results[0] + r_results[0],
                        p_results[1] + r_results[1])
 
@@ -207,6 +216,7 @@ class Action:
         self.queue.put(status)
         return status
 
+    @ChangesWorkingDir
     def update(self,
                repo=None,
                name=None,
@@ -310,44 +320,30 @@ class Action:
                     # reset containers that may be affected by changes,
                     # including dependencies
                     tool_d = {}
+                    prev_dependencies = []
                     if (s[section]['running'] == 'yes'):
                         # find dependencies that will need to be restarted
                         # once this tool is reset
-                        prev_dependencies = []
-                        for t_sect in template.sections()[1]:
-                            self.logger.info("Testing check tool: " + t_sect)
-                            t_name = template.option(t_sect, 'name')[1]
-                            t_branch = template.option(t_sect, 'branch')[1]
-                            t_version = template.option(t_sect, 'version')[1]
-                            self.logger.info(t_name + ', ' + t_branch + ', ' + t_version)
-                            t_identifier = {'name': t_name,
-                                            'branch': t_branch,
-                                            'version': t_version}
-                            # don't worry about dealing with tool if it's not
-                            # running
-                            running = template.option(t_sect, 'running')
-                            if (not running[0] or running[1] != 'yes' or
-                                    t_name == s[section]['name']):
-                                self.logger.info("tool not dependency," +
-                                                 " skipping to next")
-                                continue
-                            options = template.options(t_sect)[1]
-                            self.logger.info(options)
-                            if 'docker' in options:
-                                d_settings = json.loads(template.option(t_sect,
-                                                                        'docker')[1])
-                                self.logger.info(d_settings)
-                                if 'links' in d_settings:
-                                    for link in json.loads(d_settings['links']):
-                                        if link == s[section]['link_name']:
-                                            prev_dependencies.append(t_identifier)
-
-                        # remove old containers, start new
+                        graph = template.dependency_graph()
+                        records = template.tool_records()
+                        running = [t_sect for t_sect in
+                                   graph.dependents([section])
+                                   if records[t_sect].running == 'yes' and
+                                   records[t_sect].name != s[section]['name']]
+                        for level in graph.levels(running):
+                            prev_dependencies.append(
+                                [{'name': records[t_sect].name,
+                                  'branch': records[t_sect].branch,
+                                  'version': records[t_sect].version}
+                                 for t_sect in level])
+
+                        # remove old containers, they are started again
+                        # after this tool
                         self.logger.info("running tools to be restarted: " +
-                                str(prev_dependencies))
-                        for tool in prev_dependencies:
-                            self.clean(**tool)
-                            tool_d.update(self.prep_start(**tool)[1])
+                                         str(prev_dependencies))
+                        for level in prev_dependencies:
+                            for tool in level:
+                                self.clean(**tool)
                         # clean tool before new manifest entry to get rid of
                         # old tool
                         self.clean(name=s[section]['name'], branch=branch,
@@ -360,21 +356,18 @@ class Action:
                     self.logger.info("Testing old....   " + old_image)
                     new_image = old_image.rsplit(':', 1)[0]+':'+new_version
                     template.set_option(section, 'image_name', new_image)
-                    # create new section
+                    # move to new section
                     new_section = section.rsplit(':', 1)[0]+':'+new_version
-                    template.add_section(new_section)
-                    old_section = template.section(section)[1]
-                    for val in old_section:
-                        template.set_option(new_section, val[0], val[1])
-                    # remove old section and image
+                    template.rename_section(section, new_section)
+                    # remove old image
                     self.d_client.images.remove(old_image, force=True)
-                    template.del_section(section)
                     template.write_config()
                     # now we can start new tool with correct info in manifest
                     tool_d.update(self.prep_start(name=s[section]['name'],
                                                   branch=branch,
                                                   version=new_version)[1])
                     self.start(tool_d)
+                    self._restart_levels(prev_dependencies)
                 except Exception as e:  # pragma: no cover
                     self.logger.error("unable to update: " + str(section) +
                                       " because: " + str(e))
@@ -490,9 +483,15 @@ class Action:
               groups=None,
               enabled="yes",
               branch="master",
-              version="HEAD"):
-        """ Build a set of tools that match the parameters given """
+              version="HEAD",
+              progress=None):
+        """
+        Build a set of tools that match the parameters given, progress is
+        called as each image builds, see StreamBuild
+        """
         args = locals()
+        # not something the tools are matched on
+        del args['progress']
         self.logger.info("Starting: build")
         self.logger.info(args)
         status = (True, None)
@@ -508,7 +507,8 @@ class Action:
                                                section,
                                                build=True,
                                                branch=branch,
-                                               version=version)
+                                               version=version,
+                                               progress=progress)
             if len(s) > 0:
                 template.write_config()
         except Exception as e:  # pragma: no cover
@@ -717,26 +717,30 @@ class Action:
 
         return status
 
-    def logs(self, c_type=None, grep_list=None):
-        """ Generically filter logs stored in log containers """
-        def get_logs(logs, log_entries):
-            try:
-                for log in logs:
-                    if str(container.name) in log_entries:
-                        log_entries[str(container.name)].append(log)
-                    else:
-                        log_entries[str(container.name)] = [log]
-            except Exception as e:  # pragma: no cover
-                self.logger.error("Unable to get logs for " +
-                                  str(container.name) +
-                                  " because: " + str(e))
-            return log_entries
+    def stream_logs(self, c_type=None, grep_list=None, since=None,
+                    tail=None):
+        """
+        Yields (container name, line) for the lines of the logs of vent
+        containers, optionally only the containers in the group c_type and
+        the lines containing any of grep_list, as they are found
+        """
+        self.logger.info("Starting: stream_logs")
+        search = LogSearch(self._log_containers(c_type), grep_list=grep_list,
+                           since=since, tail=tail, logger=self.logger)
+        return search.results()
 
-        self.logger.info("Starting: logs")
-        status = (True, None)
-        log_entries = {}
-        containers = self.d_client.containers.list(all=True,
-                                                   filters={'label': 'vent'})
+    def log_cursors(self, c_type=None):
+        """
+        Returns a LogCursor for each vent container, optionally only the
+        containers in the group c_type, that fetches nothing until it's used
+        """
+        self.logger.info("Starting: log_cursors")
+        return [LogCursor(container) for container in
+                sorted(self._log_containers(c_type), key=lambda c: c.name)]
+
+    def _log_containers(self, c_type=None):
+        """ Returns the vent containers, limited to the group c_type """
+        containers = State().containers(all=True, labels={'vent': None})
         self.logger.info("containers found: " + str(containers))
         comp_c = containers
         if c_type:
@@ -748,30 +752,22 @@ class Action:
                 self.logger.error("Unable to limit containers by: " +
                                   str(c_type) + " because: " +
                                   str(e))
+        return comp_c
 
-        if grep_list:
-            for expression in grep_list:
-                for container in comp_c:
-                    try:
-                        # 'logs' stores each line containing the expression
-                        logs = [log for log in container.logs().split("\n")
-                                if expression in log]
-                        log_entries = get_logs(logs, log_entries)
-                    except Exception as e:  # pragma: no cover
-                        self.logger.info("Unable to get logs for " +
-                                         str(container) +
-                                         " because: " + str(e))
-        else:
-            for container in comp_c:
-                try:
-                    logs = container.logs().split("\n")
-                    log_entries = get_logs(logs, log_entries)
-                except Exception as e:  # pragma: no cover
-                    self.logger.info("Unabled to get logs for " +
-                                     str(container) +
-                                     " because: " + str(e))
-
-        status = (True, log_entries)
+    def logs(self, c_type=None, grep_list=None, since=None, tail=None):
+        """ Generically filter logs stored in log containers """
+        self.logger.info("Starting: logs")
+        status = (True, None)
+        log_entries = {}
+        try:
+            for name, log in self.stream_logs(c_type=c_type,
+                                              grep_list=grep_list,
+                                              since=since, tail=tail):
+                log_entries.setdefault(name, []).append(log)
+            status = (True, log_entries)
+        except Exception as e:  # pragma: no cover
+            self.logger.error("logs failed with error: " + str(e))
+            status = (False, str(e))
         self.logger.info("Status of logs: " + str(status[0]))
         self.logger.info("Finished: logs")
         return status
@@ -789,59 +785,18 @@ class Action:
         if not choices:
             return (False, "No choices made")
         try:
-            # choices: repos, core, tools, images, built, running, enabled
-            items = {'repos': [], 'core': {}, 'tools': {}, 'images': {},
-                     'built': {}, 'running': {}, 'enabled': {}}
-
-            tools = self.plugin.list_tools()
-            self.logger.info("found tools: " + str(tools))
-            for choice in choices:
-                for tool in tools:
-                    try:
-                        if choice == 'repos':
-                            if 'repo' in tool:
-                                if (tool['repo'] and
-                                   tool['repo'] not in items[choice]):
-                                    items[choice].append(tool['repo'])
-                        elif choice == 'core':
-                            if 'groups' in tool and 'core' in tool['groups']:
-                                items[choice][tool['section']] = tool['name']
-                        elif choice == 'tools':
-                            if (('groups' in tool and
-                                 'core' not in tool['groups']) or
-                               'groups' not in tool):
-                                items[choice][tool['section']] = tool['name']
-                        elif choice == 'images':
-                            # TODO also check against docker
-                            items[choice][tool['section']] = tool['image_name']
-                        elif choice == 'built':
-                            items[choice][tool['section']] = tool['built']
-                        elif choice == 'running':
-                            containers = Containers()
-                            status = 'not running'
-                            for container in containers:
-                                image_name = tool['image_name'] \
-                                             .rsplit(":" +
-                                                     tool['version'], 1)[0]
-                                image_name = image_name.replace(':', '-')
-                                image_name = image_name.replace('/', '-')
-                                self.logger.info("image_name: " + image_name)
-                                if container[0] == image_name:
-                                    status = container[1]
-                                # cores need to not have version, plugins need
-                                # to have version in order to match
-                                elif container[0] == image_name + \
-                                        '-' + tool['version']:
-                                    status = container[1]
-                            items[choice][tool['section']] = status
-                        elif choice == 'enabled':
-                            items[choice][tool['section']] = tool['enabled']
-                        else:
-                            # unknown choice
-                            pass
-                    except Exception as e:  # pragma: no cover
-                        self.logger.error("unable to grab info about tool: " +
-                                          str(tool) + " because: " + str(e))
+            # choices: repos, core, tools, images, built, running, enabled,
+            # groups
+            manifest = Template(self.plugin.manifest)
+            records = manifest.tool_records()
+            tools = [records[section] for section in manifest.sections()[1]]
+            self.logger.info("found tools: " +
+                             str([tool.section for tool in tools]))
+            # the containers are only listed once for every tool
+            containers = []
+            if 'running' in choices:
+                containers = Containers()
+            items = Inventory(tools, containers, choices)
             status = (True, items)
         except Exception as e:  # pragma: no cover
             self.logger.error("inventory failed with error: " + str(e))
@@ -1016,25 +971,24 @@ class Action:
                     # save in plugin_manifest
                     vent_template = Template(template_path)
                     if instances > 1:
-                        # add instances as needed
+                        # add instances as needed, they inherit their
+                        # configuration from the tool's section and only
+                        # store the template's options as overrides
+                        added = []
                         for i in range(1, instances + 1):
                             i_section = tool.rsplit(':', 2)
                             i_section[0] += str(i) if i != 1 else ''
                             i_section = ':'.join(i_section)
                             if not manifest.section(i_section)[0]:
-                                manifest.add_section(i_section)
-                                for val_pair in manifest.section(tool)[1]:
-                                    name = val_pair[0]
-                                    val = val_pair[1]
-                                    if name == 'name':
-                                        val += str(i)
-                                    elif name == 'last_updated':
-                                        val = Timestamp()
-                                    elif name == 'running':
-                                        val = 'no'
-                                    manifest.set_option(i_section, name, val)
-                                template_to_manifest(vent_template, manifest,
-                                                     i_section, instances)
+                                t_name = manifest.option(tool, 'name')[1]
+                                manifest.add_instance(i_section, tool,
+                                                      t_name + str(i))
+                                added.append(i_section)
+                            elif (manifest.option(i_section, 'inherits')[0] and
+                                  'settings' not in
+                                  manifest.overrides(i_section)[1]):
+                                # its settings come from the tool's section
+                                continue
                             else:
                                 settings = manifest.option(i_section,
                                                            'settings')
@@ -1050,6 +1004,9 @@ class Action:
                                     manifest.set_option(i_section, 'settings',
                                                         json.dumps(
                                                             settings_dict))
+                        for i_section in added:
+                            template_to_manifest(vent_template, manifest,
+                                                 i_section, instances)
                     else:
                         try:
                             settings_str = manifest.option(tool, 'settings')[1]
@@ -1078,6 +1035,51 @@ class Action:
         self.logger.info("Finished: save_configure")
         return status
 
+    def _restart_levels(self, levels):
+        """
+        Cleans and starts again the tools in each level of tool identifiers,
+        each level after the ones before it have been started. The containers
+        of a level are stopped and started at the same time, but preparing
+        them checks out their repos in the working directory, so that's done
+        one tool at a time
+        """
+        restarted = []
+        for level in levels:
+            tools = []
+            for tool in level:
+                if not tool or tool in restarted:
+                    continue
+                restarted.append(tool)
+                tools.append(tool)
+            self._each_at_once(self.clean, tools)
+            prepared = []
+            for tool in tools:
+                try:
+                    status = self.prep_start(**tool)
+                    if status[0] and status[1]:
+                        prepared.append({'tool_d': status[1]})
+                except Exception as e:  # pragma: no cover
+                    self.logger.error("Problem preparing " + str(tool) +
+                                      " to restart: " + str(e))
+            self._each_at_once(self.start, prepared)
+        return restarted
+
+    def _each_at_once(self, function, kwargs_list):
+        """ Calls function with each of the kwargs at the same time """
+        def call(kwargs):
+            try:
+                function(**kwargs)
+            except Exception as e:  # pragma: no cover
+                self.logger.error("Problem restarting " + str(kwargs) +
+                                  ": " + str(e))
+
+        threads = [threading.Thread(target=call, args=(kwargs,))
+                   for kwargs in kwargs_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
     def restart_tools(self,
                       repo=None,
                       name=None,
@@ -1107,15 +1109,9 @@ class Action:
                 tool = tools.keys()[0]
                 if ('running' in tools[tool] and
                         tools[tool]['running'] == 'yes'):
-                    start_tools = [t_identifier]
                     dependent_tools = [tools[tool]['link_name']]
-                    start_tools += Dependencies(dependent_tools)
-                    start_d = {}
-                    for tool_identifier in start_tools:
-                        self.clean(**tool_identifier)
-                        start_d.update(self.prep_start(**tool_identifier)[1])
-                    if start_d:
-                        self.start(start_d)
+                    self._restart_levels([[t_identifier]] +
+                                         DependencyLevels(dependent_tools))
             except Exception as e:  # pragma: no cover
                 self.logger.error('Trouble restarting tool ' + name +
                                   ' because: ' + str(e))
@@ -1161,15 +1157,9 @@ class Action:
                     dependent_tools.append(entry)
                     # change names to lowercase for use in clean, prep_start
                     tool_changes[i] = {'name': entry.lower().replace('-', '_')}
-                dependencies = Dependencies(dependent_tools)
-                # restart tools
-                restart = tool_changes + dependencies
-                tool_d = {}
-                for tool in restart:
-                    self.clean(**tool)
-                    tool_d.update(self.prep_start(**tool)[1])
-                if tool_d:
-                    self.start(tool_d)
+                # restart the changed tools, then what depends on them
+                self._restart_levels([tool_changes] +
+                                     DependencyLevels(dependent_tools))
             except Exception as e:  # pragma: no cover
                 self.logger.error("Problem restarting tools: " + str(e))
                 status = (False, str(e))
@@ -1193,9 +1183,9 @@ class Action:
             tools, manifest = self.p_helper.constraint_options(constraints, [])
             for tool in tools:
                 manifest.set_option(tool, 'enabled', 'no')
-                manifest.write_config()
                 tool_name = manifest.option(tool, 'name')[1]
                 self.logger.info("Disabled tool: " + tool_name)
+            manifest.write_config()
         except Exception as e:  # pragma: no cover
             self.logger.error("Troubling disabling tool because: " + str(e))
             status = (False, str(e))
@@ -1218,9 +1208,9 @@ class Action:
             tools, manifest = self.p_helper.constraint_options(constraints, [])
             for tool in tools:
                 manifest.set_option(tool, 'enabled', 'yes')
-                manifest.write_config()
                 tool_name = manifest.option(tool, 'name')[1]
                 self.logger.info("Enabled tool: " + tool_name)
+            manifest.write_config()
         except Exception as e:  # pragma: no cover
             self.logger.error("Troubling enabling tool because: " + str(e))
             status = (False, str(e))
@@ -1306,18 +1296,13 @@ class Action:
                                                 json.dumps(opt_dict))
                     # copy manifest info into new sections if necessary
                     if instances > 1:
+                        t_name = manifest.option(base_section, 'name')[1]
                         for i in range(2, instances + 1):
                             i_section = base_section.rsplit(':', 2)
                             i_section[0] += str(i)
                             i_section = ':'.join(i_section)
-                            manifest.add_section(i_section)
-                            for opt_val in manifest.section(base_section)[1]:
-                                if opt_val[0] == 'name':
-                                    manifest.set_option(i_section, opt_val[0],
-                                                        opt_val[1] + str(i))
-                                else:
-                                    manifest.set_option(i_section, opt_val[0],
-                                                        opt_val[1])
+                            manifest.add_instance(i_section, base_section,
+                                                  t_name + str(i))
                     manifest.write_config()
 
             # start tools, if necessary
@@ -1481,8 +1466,7 @@ class Action:
             http://0.0.0.0:37728. Works well with send_request and get_request.
         """
         try:
-            d = docker.from_env()
-            containers = d.containers.list(filters={'label': 'vent'}, all=True)
+            containers = State().containers(all=True, labels={'vent': None})
         except Exception as e:  # pragma no cover
             return (False, "docker failed with error " + str(e))
 
@@ -0,0 +1,105 @@
+from ast import literal_eval
+
+try:
+    # python2
+    string_types = basestring
+except NameError:  # pragma: no cover
+    # python3
+    string_types = str
+
+
+def _docker_option(record, option):
+    """ Returns a docker option of a tool as it's passed to docker """
+    if not isinstance(record.docker, dict) or option not in record.docker:
+        return None
+    try:
+        return literal_eval(record.docker[option])
+    except Exception:
+        return record.docker[option]
+
+
+def _needs(record):
+    """
+    Returns the link names of the tools that a tool's containers need, from
+    its links, volumes_from and a network_mode of container:<name>
+    """
+    needs = set(record.links)
+    volumes_from = _docker_option(record, 'volumes_from')
+    if isinstance(volumes_from, string_types):
+        volumes_from = [volumes_from]
+    if isinstance(volumes_from, (list, tuple)):
+        # volumes_from entries can end with :ro or :rw
+        needs.update(str(name).split(':')[0] for name in volumes_from)
+    network_mode = _docker_option(record, 'network_mode')
+    if (isinstance(network_mode, string_types) and
+            network_mode.startswith('container:')):
+        needs.add(network_mode.split('container:', 1)[1])
+    return needs
+
+
+class DependencyGraph:
+    """
+    Which tools in the plugin manifest need which others to be running, built
+    from the ToolRecords of its sections. An edge from a section to another
+    means the first one's containers link to, share volumes with or use the
+    network of the second one's, so they have to be restarted after it
+    """
+    def __init__(self, sections, records):
+        # maps a link name to the sections with it
+        self.link_names = {}
+        # maps a section to the sections it needs and to the sections
+        # needing it
+        self.needs = {}
+        self.needed_by = {}
+        for section in sections:
+            link_name = records[section].link_name
+            if link_name is not None:
+                self.link_names.setdefault(link_name, set()).add(section)
+            self.needs[section] = set()
+            self.needed_by[section] = set()
+        for section in sections:
+            for link_name in _needs(records[section]):
+                for needed in self.link_names.get(link_name, ()):
+                    if needed != section:
+                        self.needs[section].add(needed)
+                        self.needed_by[needed].add(section)
+
+    def sections(self, link_names):
+        """ Returns the sections with any of the link names """
+        sections = set()
+        for link_name in link_names:
+            sections |= self.link_names.get(link_name, set())
+        return sections
+
+    def dependents(self, sections):
+        """
+        Returns every section that needs any of the sections, directly or
+        through other sections, not including the sections themselves
+        """
+        sections = set(sections)
+        found = set()
+        stack = list(sections)
+        while stack:
+            for dependent in self.needed_by.get(stack.pop(), ()):
+                if dependent not in found and dependent not in sections:
+                    found.add(dependent)
+                    stack.append(dependent)
+        return found
+
+    def levels(self, sections):
+        """
+        Orders sections into levels where every section only needs sections
+        in earlier levels, so each level can be started at once after the
+        ones before it. Sections in a cycle are put in one last level
+        """
+        remaining = set(sections)
+        levels = []
+        while remaining:
+            level = sorted(section for section in remaining if
+                           not self.needs.get(section, set()) & remaining)
+            if not level:
+                levels.append(sorted(remaining))
+                break
+            levels.append(level)
+            remaining.difference_update(level)
+        return levels
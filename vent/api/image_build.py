@@ -0,0 +1,71 @@
+import collections
+import re
+import time
+
+# lines of a build's output kept to explain why it failed
+ERROR_LINES = 20
+STEP = re.compile(r'^Step (\d+)/(\d+) ?:')
+SUCCESS = 'Successfully built '
+
+
+def ShortId(image_id):
+    """ Returns the short form of an image id, without its algorithm """
+    return image_id.split(':')[-1][:12]
+
+
+def StreamBuild(client, path, tag, labels=None, dockerfile=None, tags=(),
+                progress=None, logger=None):
+    """
+    Builds an image through the streaming build API of the docker SDK, reading
+    the output as the daemon sends it rather than all at once, and tags it
+    with any other tags given. As each step starts and once the build is
+    done, progress is called with the tag, how many steps are done, the
+    number of steps and the seconds each of the steps done took. Returns
+    (True, short image id) or (False, why it failed)
+    """
+    image_id = None
+    lines = collections.deque(maxlen=ERROR_LINES)
+    step = 0
+    steps = 0
+    timings = []
+    started = time.time()
+    for chunk in client.api.build(path=path, tag=tag, labels=labels,
+                                  dockerfile=dockerfile, rm=True,
+                                  decode=True):
+        if 'aux' in chunk and 'ID' in chunk['aux']:
+            image_id = ShortId(chunk['aux']['ID'])
+        if 'error' in chunk:
+            lines.append(chunk['error'].strip())
+            if logger:
+                logger.error("Building " + tag + " failed: " +
+                             chunk['error'].strip())
+            return (False, '\n'.join(lines))
+        line = chunk.get('stream', '').strip()
+        if not line:
+            continue
+        lines.append(line)
+        if logger:
+            logger.info("Building " + tag + ": " + line)
+        found = STEP.match(line)
+        if found:
+            if step:
+                timings.append(time.time() - started)
+            started = time.time()
+            step, steps = int(found.group(1)), int(found.group(2))
+            if progress:
+                progress(tag, step - 1, steps, list(timings))
+        elif line.startswith(SUCCESS) and image_id is None:
+            # daemons too old to send the id on its own only print it
+            image_id = line[len(SUCCESS):].strip()
+    if image_id is None:
+        return (False, '\n'.join(lines) or "No image was built")
+    if step:
+        timings.append(time.time() - started)
+    if progress:
+        progress(tag, steps, steps, timings)
+    for extra in tags:
+        repository, _, extra_tag = extra.rpartition(':')
+        if not repository:
+            repository, extra_tag = extra, None
+        client.api.tag(image_id, repository, tag=extra_tag)
+    return (True, image_id)
@@ -0,0 +1,55 @@
+# what Inventory can fill in, repos is a list of repos and the others map the
+# section of each tool to something about it
+CHOICES = ('repos', 'core', 'tools', 'images', 'built', 'running', 'enabled',
+           'groups')
+
+
+def ContainerName(record):
+    """
+    Returns the names a tool's container can have, derived from its image
+    name. Cores don't have the version in the name, plugins do
+    """
+    image_name = record.image_name.rsplit(":" + record.version, 1)[0]
+    image_name = image_name.replace(':', '-').replace('/', '-')
+    return image_name, image_name + '-' + record.version
+
+
+def Inventory(records, containers, choices):
+    """
+    Returns the inventory items for the choices made from the ToolRecords of
+    the tools in the plugin manifest and the (name, status) of the vent
+    containers, filling every choice in one pass over the tools
+    """
+    items = dict((choice, {}) for choice in CHOICES)
+    items['repos'] = []
+    choices = set(choices)
+    # a container's status by its name, for when it matches the tool's name
+    statuses = dict(containers)
+    for record in records:
+        section = record.section
+        core = record.groups is not None and 'core' in record.groups
+        if 'repos' in choices and record.repo:
+            if record.repo not in items['repos']:
+                items['repos'].append(record.repo)
+        if 'core' in choices and core:
+            items['core'][section] = record.name
+        if 'tools' in choices and not core:
+            items['tools'][section] = record.name
+        if 'images' in choices:
+            # TODO also check against docker
+            items['images'][section] = record.image_name
+        if 'built' in choices:
+            items['built'][section] = record.built
+        if 'enabled' in choices:
+            items['enabled'][section] = record.enabled
+        if 'groups' in choices:
+            items['groups'][section] = record.groups
+        if 'running' in choices:
+            status = 'not running'
+            if record.image_name is not None and record.version is not None:
+                for name in ContainerName(record):
+                    if name in statuses:
+                        status = statuses[name]
+                        break
+            items['running'][section] = status
+    return items
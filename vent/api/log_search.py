@@ -0,0 +1,244 @@
+import calendar
+import collections
+import re
+import threading
+import time
+
+try:
+    # python2
+    import Queue
+except ImportError:  # pragma: no cover
+    # python3
+    import queue as Queue
+
+# containers whose logs are read at the same time
+THREADS = 8
+# lines read ahead of whoever is consuming the results
+BUFFER = 1000
+# lines a log cursor loads at a time, and how many it keeps
+PAGE = 200
+WINDOW = 2000
+
+
+def Matcher(grep_list=None):
+    """
+    Returns a function checking whether a line contains any of the
+    expressions in grep_list, every line matches if there aren't any
+    """
+    if not grep_list:
+        return lambda line: True
+    pattern = re.compile('|'.join(re.escape(str(expression)) for
+                                  expression in grep_list))
+    return lambda line: pattern.search(line) is not None
+
+
+def ContainerLines(container, since=None, until=None, tail=None,
+                   timestamps=False):
+    """
+    Yields the lines of a container's logs as they are streamed from the
+    docker daemon, optionally only the ones since or until a time or the
+    last tail lines, and starting with when they were logged
+    """
+    # streaming follows the logs unless told not to
+    kargs = {'stream': True, 'follow': False}
+    if timestamps:
+        kargs['timestamps'] = True
+    if since is not None:
+        kargs['since'] = since
+    if until is not None:
+        kargs['until'] = until
+    if tail is not None:
+        kargs['tail'] = tail
+    rest = ''
+    for chunk in container.logs(**kargs):
+        if bytes is not str and isinstance(chunk, bytes):
+            chunk = chunk.decode('utf-8', 'replace')
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+class LogSearch:
+    """
+    Searches the logs of containers for lines containing any of a list of
+    expressions, reading the logs of several containers at once and each
+    one only once. Matching lines are yielded as they are found, in order
+    for each container
+    """
+    def __init__(self, containers, grep_list=None, since=None, tail=None,
+                 threads=THREADS, logger=None):
+        self.containers = list(containers)
+        self.matches = Matcher(grep_list)
+        self.since = since
+        self.tail = tail
+        self.threads = threads
+        self.logger = logger
+
+    def _search(self, containers, found, stop):
+        while not stop.is_set():
+            try:
+                container = containers.get(False)
+            except Queue.Empty:
+                break
+            try:
+                name = str(container.name)
+                for line in ContainerLines(container, since=self.since,
+                                           tail=self.tail):
+                    if stop.is_set():
+                        break
+                    if self.matches(line):
+                        self._put(found, (name, line), stop)
+            except Exception as e:  # pragma: no cover
+                if self.logger:
+                    self.logger.error("Unable to get logs for " +
+                                      str(container) + " because: " + str(e))
+        # let the reader know this thread is done
+        self._put(found, None, stop)
+
+    @staticmethod
+    def _put(found, item, stop):
+        # wait for room, unless the reader stopped reading
+        while not stop.is_set():
+            try:
+                found.put(item, True, 0.1)
+                return
+            except Queue.Full:
+                pass
+
+    def results(self):
+        """ Yields (container name, line) for every matching line """
+        containers = Queue.Queue()
+        for container in self.containers:
+            containers.put(container)
+        found = Queue.Queue(BUFFER)
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._search,
+                                    args=(containers, found, stop))
+                   for _ in range(min(self.threads, len(self.containers)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        running = len(threads)
+        try:
+            while running:
+                item = found.get()
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+        finally:
+            # stop reading if the results are no longer wanted
+            stop.set()
+
+
+class LogCursor:
+    """
+    A window of at most window lines of a container's logs that starts out
+    with the last page of lines and can be moved back a page at a time or
+    extended with the lines logged since, so only what's looked at is ever
+    fetched and kept
+    """
+    def __init__(self, container, page=PAGE, window=WINDOW):
+        self.container = container
+        self.name = str(container.name)
+        self.page = page
+        # (when it was logged, line) of the lines in the window
+        self.lines = collections.deque(maxlen=window)
+        self.loaded = False
+        # whether the window reached the first line of the logs
+        self.complete = False
+
+    @staticmethod
+    def _split(line):
+        """
+        Splits a line of logs with timestamps into a key that sorts by when
+        it was logged and the line itself
+        """
+        timestamp, _, text = line.partition(' ')
+        whole, _, fraction = timestamp.rstrip('Z').partition('.')
+        try:
+            nanoseconds = int((fraction or '0').ljust(9, '0')[:9])
+        except ValueError:
+            nanoseconds = 0
+        return (whole, nanoseconds), text
+
+    def _fetch(self, since=None, until=None, tail=None):
+        for line in ContainerLines(self.container, since=since, until=until,
+                                   tail=tail, timestamps=True):
+            yield self._split(line)
+
+    @staticmethod
+    def _second(key):
+        """ Returns the whole second, since the epoch, of a line's key """
+        return calendar.timegm(time.strptime(key[0], '%Y-%m-%dT%H:%M:%S'))
+
+    def text(self):
+        """ Returns the lines in the window """
+        return [text for _, text in self.lines]
+
+    def tail(self):
+        """ Moves the window to the last page of lines """
+        self.lines.clear()
+        self.lines.extend(self._fetch(tail=self.page))
+        self.loaded = True
+        self.complete = len(self.lines) < self.page
+        return self.text()
+
+    def older(self):
+        """
+        Moves the window back by up to a page of lines from before its first
+        one, dropping its last ones if it's full. Returns how many lines
+        were added
+        """
+        if not self.loaded:
+            return len(self.tail())
+        if self.complete or not self.lines:
+            return 0
+        first = self.lines[0][0]
+        # docker only takes whole seconds, so the lines logged in the same
+        # second as the first one come back too and are left out by their
+        # timestamps, asking for more if they crowd out the page wanted
+        until = self._second(first) + 1
+        wanted = self.page
+        while True:
+            fetched = 0
+            found = 0
+            older = collections.deque(maxlen=self.page)
+            for key, text in self._fetch(until=until, tail=wanted):
+                fetched += 1
+                if key < first:
+                    found += 1
+                    older.append((key, text))
+            if found >= self.page or fetched < wanted:
+                break
+            wanted += self.page
+        # the logs start within this page if the daemon had no more lines
+        self.complete = fetched < wanted and found <= self.page
+        self.lines.extendleft(reversed(older))
+        return len(older)
+
+    def newer(self):
+        """
+        Adds up to a page of the lines logged right after the last one in the
+        window, so lines are never skipped even if the window was moved back
+        or more than a page was logged since. Returns the lines added
+        """
+        if not self.loaded or not self.lines:
+            return self.tail()
+        last = self.lines[-1][0]
+        # docker only takes whole seconds, the lines already in the window
+        # from that second are left out by their timestamps
+        new = []
+        for key, text in self._fetch(since=self._second(last)):
+            if key > last:
+                new.append((key, text))
+                if len(new) == self.page:
+                    break
+        if len(self.lines) + len(new) > self.lines.maxlen:
+            # the first lines are dropped to make room
+            self.complete = False
+        self.lines.extend(new)
+        return [text for _, text in new]
@@ -0,0 +1,106 @@
+import binascii
+import json
+import os
+
+# compact the journal once it grows past this many bytes
+COMPACT_SIZE = 256 * 1024
+
+
+def _native(value):
+    """ json decodes to unicode on python2, configs hold native strings """
+    if value is None or isinstance(value, str):
+        return value
+    return value.encode('utf-8')
+
+
+class Journal:
+    """
+    Append-only journal of the changes written to a manifest, one JSON line
+    per write. The first line holds the journal's epoch, a random id that
+    changes every time the journal is compacted, so an offset into it is an
+    (epoch, position) tuple
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def _epoch(self, journal):
+        """ Reads the epoch from the first line of an open journal """
+        header = journal.readline()
+        if not header.endswith('\n'):
+            return None
+        return json.loads(header)['epoch']
+
+    def _reset(self):
+        """ Atomically replaces the journal with an empty one """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as journal:
+            epoch = binascii.hexlify(os.urandom(8)).decode('ascii')
+            journal.write(json.dumps({'epoch': epoch}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.rename(tmp_path, self.path)
+
+    def offset(self):
+        """
+        Returns the current end of the journal, changes appended after it are
+        returned by since
+        """
+        try:
+            with open(self.path) as journal:
+                epoch = self._epoch(journal)
+                journal.seek(0, os.SEEK_END)
+                return (epoch, journal.tell())
+        except (IOError, OSError, ValueError):
+            return (None, 0)
+
+    def since(self, offset):
+        """
+        Returns the offset of the end of the journal and the changes appended
+        after offset, the changes are None if the journal was compacted or
+        replaced since offset and the manifest needs to be read again
+        """
+        changes = []
+        if not os.path.exists(self.path) and offset and offset[0] is None:
+            # nothing has been written since offset was taken
+            return offset, changes
+        try:
+            with open(self.path) as journal:
+                epoch = self._epoch(journal)
+                if epoch is None or offset is None or epoch != offset[0]:
+                    journal.seek(0, os.SEEK_END)
+                    return (epoch, journal.tell()), None
+                journal.seek(offset[1])
+                position = offset[1]
+                for line in journal:
+                    # stop at a line that is still being written
+                    if not line.endswith('\n'):
+                        break
+                    position += len(line)
+                    for change in json.loads(line)['changes']:
+                        changes.append(tuple(_native(value) for value in
+                                             change))
+        except (IOError, OSError, ValueError):
+            return (None, 0), None
+        return (epoch, position), changes
+
+    def append(self, changes):
+        """
+        Appends changes written to the manifest, callers must hold the
+        manifest's write lock. Compacts the journal if it has grown too big,
+        since the manifest that was just written is a snapshot of everything
+        in it
+        """
+        with open(self.path, 'a+') as journal:
+            journal.seek(0)
+            epoch = None
+            try:
+                epoch = self._epoch(journal)
+            except ValueError:
+                pass
+            journal.seek(0, os.SEEK_END)
+            size = journal.tell()
+            if epoch is not None and size < COMPACT_SIZE:
+                journal.write(json.dumps({'changes': changes}) + '\n')
+                journal.flush()
+                return
+        self._reset()
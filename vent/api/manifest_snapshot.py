@@ -0,0 +1,161 @@
+import ast
+import marshal
+import mmap
+import os
+import struct
+import threading
+
+# the snapshot starts with a magic string and the generation of the snapshot,
+# followed by the marshalled routing table
+MAGIC = b'VSNP0001'
+HEADER = struct.Struct('<8sQ')
+
+# tables loaded by this process, maps a snapshot path to a tuple of
+# (file identity, generation, table)
+_LOADED = {}
+_LOADED_LOCK = threading.Lock()
+
+
+def _stat(path):
+    """
+    Returns the (inode, mtime, size) of path or None if it can't be stat'd
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, getattr(stat, 'st_mtime_ns', stat.st_mtime),
+            stat.st_size)
+
+
+def compile_routes(sections, records, identity=None):
+    """
+    Builds the routing table used to decide which tools process a new file
+    from the ToolRecords of the plugin manifest's sections, with everything
+    that doesn't depend on the file decoded ahead of time. identity is the
+    identity of the manifest the records were read from
+    """
+    name_maps = {}
+    for section in sections:
+        record = records[section]
+        if record.link_name is not None and record.image_name is not None:
+            name_maps[record.link_name] = record.image_name.replace(
+                ':', '-').replace('/', '-')
+
+    tools = []
+    extensions = {}
+    for section in sections:
+        record = records[section]
+        settings = record.settings
+        if not isinstance(settings, dict) or 'ext_types' not in settings:
+            # tools that don't process files are never routed to
+            continue
+        docker = None
+        if isinstance(record.docker, dict):
+            docker = {}
+            for option, value in record.docker.items():
+                try:
+                    docker[option] = ast.literal_eval(value)
+                except Exception:  # pragma: no cover
+                    docker[option] = value
+            if isinstance(docker.get('links'), dict):
+                docker['links'] = dict((name_maps.get(link, link), alias)
+                                       for link, alias in
+                                       docker['links'].items())
+        process_from_tool = []
+        if 'process_from_tool' in settings:
+            process_from_tool = [tool.replace(' ', '-') for tool in
+                                 settings['process_from_tool'].split(',')]
+        tool = {'section': section,
+                'repo': record.repo,
+                'type': record.type,
+                'image_name': record.image_name,
+                'link_name': record.link_name,
+                'replay': (record.groups is not None and
+                           'replay' in record.groups),
+                'service': record.service,
+                'process_base': settings.get('process_base') != 'no',
+                'process_from_tool': process_from_tool,
+                'docker': docker,
+                'gpu': record.gpu}
+        for ext_type in settings['ext_types'].split(','):
+            extensions.setdefault(ext_type, []).append(len(tools))
+        tools.append(tool)
+    # tools are kept in manifest order for each extension
+    return {'manifest': identity,
+            'name_maps': name_maps,
+            'tools': tools,
+            'extensions': sorted(extensions.items())}
+
+
+class Snapshot:
+    """
+    Compiled routing table of the plugin manifest, written next to it every
+    time the manifest is written so workers don't have to parse the manifest
+    and decode its JSON for every file they process
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def generation(self):
+        """ Returns the generation of the snapshot, 0 if there isn't one """
+        try:
+            with open(self.path, 'rb') as snapshot:
+                magic, generation = HEADER.unpack(
+                    snapshot.read(HEADER.size))
+        except (IOError, OSError, struct.error):
+            return 0
+        if magic != MAGIC:
+            return 0
+        return generation
+
+    def write(self, table):
+        """
+        Atomically replaces the snapshot with table, callers must hold the
+        manifest's write lock. Returns the generation written
+        """
+        generation = self.generation() + 1
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as snapshot:
+            snapshot.write(HEADER.pack(MAGIC, generation))
+            snapshot.write(marshal.dumps(table))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.rename(tmp_path, self.path)
+        return generation
+
+    def load(self):
+        """
+        Returns the routing table in the snapshot, or None if there isn't a
+        valid one. The table is only decoded again if the snapshot's
+        generation changed since it was last loaded by this process, and is
+        shared so it must not be changed
+        """
+        identity = _stat(self.path)
+        if identity is None:
+            return None
+        with _LOADED_LOCK:
+            loaded = _LOADED.get(self.path)
+        if loaded and loaded[0] == identity:
+            return loaded[2]
+        try:
+            with open(self.path, 'rb') as snapshot:
+                mapping = mmap.mmap(snapshot.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+                try:
+                    magic, generation = HEADER.unpack(
+                        mapping[:HEADER.size])
+                    if magic != MAGIC:
+                        return None
+                    if loaded and loaded[1] == generation:
+                        table = loaded[2]
+                    else:
+                        table = marshal.loads(mapping[HEADER.size:])
+                finally:
+                    mapping.close()
+        except (IOError, OSError, ValueError, EOFError, TypeError,
+                struct.error):
+            return None
+        with _LOADED_LOCK:
+            _LOADED[self.path] = (identity, generation, table)
+        return table
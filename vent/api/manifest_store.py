@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+
+try:
+    # python2
+    import ConfigParser
+except ImportError:  # pragma: no cover
+    # python3
+    import configparser as ConfigParser
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS options (
+    id INTEGER PRIMARY KEY,
+    section TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    UNIQUE (section, name)
+);
+CREATE INDEX IF NOT EXISTS options_by_value ON options (name, value);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+# connections are kept per thread since sqlite connections can't be shared
+# between threads, maps a database path to its connection
+_LOCAL = threading.local()
+
+
+class ManifestStore:
+    """
+    Stores the sections and options of a manifest in a SQLite database in WAL
+    mode, every committed change bumps a generation counter so readers can
+    tell if what they have loaded is current
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def _connect(self):
+        """ Returns this thread's connection to the database """
+        connections = getattr(_LOCAL, 'connections', None)
+        if connections is None:
+            connections = _LOCAL.connections = {}
+        db = connections.get(self.path)
+        if db is None:
+            # transactions are managed explicitly
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.text_factory = str
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            connections[self.path] = db
+        return db
+
+    @staticmethod
+    def _generation(db):
+        return db.execute("SELECT value FROM meta WHERE key = 'generation'"
+                          ).fetchone()[0]
+
+    def _transaction(self, db, function, *args):
+        """
+        Runs function in a write transaction and bumps the generation, returns
+        the generation before and after
+        """
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            before = self._generation(db)
+            after = function(db, before, *args)
+            if after != before:
+                db.execute("UPDATE meta SET value = ? WHERE key = "
+                           "'generation'", (after,))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return before, after
+
+    def generation(self):
+        """ Returns the generation of the last committed change """
+        return self._generation(self._connect())
+
+    def load(self, config):
+        """
+        Fills config with a consistent snapshot of the database and returns
+        the generation of the snapshot
+        """
+        db = self._connect()
+        db.execute('BEGIN')
+        try:
+            generation = self._generation(db)
+            for (section,) in db.execute('SELECT name FROM sections '
+                                         'ORDER BY id'):
+                config.add_section(section)
+            for section, option, value in db.execute('SELECT section, name, '
+                                                     'value FROM options '
+                                                     'ORDER BY id'):
+                config.set(section, option, value)
+        finally:
+            db.execute('COMMIT')
+        return generation
+
+    @staticmethod
+    def _add_section(db, section):
+        db.execute('INSERT OR IGNORE INTO sections (name) VALUES (?)',
+                   (section,))
+
+    def _apply(self, db, generation, changes):
+        for change in changes:
+            action, section = change[0], change[1]
+            if action == 'del_section':
+                db.execute('DELETE FROM options WHERE section = ?',
+                           (section,))
+                db.execute('DELETE FROM sections WHERE name = ?', (section,))
+                continue
+            self._add_section(db, section)
+            if action == 'set':
+                # update in place to keep the option's position
+                cursor = db.execute('UPDATE options SET value = ? WHERE '
+                                    'section = ? AND name = ?',
+                                    (change[3], section, change[2]))
+                if not cursor.rowcount:
+                    db.execute('INSERT INTO options (section, name, value) '
+                               'VALUES (?, ?, ?)',
+                               (section, change[2], change[3]))
+            elif action == 'del_option':
+                db.execute('DELETE FROM options WHERE section = ? AND '
+                           'name = ?', (section, change[2]))
+        return generation + 1
+
+    def commit(self, changes, generation):
+        """
+        Applies changes recorded by a Template as row updates. Returns the new
+        generation and whether other changes were committed since generation
+        """
+        before, after = self._transaction(self._connect(), self._apply,
+                                          changes)
+        return after, before != generation
+
+    def _replace(self, db, generation, config, only_if_empty):
+        if only_if_empty and generation:
+            return generation
+        db.execute('DELETE FROM options')
+        db.execute('DELETE FROM sections')
+        for section in config.sections():
+            self._add_section(db, section)
+            db.executemany('INSERT INTO options (section, name, value) '
+                           'VALUES (?, ?, ?)',
+                           [(section, option, value) for option, value in
+                            config.items(section)])
+        return generation + 1
+
+    def import_ini(self, path, only_if_empty=False):
+        """
+        Replaces the contents of the database with the INI file at path, if
+        only_if_empty is set nothing is replaced if anything was committed
+        """
+        config = ConfigParser.RawConfigParser()
+        config.optionxform = str
+        config.read(path)
+        return self._transaction(self._connect(), self._replace, config,
+                                 only_if_empty)[1]
+
+    def export_ini(self, path):
+        """ Atomically writes the contents of the database to path """
+        from vent.api.templates import _write_atomic
+
+        config = ConfigParser.RawConfigParser()
+        config.optionxform = str
+        self.load(config)
+        _write_atomic(os.path.abspath(path), config)
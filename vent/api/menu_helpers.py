@@ -1,4 +1,3 @@
-import docker
 import os
 import shlex
 
@@ -9,8 +8,13 @@ from subprocess import check_output, STDOUT
 from vent.api.actions import Action
 from vent.api.plugin_helpers import PluginHelper
 from vent.api.templates import Template
+from vent.api.tool_cache import ToolCache
+from vent.helpers.clients import DockerClient
 from vent.helpers.logs import Logger
 from vent.helpers.meta import Tools
+from vent.helpers.paths import ChangesWorkingDir
+from vent.helpers.paths import WORKING_DIR_LOCK
+from vent.helpers.state import State
 
 
 class MenuHelper:
@@ -21,6 +25,7 @@ class MenuHelper:
         self.p_helper = self.api_action.p_helper
         self.logger = Logger(__name__)
 
+    @ChangesWorkingDir
     def cores(self, action, branch="master", version='HEAD'):
         """
         Supply action (install, build, start, stop, clean) for core tools
@@ -29,7 +34,9 @@ class MenuHelper:
         status = (False, None)
         try:
             self.logger.info("action provided: " + str(action))
-            core = self.tools_status(True, branch=branch, version=version)[1]
+            core = self.tools_status(True, branch=branch, version=version,
+                                     refresh=action in ["install",
+                                                        "build"])[1]
             if action in ["install", "build"]:
                 tools = []
                 core_repo = 'https://github.com/cyberreboot/vent'
@@ -114,7 +121,7 @@ class MenuHelper:
                                     # image_name in format of (bool, image_name)
                                     name = image_name[1]
 
-                                    d_client = docker.from_env()
+                                    d_client = DockerClient()
                                     image_attrs = d_client.images.get(name)
                                     image_attrs = image_attrs.attrs
                                     image_id = image_attrs['Id'].split(':')[1][:12]
@@ -174,6 +181,7 @@ class MenuHelper:
         self.logger.info("Finished: core")
         return status
 
+    @ChangesWorkingDir
     def repo_branches(self, repo):
         """ Get the branches of a repository """
         self.logger.info("Starting: repo_branches")
@@ -230,6 +238,7 @@ class MenuHelper:
         self.logger.info("Finished: repo_branches")
         return status
 
+    @ChangesWorkingDir
     def repo_commits(self, repo):
         """ Get the commit IDs for all of the branches of a repository """
         self.logger.info("Starting: repo_commits")
@@ -281,6 +290,7 @@ class MenuHelper:
         self.logger.info("Finished: repo_commits")
         return status
 
+    @ChangesWorkingDir
     def repo_tools(self, repo, branch, version):
         """ Get available tools for a repository branch at a version """
         self.logger.info("Starting: repo_tools")
@@ -317,11 +327,13 @@ class MenuHelper:
         self.logger.info("Finished: repo_tools")
         return status
 
-    def tools_status(self, core, branch="master", version="HEAD", **kargs):
+    def tools_status(self, core, branch="master", version="HEAD",
+                     refresh=False, **kargs):
         """
         Get tools that are currently installed/built/running and also the
         number of repos that those tools come from; can toggle whether looking
-        for core tools or plugin tools
+        for core tools or plugin tools, and whether to pull the repos again
+        rather than use the tools found at the commit they are at
         """
         # !! TODO this might need to store namespaces/branches/versions
         all_tools = {'built': [], 'running': [], 'installed': [], 'normal': []}
@@ -346,24 +358,35 @@ class MenuHelper:
                 if repo[0] and repo[1] != core_repo:
                     repos.add(repo[1])
 
-        # get normal tools
+        # get normal tools, from the tools found at the commit each repo is
+        # at unless asked to pull the repos again
+        groups = 'core' if core else None
+        cache = ToolCache(os.path.join(
+            self.api_action.plugin.path_dirs.meta_dir, "tool_cache.json"))
         for repo in repos:
-            status, _ = p_helper.clone(repo)
-            if status:
-                p_helper.apply_path(repo)
-                p_helper.checkout(branch=branch, version=version)
-                path, _, _ = p_helper.get_path(repo, core=core)
-                matches = None
+            path, _, _ = p_helper.get_path(repo, core=core)
+            matches = None
+            if not refresh:
+                matches = cache.get(repo, path, branch=branch,
+                                    version=version, groups=groups)
+            if matches is None:
+                with WORKING_DIR_LOCK:
+                    status, _ = p_helper.clone(repo)
+                    if status:
+                        resp = p_helper.apply_path(repo)
+                        p_helper.checkout(branch=branch, version=version)
+                        if resp[0]:
+                            chdir(resp[1])
+                        matches = p_helper.available_tools(path,
+                                                           version=version,
+                                                           groups=groups)
+                        cache.put(repo, path, matches, branch=branch,
+                                  version=version, groups=groups)
+            for match in matches or []:
                 if core:
-                    matches = p_helper.available_tools(path, version=version,
-                                                       groups='core')
+                    all_tools['normal'].append(match[0].split('/')[-1].replace('_', '-'))
                 else:
-                    matches = p_helper.available_tools(path, version=version)
-                for match in matches:
-                    if core:
-                        all_tools['normal'].append(match[0].split('/')[-1].replace('_', '-'))
-                    else:
-                        all_tools['normal'].append(match[0].split('/')[-1])
+                    all_tools['normal'].append(match[0].split('/')[-1])
 
         # get tools that have been installed
         for tool in tools[1]:
@@ -375,8 +398,7 @@ class MenuHelper:
 
         # get tools that have been built and/or are running
         try:
-            d_client = docker.from_env()
-            images = d_client.images.list(filters={'label': 'vent'})
+            images = State().images(labels={'vent': None})
             for image in images:
                 try:
                     core_check = ("vent.groups" in image.attrs['Config']['Labels'] and
@@ -395,7 +417,7 @@ class MenuHelper:
                                 all_tools['built'].append(image.attrs['Config']['Labels']['vent.name'])
                 except Exception as err:  # pragma: no cover
                     pass
-            containers = d_client.containers.list(filters={'label': 'vent'})
+            containers = State().containers(labels={'vent': None})
             for container in containers:
                 try:
                     core_check = ("vent.groups" in container.attrs['Config']['Labels'] and
@@ -1,4 +1,3 @@
-import docker
 import fnmatch
 import json
 import re
@@ -11,7 +10,10 @@ from os.path import expanduser, join
 from subprocess import check_output, STDOUT
 
 from vent.api.templates import Template
+from vent.api.templates import ToolRecord
+from vent.helpers.clients import DockerClient
 from vent.helpers.logs import Logger
+from vent.helpers.paths import ChangesWorkingDir
 from vent.helpers.paths import PathDirs
 from vent.helpers.meta import Version
 
@@ -19,8 +21,8 @@ from vent.helpers.meta import Version
 class PluginHelper:
     """ Handle helper functions for the Plugin class """
     def __init__(self, **kargs):
-        self.d_client = docker.from_env()
         self.path_dirs = PathDirs(**kargs)
+        self.d_client = DockerClient(self.path_dirs.cfg_file)
         self.manifest = join(self.path_dirs.meta_dir,
                              "plugin_manifest.cfg")
         self.logger = Logger(__name__)
@@ -47,6 +49,7 @@ class PluginHelper:
         path = join(path, org, name)
         return path, org, name
 
+    @ChangesWorkingDir
     def apply_path(self, repo):
         """ Set path to where the repo is and return original path """
         self.logger.info("Starting: apply_path")
@@ -75,6 +78,7 @@ class PluginHelper:
         self.logger.info("Finished: apply_path")
         return status
 
+    @ChangesWorkingDir
     def checkout(self, branch="master", version="HEAD"):
         """ Checkout a specific version and branch of a repo """
         self.logger.info("Starting: checkout")
@@ -99,6 +103,7 @@ class PluginHelper:
         self.logger.info("Finished: checkout")
         return response
 
+    @ChangesWorkingDir
     def clone(self, repo, user=None, pw=None):
         """ Clone the repository """
         self.logger.info("Starting: clone")
@@ -219,6 +224,7 @@ class PluginHelper:
                 matches.append((match, match_version))
         return matches
 
+    @ChangesWorkingDir
     def start_sections(self,
                        s,
                        files,
@@ -229,6 +235,13 @@ class PluginHelper:
         """ Run through sections for prep_start """
         tool_d = {}
         status = (True, None)
+        manifest = Template(self.manifest)
+        records = manifest.tool_records()
+        # get temporary name for links, etc.
+        tmp_names = []
+        for record in records.values():
+            if record.link_name is not None and record.image_name is not None:
+                tmp_names.append((record.image_name, record.link_name))
         for section in s:
             # initialize needed vars
             c_name = s[section]['image_name'].replace(':', '-')
@@ -252,13 +265,12 @@ class PluginHelper:
                               'name': c_name}
             # get rid of all commented sections in various runtime
             # configurations
-            manifest = Template(self.manifest)
+            record = records[section]
             overall_dict = {}
-            for setting in ['info', 'docker', 'gpu', 'settings', 'service']:
-                option = manifest.option(section, setting)
-                if option[0]:
+            for setting in ToolRecord.JSON_OPTIONS:
+                if manifest.option(section, setting)[0]:
                     overall_dict[setting] = {}
-                    settings_dict = json.loads(option[1])
+                    settings_dict = getattr(record, setting)
                     for opt in settings_dict:
                         if not opt.startswith('#'):
                             overall_dict[setting][opt] = \
@@ -306,7 +318,7 @@ class PluginHelper:
             # check for gpu settings
             if 'gpu' in overall_dict:
                 try:
-                    options_dict = json.loads(status[1])
+                    options_dict = overall_dict['gpu']
                     for option in options_dict:
                         tool_d[c_name]['labels']['gpu.'+option] = options_dict[option]
                 except Exception as e:   # pragma: no cover
@@ -314,22 +326,14 @@ class PluginHelper:
                                       "docker: " + str(e))
 
             # get temporary name for links, etc.
-            plugin_c = Template(template=self.manifest)
-            status, plugin_sections = plugin_c.sections()
-            self.logger.info(status)
-            for plugin_section in plugin_sections:
-                status = plugin_c.option(plugin_section, "link_name")
-                self.logger.info(status)
-                image_status = plugin_c.option(plugin_section, "image_name")
-                self.logger.info(image_status)
-                if status[0] and image_status[0]:
-                    cont_name = image_status[1].replace(':', '-')
-                    cont_name = cont_name.replace('/', '-')
-                    if cont_name not in tool_d:
-                        tool_d[cont_name] = {'image': image_status[1],
-                                             'name': cont_name,
-                                             'start': False}
-                    tool_d[cont_name]['tmp_name'] = status[1]
+            for t_image, tmp_name in tmp_names:
+                cont_name = t_image.replace(':', '-')
+                cont_name = cont_name.replace('/', '-')
+                if cont_name not in tool_d:
+                    tool_d[cont_name] = {'image': t_image,
+                                         'name': cont_name,
+                                         'start': False}
+                tool_d[cont_name]['tmp_name'] = tmp_name
 
             # add extra labels
             tool_d[c_name]['labels']['vent'] = Version()
@@ -586,7 +590,8 @@ class PluginHelper:
         self.logger.info("Finished: prep_start")
         return status
 
-    def start_priority_containers(self, groups, group_orders, tool_d):
+    def start_priority_containers(self, groups, group_orders, tool_d,
+                                  manifest=None):
         """ Select containers based on priorities to start """
         vent_cfg = Template(self.path_dirs.cfg_file)
         cfg_groups = vent_cfg.option('groups', 'start_order')
@@ -608,7 +613,8 @@ class PluginHelper:
                         s_conts, f_conts = self.start_containers(cont_t[1],
                                                                  tool_d,
                                                                  s_conts,
-                                                                 f_conts)
+                                                                 f_conts,
+                                                                 manifest)
         # start tools that haven't been specified in the vent.cfg, if any
         for group in all_groups:
             if group in group_orders:
@@ -617,10 +623,12 @@ class PluginHelper:
                         s_conts, f_conts = self.start_containers(cont_t[1],
                                                                  tool_d,
                                                                  s_conts,
-                                                                 f_conts)
+                                                                 f_conts,
+                                                                 manifest)
         return (s_conts, f_conts)
 
-    def start_remaining_containers(self, containers_remaining, tool_d):
+    def start_remaining_containers(self, containers_remaining, tool_d,
+                                   manifest=None):
         """
         Select remaining containers that didn't have priorities to start
         """
@@ -630,19 +638,26 @@ class PluginHelper:
             s_containers, f_containers = self.start_containers(container,
                                                                tool_d,
                                                                s_containers,
-                                                               f_containers)
+                                                               f_containers,
+                                                               manifest)
         return (s_containers, f_containers)
 
     def start_containers(self,
                          container,
                          tool_d,
                          s_containers,
-                         f_containers):
-        """ Start container that was passed in and return status """
+                         f_containers,
+                         manifest=None):
+        """
+        Start container that was passed in and return status, the manifest
+        may be passed in so that starting many containers in a transaction
+        only writes it once
+        """
         # use section to add info to manifest
         section = tool_d[container]['section']
         del tool_d[container]['section']
-        manifest = Template(self.manifest)
+        if manifest is None:
+            manifest = Template(self.manifest)
         try:
             c = self.d_client.containers.get(container)
             c.start()
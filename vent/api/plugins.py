@@ -1,22 +1,35 @@
-import docker
 import json
 import os
 import shlex
+import threading
 import yaml
 
 from datetime import datetime
-from os import chdir, getcwd
+from os import chdir
 from os.path import isdir, join
 from subprocess import check_output, STDOUT
 
+try:
+    # python2
+    import Queue
+except ImportError:  # pragma: no cover
+    # python3
+    import queue as Queue
+
+from vent.api.image_build import StreamBuild
 from vent.api.plugin_helpers import PluginHelper
 from vent.api.templates import Template
+from vent.helpers.clients import DockerClient
 from vent.helpers.errors import ErrorHandler
 from vent.helpers.logs import Logger
 from vent.helpers.meta import ParsedSections
 from vent.helpers.meta import Timestamp
+from vent.helpers.paths import ChangesWorkingDir
 from vent.helpers.paths import PathDirs
 
+# images built at the same time, unless set in vent.cfg
+BUILD_WORKERS = 4
+
 
 class Plugin:
     """
@@ -28,10 +41,11 @@ class Plugin:
         self.manifest = join(self.path_dirs.meta_dir,
                              "plugin_manifest.cfg")
         self.p_helper = PluginHelper(**kargs)
-        self.d_client = docker.from_env()
+        self.d_client = DockerClient(self.path_dirs.cfg_file)
         self.logger = Logger(__name__)
         self.plugin_config_file = self.path_dirs.plugin_config_file
 
+    @ChangesWorkingDir
     def add(self, repo, tools=None, overrides=None, version="HEAD",
             branch="master", build=True, user=None, pw=None, groups=None,
             version_alias=None, wild=None, remove_old=True, disable_old=True,
@@ -199,9 +213,10 @@ class Plugin:
                 section,
                 build=None,
                 branch=None,
-                version=None):
+                version=None,
+                progress=None):
         """
-        Build tools
+        Build tools, progress is called as the image builds, see StreamBuild
         """
 
         self.logger.info("Starting: builder")
@@ -226,17 +241,14 @@ class Plugin:
         elif not hasattr(self, 'version'):
             self.version = 'HEAD'
 
-        cwd = getcwd()
-        self.logger.info("current working directory: " + str(cwd))
-        try:
-            chdir(match_path)
-        except Exception as e:  # pragma: no cover
-            self.logger.error("unable to change to directory: " +
-                              str(match_path) + " because: " + str(e))
+        # images are built in their directory without changing to it
+        if not isdir(match_path):
+            self.logger.error("unable to build in directory: " +
+                              str(match_path) + " because it doesn't exist")
             return None
 
-        template = self._build_image(template, match_path, image_name, section)
-        chdir(cwd)
+        template = self._build_image(template, match_path, image_name, section,
+                                     progress=progress)
 
         # get untagged images
         untagged = None
@@ -334,193 +346,388 @@ class Plugin:
         self.logger.info("Starting: _build_manifest")
         # !! TODO check for pre-existing that conflict with request and
         #         disable and/or remove image
+        template = Template(template=self.manifest)
+        # remove the .git for adding repo info to manifest
+        if self.repo.endswith('.git'):
+            self.repo = self.repo[:-4]
+        # the repo is checked out once for each version wanted, and the tools
+        # at that version are built together before moving on to the next
+        versions = []
         for match in matches:
-            # keep track of whether or not to write an additional manifest
-            # entry for multiple instances, and how many additional entries
-            # to write
-            addtl_entries = 0
-            # remove the .git for adding repo info to manifest
-            if self.repo.endswith('.git'):
-                self.repo = self.repo[:-4]
-            # remove @ in match for template setting purposes
-            if match[0].find('@') >= 0:
-                true_name = match[0].split('@')[1]
-            else:
-                true_name = match[0]
-            template = Template(template=self.manifest)
-            # TODO check for special settings here first for the specific match
-            self.version = match[1]
+            if match[1] not in versions:
+                versions.append(match[1])
+        for version in versions:
+            self.version = version
             response = self.p_helper.checkout(branch=self.branch,
                                               version=self.version)
-            if response[0]:
-                section = self.org + ":" + self.name + ":" + true_name + ":"
-                section += self.branch + ":" + self.version
-                # need to get rid of temp identifiers for tools in same repo
-                match_path = self.path + match[0].split('@')[0]
-                if not self.core:
-                    image_name = self.org + "-" + self.name + "-"
-                    if match[0] != '':
-                        # if tool is in a subdir, add that to the name of the
-                        # image
-                        image_name += '-'.join(match[0].split('/')[1:]) + "-"
-                    image_name += self.branch + ":" + self.version
-                else:
-                    image_name = ('cyberreboot/vent-' +
-                                  match[0].split('/')[-1] + ':' + self.branch)
-                image_name = image_name.replace('_', '-')
-
-                # check if the section already exists
-                exists, options = template.section(section)
-                previous_commit = None
-                previous_commits = None
-                head = False
-                if exists:
-                    for option in options:
-                        # TODO check if tool name but a different version
-                        #      exists - then disable/remove if set
-                        if option[0] == 'version' and option[1] == 'HEAD':
-                            head = True
-                        if option[0] == 'built' and option[1] == 'yes':
-                            # !! TODO remove pre-existing image
-                            pass
-                        if option[0] == 'commit_id':
-                            previous_commit = option[1]
-                        if option[0] == 'previous_versions':
-                            previous_commits = option[1]
-
-                # check if tool comes from multi directory
-                multi_tool = "no"
-                if match[0].find('@') >= 0:
-                    multi_tool = "yes"
-
-                # !! TODO
-                # check if section should be removed from config i.e. all tools
-                # but new commit removed one that was in a previous commit
-
-                image_name = image_name.lower()
-                if image_name.endswith(":head"):
-                    image_name = image_name.split(":head")[0] + ":HEAD"
-
-                # set template section & options for tool at version and branch
-                template.add_section(section)
-                template.set_option(section, "name", true_name.split('/')[-1])
-                template.set_option(section, "namespace", self.org + '/' +
-                                    self.name)
-                template.set_option(section, "path", match_path)
-                template.set_option(section, "repo", self.repo)
-                template.set_option(section, "enabled", "yes")
-                template.set_option(section, "multi_tool", multi_tool)
-                template.set_option(section, "branch", self.branch)
-                template.set_option(section, "version", self.version)
-                template.set_option(section, "last_updated",
-                                    str(datetime.utcnow()) + " UTC")
-                template.set_option(section, "image_name",
-                                    image_name.replace('@', '-'))
-                template.set_option(section, "type", "repository")
-                # save settings in vent.template to plugin_manifest
-                # watch for multiple tools in same directory
-                # just wanted to store match path with @ for path for use in
-                # other actions
-                tool_template = 'vent.template'
-                if match[0].find('@') >= 0:
-                    tool_template = match[0].split('@')[1] + '.template'
-                vent_template_path = join(match_path, tool_template)
-                if os.path.exists(vent_template_path):
-                    with open(vent_template_path) as f:
-                        vent_template_val = f.read()
-                else:
-                    vent_template_val = ''
-                settings_dict = ParsedSections(vent_template_val)
-                for setting in settings_dict:
-                    template.set_option(section, setting,
-                                        json.dumps(settings_dict[setting]))
-                # TODO do we need this if we save as a dictionary?
-                vent_template = Template(vent_template_path)
-                vent_status, response = vent_template.option("info", "name")
-                if vent_status:
-                    template.set_option(section, "link_name", response)
-                else:
-                    template.set_option(section,
-                                        "link_name",
-                                        true_name.split('/')[-1])
-                commit_id = None
-                if self.version == 'HEAD':
-                    # remove @ in multi-tools
-                    chdir(match_path)
-                    cmd = "git rev-parse --short HEAD"
-                    commit_id = check_output(shlex.split(cmd),
-                                             stderr=STDOUT,
-                                             close_fds=True).strip()
-                    template.set_option(section, "commit_id", commit_id)
-                if head:
-                    # no need to store previous commits if not HEAD, since
-                    # the version will always be the same commit ID
-                    if previous_commit and previous_commit != commit_id:
-                        if (previous_commits and
-                           previous_commit not in previous_commits):
-                            previous_commits = (previous_commit +
-                                                ',' +
-                                                previous_commits)
-                        elif not previous_commits:
-                            previous_commits = previous_commit
-                    if previous_commits and previous_commits != commit_id:
-                        template.set_option(section,
-                                            "previous_versions",
-                                            previous_commits)
-
-                if self.version_alias:
-                    template.set_option(section,
-                                        "version_alias",
-                                        self.version_alias)
-                if self.groups:
-                    template.set_option(section, "groups", self.groups)
-                else:
-                    groups = vent_template.option("info", "groups")
-                    if groups[0]:
-                        template.set_option(section, "groups", groups[1])
-                    # set groups to empty string if no groups defined for tool
-                    else:
-                        template.set_option(section, "groups", '')
-                template = self._build_image(template,
-                                             match_path,
-                                             image_name,
-                                             section)
-                # write additional entries for multiple instances
-                if addtl_entries > 0:
-                    # add 2 for naming conventions
-                    for i in range(2, addtl_entries + 2):
-                        addtl_section = section.rsplit(':', 2)
-                        addtl_section[0] += str(i)
-                        addtl_section = ':'.join(addtl_section)
-                        template.add_section(addtl_section)
-                        orig_vals = template.section(section)[1]
-                        for val in orig_vals:
-                            template.set_option(addtl_section, val[0], val[1])
-                        template.set_option(addtl_section, "name",
-                                            true_name.split('/')[-1]+str(i))
-
-            # write out configuration to the manifest file
-            template.write_config()
+            if not response[0]:
+                continue
+            commit_id = None
+            if self.version == 'HEAD':
+                cmd = "git rev-parse --short HEAD"
+                commit_id = check_output(shlex.split(cmd),
+                                         stderr=STDOUT,
+                                         close_fds=True,
+                                         cwd=self.path).strip()
+            jobs = []
+            for match in matches:
+                if match[1] != version:
+                    continue
+                jobs.append(self._manifest_entry(template, match, commit_id))
+            for job, result in zip(jobs, self._run_image_jobs(jobs)):
+                template = self._save_image_job(template, job, result)
+
+        # write out configuration for all matches to the manifest file at once
+        template.write_config()
 
         # reset to repo directory
         chdir(self.path)
         self.logger.info("Finished: _build_manifest")
         return
 
+    def _manifest_entry(self, template, match, commit_id):
+        """
+        Sets the manifest section of a tool from the repo checked out at its
+        version, and returns what's needed to build its image
+        """
+        # keep track of whether or not to write an additional manifest
+        # entry for multiple instances, and how many additional entries
+        # to write
+        addtl_entries = 0
+        # remove @ in match for template setting purposes
+        if match[0].find('@') >= 0:
+            true_name = match[0].split('@')[1]
+        else:
+            true_name = match[0]
+        # TODO check for special settings here first for the specific match
+        section = self.org + ":" + self.name + ":" + true_name + ":"
+        section += self.branch + ":" + self.version
+        # need to get rid of temp identifiers for tools in same repo
+        match_path = self.path + match[0].split('@')[0]
+        if not self.core:
+            image_name = self.org + "-" + self.name + "-"
+            if match[0] != '':
+                # if tool is in a subdir, add that to the name of the
+                # image
+                image_name += '-'.join(match[0].split('/')[1:]) + "-"
+            image_name += self.branch + ":" + self.version
+        else:
+            image_name = ('cyberreboot/vent-' +
+                          match[0].split('/')[-1] + ':' + self.branch)
+        image_name = image_name.replace('_', '-')
+
+        # check if the section already exists
+        exists, options = template.section(section)
+        previous_commit = None
+        previous_commits = None
+        head = False
+        if exists:
+            for option in options:
+                # TODO check if tool name but a different version
+                #      exists - then disable/remove if set
+                if option[0] == 'version' and option[1] == 'HEAD':
+                    head = True
+                if option[0] == 'built' and option[1] == 'yes':
+                    # !! TODO remove pre-existing image
+                    pass
+                if option[0] == 'commit_id':
+                    previous_commit = option[1]
+                if option[0] == 'previous_versions':
+                    previous_commits = option[1]
+
+        # check if tool comes from multi directory
+        multi_tool = "no"
+        if match[0].find('@') >= 0:
+            multi_tool = "yes"
+
+        # !! TODO
+        # check if section should be removed from config i.e. all tools
+        # but new commit removed one that was in a previous commit
+
+        image_name = image_name.lower()
+        if image_name.endswith(":head"):
+            image_name = image_name.split(":head")[0] + ":HEAD"
+
+        # set template section & options for tool at version and branch
+        template.add_section(section)
+        template.set_option(section, "name", true_name.split('/')[-1])
+        template.set_option(section, "namespace", self.org + '/' +
+                            self.name)
+        template.set_option(section, "path", match_path)
+        template.set_option(section, "repo", self.repo)
+        template.set_option(section, "enabled", "yes")
+        template.set_option(section, "multi_tool", multi_tool)
+        template.set_option(section, "branch", self.branch)
+        template.set_option(section, "version", self.version)
+        template.set_option(section, "last_updated",
+                            str(datetime.utcnow()) + " UTC")
+        template.set_option(section, "image_name",
+                            image_name.replace('@', '-'))
+        template.set_option(section, "type", "repository")
+        # save settings in vent.template to plugin_manifest
+        # watch for multiple tools in same directory
+        # just wanted to store match path with @ for path for use in
+        # other actions
+        tool_template = 'vent.template'
+        if match[0].find('@') >= 0:
+            tool_template = match[0].split('@')[1] + '.template'
+        vent_template_path = join(match_path, tool_template)
+        if os.path.exists(vent_template_path):
+            with open(vent_template_path) as f:
+                vent_template_val = f.read()
+        else:
+            vent_template_val = ''
+        settings_dict = ParsedSections(vent_template_val)
+        for setting in settings_dict:
+            template.set_option(section, setting,
+                                json.dumps(settings_dict[setting]))
+        # TODO do we need this if we save as a dictionary?
+        vent_template = Template(vent_template_path)
+        vent_status, response = vent_template.option("info", "name")
+        if vent_status:
+            template.set_option(section, "link_name", response)
+        else:
+            template.set_option(section,
+                                "link_name",
+                                true_name.split('/')[-1])
+        if commit_id is not None:
+            template.set_option(section, "commit_id", commit_id)
+        if head:
+            # no need to store previous commits if not HEAD, since
+            # the version will always be the same commit ID
+            if previous_commit and previous_commit != commit_id:
+                if (previous_commits and
+                   previous_commit not in previous_commits):
+                    previous_commits = (previous_commit +
+                                        ',' +
+                                        previous_commits)
+                elif not previous_commits:
+                    previous_commits = previous_commit
+            if previous_commits and previous_commits != commit_id:
+                template.set_option(section,
+                                    "previous_versions",
+                                    previous_commits)
+
+        if self.version_alias:
+            template.set_option(section,
+                                "version_alias",
+                                self.version_alias)
+        if self.groups:
+            template.set_option(section, "groups", self.groups)
+        else:
+            groups = vent_template.option("info", "groups")
+            if groups[0]:
+                template.set_option(section, "groups", groups[1])
+            # set groups to empty string if no groups defined for tool
+            else:
+                template.set_option(section, "groups", '')
+        # write additional entries for multiple instances
+        if addtl_entries > 0:
+            # add 2 for naming conventions
+            for i in range(2, addtl_entries + 2):
+                addtl_section = section.rsplit(':', 2)
+                addtl_section[0] += str(i)
+                addtl_section = ':'.join(addtl_section)
+                template.add_instance(addtl_section, section,
+                                      true_name.split('/')[-1] +
+                                      str(i))
+        return self._image_job(template, match_path, image_name, section)
+
+    def _build_workers(self):
+        """ Returns how many images are built at once, set in vent.cfg """
+        workers = Template(template=self.path_dirs.cfg_file).option(
+            'build', 'workers')
+        if workers[0]:
+            try:
+                return max(1, int(workers[1]))
+            except ValueError:
+                pass
+        return BUILD_WORKERS
+
+    def _run_image_jobs(self, jobs):
+        """
+        Runs the builds of several images, as many at once as the workers set
+        in vent.cfg, and returns their results in the same order
+        """
+        results = [None] * len(jobs)
+        pending = Queue.Queue()
+        for i, job in enumerate(jobs):
+            pending.put((i, job))
+
+        def work():
+            while True:
+                try:
+                    i, job = pending.get(False)
+                except Queue.Empty:
+                    return
+                try:
+                    results[i] = self._run_image_job(job)
+                except Exception as e:
+                    # fail only this job, the others keep building
+                    self.logger.error("unable to build image for: " +
+                                      str(job.get('section')) +
+                                      " because: " + str(e))
+                    results[i] = {'built': 'failed', 'status': (False, str(e))}
+
+        threads = [threading.Thread(target=work) for _ in
+                   range(min(self._build_workers(), len(jobs)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
     def _build_image(self,
                      template,
                      match_path,
                      image_name,
                      section,
-                     build_local=False):
+                     build_local=False,
+                     progress=None):
         """
-        Build docker images and store results in template
+        Build docker images and store results in template, progress is
+        passed on to StreamBuild
         """
         self.logger.info("Starting: _build_image")
-        status = True
+        job = self._image_job(template, match_path, image_name, section,
+                              build_local=build_local, progress=progress)
+        result = self._run_image_job(job)
+        template = self._save_image_job(template, job, result)
+        self.logger.info("Status of _build_image: " + str(result['status']))
+        self.logger.info("Finished: _build_image:")
+        return template
+
+    def _image_job(self,
+                   template,
+                   match_path,
+                   image_name,
+                   section,
+                   build_local=False,
+                   progress=None):
+        """
+        Returns what's needed from the template to build or pull the image of
+        a section, so it can be built without the template
+        """
+        job = {'section': section, 'match_path': match_path,
+               'image_name': image_name, 'build_local': build_local,
+               'build': self.build, 'version': self.version,
+               'progress': progress}
+        # determine whether a tool should be considered a multi instance
+        try:
+            settings_dict = template.tool_records([section])[section].settings
+            job['multi_instance'] = int(settings_dict['instances']) > 1
+        except Exception:
+            job['multi_instance'] = False
+        if not self.build:
+            return job
+        name = template.option(section, "name")
+        groups = template.option(section, "groups")
+        job['repo'] = template.option(section, "repo")[1]
+        job['type'] = template.option(section, "type")[1]
+        path = template.option(section, "path")
+        self.fill_config(path[1])
+        if groups[1] == "" or not groups[0]:
+            groups = (True, "none")
+        job['groups'] = groups[1]
+        if not name[0]:
+            name = (True, image_name)
+        job['name'] = name[1]
+        # see if additional tags needed for images tagged at HEAD
+        job['tags'] = []
+        if image_name.replace('@', '-').endswith('HEAD'):
+            commit_id = template.option(section, "commit_id")
+            if commit_id[0]:
+                job['tags'].append(image_name.replace('@', '-')[:-4] +
+                                   str(commit_id[1]))
+        # see if additional file arg needed for building multiple
+        # images from same directory
+        job['dockerfile'] = None
+        multi_tool = template.option(section, 'multi_tool')
+        if multi_tool[0] and multi_tool[1] == 'yes':
+            specific_file = template.option(section, 'name')[1]
+            if specific_file == 'unspecified':
+                job['dockerfile'] = "Dockerfile"
+            else:
+                job['dockerfile'] = "Dockerfile." + specific_file
+        return job
+
+    def _run_image_job(self, job):
+        """
+        Pulls or builds the image of a job from _image_job in the directory
+        of its tool. Only uses the job, so several can run at once
+        """
+        if not job['build']:
+            return {'built': 'no', 'status': True}
+        image_name = job['image_name']
+        result = {'built': 'failed', 'status': False}
+        try:
+            # pull if '/' in image_name, fallback to build; pulls still
+            # shell out to the docker cli, whose output is logged as is,
+            # while builds go through the docker SDK
+            if '/' in image_name and not job['build_local']:
+                try:
+                    self.logger.info("Trying to pull " + image_name)
+                    output = check_output(shlex.split("docker pull " +
+                                                      image_name),
+                                          stderr=STDOUT,
+                                          close_fds=True,
+                                          cwd=job['match_path'])
+                    self.logger.info("Pulling " + job['name'] + "\n" +
+                                     str(output))
+
+                    i_attrs = self.d_client.images.get(image_name).attrs
+                    image_id = i_attrs['Id'].split(':')[1][:12]
+
+                    if image_id:
+                        result = {'built': 'yes', 'image_id': image_id,
+                                  'status': (True, "Pulled " + image_name)}
+                        self.logger.info(str(result['status']))
+                    else:
+                        result['status'] = (False, "Failed to pull image " +
+                                            str(output.split('\n')[-1]))
+                        self.logger.warning(str(result['status']))
+                    return result
+                except Exception as e:  # pragma: no cover
+                    self.logger.warning("Failed to pull image, going to"
+                                        " build instead: " + str(e))
+            image_name = image_name.replace('@', '-')
+            # update image name with new version for update
+            image_name = image_name.rsplit(':', 1)[0] + ':' + job['version']
+            labels = {'vent': '',
+                      'vent.section': job['section'],
+                      'vent.repo': job['repo'],
+                      'vent.type': job['type'],
+                      'vent.name': job['name'],
+                      'vent.groups': job['groups']}
+            status = StreamBuild(self.d_client, job['match_path'],
+                                 image_name, labels=labels,
+                                 dockerfile=job['dockerfile'],
+                                 tags=job['tags'],
+                                 progress=job['progress'],
+                                 logger=self.logger)
+            if status[0]:
+                result = {'built': 'yes', 'image_id': status[1],
+                          'status': True}
+            else:
+                self.logger.error("unable to build image: " +
+                                  str(image_name) + " because: " +
+                                  status[1])
+                result['status'] = status
+        except Exception as e:  # pragma: no cover
+            self.logger.error("unable to build image: " + str(image_name) +
+                              " because: " + str(e))
+        return result
+
+    def _save_image_job(self, template, job, result):
+        """ Stores the result of building the image of a job in template """
+        section = job['section']
 
         def set_instances(template, section, built, image_id=None):
-            """ Set build information for multiple instances """
+            """
+            Set build information for multiple instances, instances that
+            inherit from section already have it
+            """
             self.logger.info("entering set_instances")
             i = 2
             while True:
@@ -528,159 +735,27 @@ class Plugin:
                 addtl_section[0] += str(i)
                 addtl_section = ':'.join(addtl_section)
                 self.logger.info(addtl_section)
-                if template.section(addtl_section)[0]:
+                if not template.section(addtl_section)[0]:
+                    break
+                if not template.option(addtl_section, 'inherits')[0]:
                     template.set_option(addtl_section, "built", built)
                     if image_id:
                         template.set_option(addtl_section, "image_id",
                                             image_id)
                     template.set_option(addtl_section,
                                         "last_updated", Timestamp())
-                else:
-                    break
                 i += 1
 
-        # determine whether a tool should be considered a multi instance
-        try:
-            settings_dict = json.loads(template.option(section, 'settings')[1])
-            if int(settings_dict['instances']) > 1:
-                multi_instance = True
-            else:
-                multi_instance = False
-        except Exception:
-            multi_instance = False
-            status = False
-        # !! TODO return status of whether it built successfully or not
-        if self.build:
-            cwd = getcwd()
-            chdir(match_path)
-            try:
-                # currently can't use docker-py because it doesn't support
-                # labels on images yet
-                name = template.option(section, "name")
-                groups = template.option(section, "groups")
-                repo = template.option(section, "repo")
-                t_type = template.option(section, "type")
-                path = template.option(section, "path")
-                self.fill_config(path[1])
-                if groups[1] == "" or not groups[0]:
-                    groups = (True, "none")
-                if not name[0]:
-                    name = (True, image_name)
-                # pull if '/' in image_name, fallback to build
-                pull = False
-                if '/' in image_name and not build_local:
-                    try:
-                        self.logger.info("Trying to pull " + image_name)
-                        output = check_output(shlex.split("docker pull " +
-                                                          image_name),
-                                              stderr=STDOUT,
-                                              close_fds=True)
-                        self.logger.info("Pulling " + name[1] + "\n" +
-                                         str(output))
-
-                        i_attrs = self.d_client.images.get(image_name).attrs
-                        image_id = i_attrs['Id'].split(':')[1][:12]
-
-                        if image_id:
-                            template.set_option(section, "built", "yes")
-                            template.set_option(section, "image_id", image_id)
-                            template.set_option(section, "last_updated",
-                                                str(datetime.utcnow()) +
-                                                " UTC")
-                            # set other instances too
-                            if multi_instance:
-                                set_instances(template, section, 'yes',
-                                              image_id)
-                            status = (True, "Pulled " + image_name)
-                            self.logger.info(str(status))
-                        else:
-                            template.set_option(section, "built", "failed")
-                            template.set_option(section, "last_updated",
-                                                str(datetime.utcnow()) +
-                                                " UTC")
-                            # set other instances too
-                            if multi_instace:
-                                set_instances(template, section, 'failed')
-                            status = (False, "Failed to pull image " +
-                                      str(output.split('\n')[-1]))
-                            self.logger.warning(str(status))
-                        pull = True
-                    except Exception as e:  # pragma: no cover
-                        self.logger.warning("Failed to pull image, going to"
-                                            " build instead: " + str(e))
-                        status = False
-                if not pull:
-                    # see if additional tags needed for images tagged at HEAD
-                    commit_tag = ""
-                    image_name = image_name.replace('@', '-')
-                    if image_name.endswith('HEAD'):
-                        commit_id = template.option(section, "commit_id")
-                        if commit_id[0]:
-                            commit_tag = (" -t " + image_name[:-4] +
-                                          str(commit_id[1]))
-                    # see if additional file arg needed for building multiple
-                    # images from same directory
-                    file_tag = " ."
-                    multi_tool = template.option(section, 'multi_tool')
-                    if multi_tool[0] and multi_tool[1] == 'yes':
-                        specific_file = template.option(section, 'name')[1]
-                        if specific_file == 'unspecified':
-                            file_tag = " -f Dockerfile ."
-                        else:
-                            file_tag = " -f Dockerfile." + specific_file + " ."
-                    # update image name with new version for update
-                    image_name = image_name.rsplit(':', 1)[0]+':'+self.version
-                    output = check_output(shlex.split("docker build --label"
-                                                      " vent --label"
-                                                      " vent.section=" +
-                                                      section + " --label"
-                                                      " vent.repo=" +
-                                                      repo[1] + " --label"
-                                                      " vent.type=" +
-                                                      t_type[1] + " --label"
-                                                      " vent.name=" +
-                                                      name[1] + " --label"
-                                                      " vent.groups=" +
-                                                      groups[1] + " -t " +
-                                                      image_name +
-                                                      commit_tag + file_tag),
-                                          stderr=STDOUT,
-                                          close_fds=True)
-                    self.logger.info("Building " + name[1] + "\n" +
-                                     str(output))
-                    image_id = ""
-                    for line in output.split("\n"):
-                        suc_str = "Successfully built "
-                        if line.startswith(suc_str):
-                            image_id = line.split(suc_str)[1].strip()
-                    template.set_option(section, "built", "yes")
-                    template.set_option(section, "image_id", image_id)
-                    template.set_option(section, "last_updated",
-                                        str(datetime.utcnow()) +
-                                        " UTC")
-                    # set other instances too
-                    if multi_instance:
-                        set_instances(template, section, 'yes', image_id)
-            except Exception as e:  # pragma: no cover
-                self.logger.error("unable to build image: " + str(image_name) +
-                                  " because: " + str(e))
-                template.set_option(section, "built", "failed")
-                template.set_option(section, "last_updated",
-                                    str(datetime.utcnow()) + " UTC")
-                if multi_instance:
-                    set_instances(template, section, 'failed')
-                status = False
-
-            chdir(cwd)
-        else:
-            template.set_option(section, "built", "no")
-            template.set_option(section, "last_updated",
-                                str(datetime.utcnow()) + " UTC")
-            if multi_instance:
-                set_instances(template, section, 'no')
+        template.set_option(section, "built", result['built'])
+        if 'image_id' in result:
+            template.set_option(section, "image_id", result['image_id'])
+        template.set_option(section, "last_updated",
+                            str(datetime.utcnow()) + " UTC")
+        # set other instances too
+        if job['multi_instance']:
+            set_instances(template, section, result['built'],
+                          result.get('image_id'))
         template.set_option(section, 'running', 'no')
-        self.logger.info("Status of _build_image: " + str(status))
-        self.logger.info("Finished: _build_image:")
         return template
 
     def list_tools(self):
@@ -724,12 +799,12 @@ class Plugin:
 
         # get resulting dict of sections with options that match constraints
         results, template = self.p_helper.constraint_options(args, [])
+        records = template.tool_records(results.keys())
         for result in results:
             response, image_name = template.option(result, 'image_name')
             name = template.option(result, 'name')[1]
             try:
-                settings_dict = json.loads(template.option(result,
-                                                           'settings')[1])
+                settings_dict = records[result].settings
                 instances = int(settings_dict['instances'])
             except Exception:
                 instances = 1
@@ -1,3 +1,12 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+from contextlib import contextmanager
+
 try:
     # python2
     import ConfigParser
@@ -5,17 +14,545 @@ except ImportError:  # pragma: no cover
     # python3
     import configparser as ConfigParser
 
+from vent.api.dependencies import DependencyGraph
+from vent.api.manifest_journal import Journal
+from vent.api.manifest_snapshot import compile_routes
+from vent.api.manifest_snapshot import Snapshot
+from vent.api.manifest_store import ManifestStore
 from vent.helpers.errors import ErrorHandler
 
 
+# process-wide cache of parsed templates, maps an absolute path to a tuple of
+# (file identity, parsed config, derived data such as the index); parsed
+# configs in the cache are never mutated, Template objects copy them the first
+# time they need to write
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+# when each entry in the cache was parsed
+_PARSED = {}
+# coarsest mtime granularity expected from a filesystem, in seconds
+RACY = 2
+# files written by more than one process, they live in vent's own directory so
+# their lock files are kept next to them; other templates, such as the ones in
+# plugin repos, are only locked between threads
+SHARED = ('plugin_manifest.cfg', 'vent.cfg')
+_THREAD_LOCKS = {}
+
+
+def _identity(path):
+    """
+    Returns the (inode, mtime, size) of a file or None if it can't be stat'd.
+    A rewrite of the same size within one mtime tick that reuses the inode
+    has the same identity, so a cached parse of a file modified less than
+    RACY seconds before it was parsed isn't trusted, see _racy
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+    return (stat.st_ino, mtime, stat.st_size)
+
+
+def _racy(path, identity):
+    """
+    Returns True if the cached parse of path was made too soon after the
+    file was modified to tell a later rewrite of it apart by its identity
+    """
+    mtime = identity[1]
+    if not isinstance(mtime, float):
+        mtime = mtime / 1e9
+    return _PARSED.get(path, 0) - mtime < RACY
+
+
+def _new_config():
+    """ Returns an empty case sensitive RawConfigParser """
+    config = ConfigParser.RawConfigParser()
+    config.optionxform = str
+    return config
+
+
+def _copy_config(config):
+    """ Returns a deep copy of a RawConfigParser """
+    clone = _new_config()
+    for section in config.sections():
+        clone.add_section(section)
+        for option, value in config.items(section):
+            clone.set(section, option, value)
+    return clone
+
+
+def _cached_config(path, journal=None):
+    """
+    Returns a shared parsed config for path along with the data derived from
+    it, only parsing the file again if its identity (inode, mtime, size)
+    changed since it was last parsed. If path has a journal, the journal's
+    offset before the parse is kept with the derived data
+    """
+    path = os.path.abspath(path)
+    derived = {}
+    if journal:
+        derived['offset'] = journal.offset()
+    identity = _identity(path)
+    if identity is None:
+        # missing files aren't cached, read for compatibility
+        config = _new_config()
+        config.read(path)
+        return config, derived, False, None
+    with _CACHE_LOCK:
+        entry = _CACHE.get(path)
+    if entry and entry[0] == identity and not _racy(path, identity):
+        return entry[1], entry[2], True, identity
+    parsed = time.time()
+    config = _new_config()
+    config.read(path)
+    # only cache if the file didn't change while it was being parsed
+    if _identity(path) == identity:
+        with _CACHE_LOCK:
+            _CACHE[path] = (identity, config, derived)
+            _PARSED[path] = parsed
+        return config, derived, True, identity
+    # the file changed during the parse, so there is no identity to compare
+    # against when writing changes back
+    return config, derived, False, None
+
+
+def _manifest_store(path):
+    """
+    Returns the ManifestStore backing path if it's a plugin manifest and the
+    vent.cfg next to it has `manifest_backend = sqlite` under [main]
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    if name != 'plugin_manifest.cfg':
+        return None
+    config = _cached_config(os.path.join(directory, 'vent.cfg'))[0]
+    if (not config.has_option('main', 'manifest_backend') or
+            config.get('main', 'manifest_backend') != 'sqlite'):
+        return None
+    store = ManifestStore(os.path.join(directory, 'plugin_manifest.db'))
+    if not store.generation() and os.path.exists(path):
+        # first use of the database, start from the existing manifest
+        store.import_ini(path, only_if_empty=True)
+    return store
+
+
+def _cached_store_config(store, journal):
+    """
+    Returns a shared config loaded from store along with the data derived
+    from it, only loading it again if the store's generation changed
+    """
+    identity = ('generation', store.generation())
+    with _CACHE_LOCK:
+        entry = _CACHE.get(store.path)
+    if entry and entry[0] == identity:
+        return entry[1], entry[2], True, identity
+    derived = {'offset': journal.offset()}
+    config = _new_config()
+    identity = ('generation', store.load(config))
+    with _CACHE_LOCK:
+        _CACHE[store.path] = (identity, config, derived)
+    return config, derived, True, identity
+
+
+def _manifest_journal(path):
+    """ Returns the Journal of changes to path if it's a plugin manifest """
+    directory, name = os.path.split(os.path.abspath(path))
+    if name != 'plugin_manifest.cfg':
+        return None
+    return Journal(os.path.join(directory, 'plugin_manifest.journal'))
+
+
+def _manifest_snapshot(path):
+    """ Returns the compiled Snapshot of path if it's a plugin manifest """
+    directory, name = os.path.split(os.path.abspath(path))
+    if name != 'plugin_manifest.cfg':
+        return None
+    return Snapshot(os.path.join(directory, 'plugin_manifest.snapshot'))
+
+
+def manifest_routes(path):
+    """
+    Returns the routing table compiled from the plugin manifest at path (see
+    compile_routes). The snapshot written along with the manifest is used if
+    it was compiled from what's in the file now, otherwise the table is
+    compiled from the cached parse of the manifest. Only the file and the
+    snapshot are read, never the database a manifest may be stored in, so
+    this works for workers that have them mounted read-only
+    """
+    path = os.path.abspath(path)
+    snapshot = _manifest_snapshot(path)
+    table = snapshot.load() if snapshot else None
+    identity = _identity(path)
+    if table is not None and table['manifest'] == identity:
+        return table
+    # read the file itself rather than opening its database or journal
+    manifest = Template()
+    manifest.template = path
+    manifest._load()
+    routes = manifest._derived.get('routes')
+    if routes is None or routes['manifest'] != manifest._identity:
+        routes = compile_routes(manifest.config.sections(),
+                                manifest.tool_records(),
+                                manifest._identity)
+        manifest._derived['routes'] = routes
+    return routes
+
+
+def invalidate(path=None):
+    """
+    Drops the cached parse of path, or of every file if no path is given
+    """
+    with _CACHE_LOCK:
+        if path:
+            _CACHE.pop(os.path.abspath(path), None)
+            _PARSED.pop(os.path.abspath(path), None)
+        else:
+            _CACHE.clear()
+            _PARSED.clear()
+
+
+@contextmanager
+def _locked(path):
+    """
+    Holds an exclusive lock on path, shared by threads and, for the SHARED
+    files in vent's directory, by processes. Other templates get no lock file
+    so nothing is left behind in the directories they live in
+    """
+    if os.path.basename(path) not in SHARED:
+        with _CACHE_LOCK:
+            lock = _THREAD_LOCKS.setdefault(path, threading.Lock())
+        with lock:
+            yield
+        return
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _write_atomic(path, config):
+    """
+    Writes config to a temporary file next to path and renames it over path,
+    so readers never see a partially written file
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + name + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as configfile:
+            config.write(configfile)
+            configfile.flush()
+            os.fsync(configfile.fileno())
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _replay(config, changes):
+    """ Applies a list of changes recorded by a Template to config """
+    for change in changes:
+        action, section = change[0], change[1]
+        if action == 'del_section':
+            config.remove_section(section)
+            continue
+        if not config.has_section(section):
+            config.add_section(section)
+        if action == 'set':
+            config.set(section, change[2], change[3])
+        elif action == 'del_option':
+            config.remove_option(section, change[2])
+
+
+# option naming the section that an instance of a tool inherits every option
+# it doesn't set itself from
+INHERITS = 'inherits'
+
+# options that are indexed together the first time a template is queried with
+# constrained_sections, other options are indexed when first constrained on
+INDEXED_OPTIONS = ['name', 'branch', 'version', 'repo', 'namespace', 'enabled',
+                   'type', 'built', 'running', 'groups', INHERITS]
+
+
+class _Index:
+    """
+    Inverted index of option values to the sections that have them, along
+    with an index of each comma separated group to the sections in it
+    """
+    def __init__(self):
+        # option -> value -> set of sections
+        self.values = {}
+        # group -> set of sections
+        self.groups = {}
+
+    def copy(self):
+        """ Returns a copy that can be changed independently """
+        clone = _Index()
+        for option in self.values:
+            clone.values[option] = dict((value, set(sections)) for
+                                        value, sections in
+                                        self.values[option].items())
+        clone.groups = dict((group, set(sections)) for group, sections in
+                            self.groups.items())
+        return clone
+
+    def build(self, sections, items, options):
+        """
+        Index any of options that aren't indexed yet in one pass, items
+        returns the (option, value) pairs of a section
+        """
+        new = set(options) - set(self.values)
+        if not new:
+            return
+        values = dict((option, {}) for option in new)
+        groups = {}
+        for section in sections:
+            for option, value in items(section):
+                if option in new:
+                    values[option].setdefault(value, set()).add(section)
+                    if option == 'groups' and value:
+                        for group in value.split(','):
+                            groups.setdefault(group, set()).add(section)
+        # publish after building so readers sharing the index never see a
+        # partially built option
+        if 'groups' in new:
+            self.groups = groups
+        self.values.update(values)
+
+    def add(self, section, option, value):
+        """ Record that section has option set to value """
+        if option in self.values:
+            self.values[option].setdefault(value, set()).add(section)
+            if option == 'groups' and value:
+                for group in value.split(','):
+                    self.groups.setdefault(group, set()).add(section)
+
+    def remove(self, section, option, value):
+        """ Forget that section has option set to value """
+        if option in self.values:
+            self._discard(self.values[option], value, section)
+            if option == 'groups' and value:
+                for group in value.split(','):
+                    self._discard(self.groups, group, section)
+
+    @staticmethod
+    def _discard(mapping, key, section):
+        sections = mapping.get(key)
+        if sections is not None:
+            sections.discard(section)
+            if not sections:
+                del mapping[key]
+
+    def lookup(self, option, value):
+        """ Returns the set of sections where option is exactly value """
+        return self.values[option].get(value, set())
+
+    def groups_containing(self, value):
+        """
+        Returns the set of sections whose groups contain value as a substring,
+        which is how group membership has always been matched
+        """
+        sections = set()
+        for groups, members in self.values['groups'].items():
+            if groups is not None and value in groups:
+                sections |= members
+        return sections
+
+
+class ToolRecord(object):
+    """
+    Decoded view of a tool's section in the plugin manifest. The JSON options
+    are decoded once, along with the links inside of the docker options, and
+    records are shared by everything reading the same version of the
+    manifest, so they must not be changed
+    """
+    __slots__ = ('section', 'name', 'namespace', 'branch', 'version', 'repo',
+                 'type', 'groups', 'enabled', 'built', 'running', 'link_name',
+                 'image_name', 'info', 'docker', 'gpu', 'settings', 'service',
+                 'links')
+    OPTIONS = __slots__[1:13]
+    # options holding JSON, a value that can't be decoded is left as None
+    JSON_OPTIONS = __slots__[13:18]
+
+    def __init__(self, section, items):
+        options = dict(items)
+        self.section = section
+        for option in self.OPTIONS:
+            setattr(self, option, options.get(option))
+        for option in self.JSON_OPTIONS:
+            value = None
+            if options.get(option) is not None:
+                try:
+                    value = json.loads(options[option])
+                except ValueError:
+                    pass
+            setattr(self, option, value)
+        self.links = ()
+        if isinstance(self.docker, dict) and 'links' in self.docker:
+            try:
+                self.links = tuple(json.loads(self.docker['links']))
+            except (TypeError, ValueError):
+                pass
+
+
 class Template:
     """ Handle parsing templates """
     def __init__(self, template=None):
-        self.config = ConfigParser.RawConfigParser()
-        self.config.optionxform = str
+        self.config = _new_config()
+        # whether self.config is shared with the cache and must be copied
+        # before it is changed
+        self._shared = False
+        # lazily built data derived from self.config, shared along with it
+        self._derived = {}
+        # identity of the file when it was read, to detect other writers
+        self._identity = None
+        # changes made since the file was read, as (action, section, ...)
+        self._changes = []
+        # depth of nested transactions and whether a write was deferred
+        self._depth = 0
+        self._pending = False
+        # the database backing a plugin manifest, if configured
+        self._store = None
+        # journal of changes written to a plugin manifest, and how far into
+        # it self.config is up to date
+        self._journal = None
+        self._offset = None
+        # compiled routing table of a plugin manifest for workers
+        self._snapshot = None
         if template:
-            self.config.read(template)
             self.template = template
+            self._store = _manifest_store(template)
+            self._journal = _manifest_journal(template)
+            self._snapshot = _manifest_snapshot(template)
+            self._load()
+
+    def _load(self):
+        """ Loads the template, sharing the cached copy if it's current """
+        if self._store:
+            (self.config, self._derived, self._shared,
+             self._identity) = _cached_store_config(self._store,
+                                                    self._journal)
+        else:
+            (self.config, self._derived, self._shared,
+             self._identity) = _cached_config(self.template, self._journal)
+        self._offset = self._derived.get('offset')
+
+    def _detach(self):
+        """ Take a private copy of a shared config before changing it """
+        if self._shared:
+            self.config = _copy_config(self.config)
+            index = self._derived.get('index')
+            records = self._derived.get('records')
+            self._derived = {}
+            if index:
+                self._derived['index'] = index.copy()
+            if records:
+                # records are never changed so they can still be shared
+                self._derived['records'] = dict(records)
+            self._shared = False
+
+    def _index(self, options=None):
+        """ Returns the index, making sure options are indexed """
+        index = self._derived.get('index')
+        if index is None:
+            index = _Index()
+            self._derived['index'] = index
+        index.build(self.config.sections(), self._items,
+                    INDEXED_OPTIONS + list(options or []))
+        return index
+
+    def _base(self, section):
+        """ Returns the section that section inherits options from, if any """
+        if self.config.has_option(section, INHERITS):
+            base = self.config.get(section, INHERITS)
+            if base != section and self.config.has_section(base):
+                return base
+        return None
+
+    def _children(self, section):
+        """ Returns the sections that inherit options from section """
+        if 'index' in self._derived:
+            return list(self._index().lookup(INHERITS, section))
+        return [child for child in self.config.sections() if
+                self.config.has_option(child, INHERITS) and
+                self.config.get(child, INHERITS) == section]
+
+    def _has(self, section, option):
+        """ Whether section has option, either set or inherited """
+        if self.config.has_option(section, option):
+            return True
+        base = self._base(section)
+        return base is not None and self.config.has_option(base, option)
+
+    def _get(self, section, option):
+        """ Returns the value of option in section, either set or inherited """
+        if self.config.has_option(section, option):
+            return self.config.get(section, option)
+        return self.config.get(self._base(section), option)
+
+    def _items(self, section):
+        """
+        Returns the (option, value) pairs of section, including the ones it
+        inherits
+        """
+        items = self.config.items(section)
+        base = self._base(section)
+        if base is None:
+            return items
+        own = dict(items)
+        merged = [(option, own.pop(option, value)) for option, value in
+                  self.config.items(base)]
+        return merged + [(option, value) for option, value in items if
+                         option in own]
+
+    def _affected(self, section, option):
+        """
+        Returns the (section, option) pairs whose values come from option in
+        section, which includes the sections inheriting it
+        """
+        if option == INHERITS:
+            return [(section, item[0]) for item in self._items(section)]
+        pairs = [(section, option)]
+        for child in self._children(section):
+            if not self.config.has_option(child, option):
+                pairs.append((child, option))
+        return pairs
+
+    def _unindex(self, section, option):
+        """ Remove the current value of option from the index """
+        index = self._derived.get('index')
+        if index:
+            for a_section, an_option in self._affected(section, option):
+                if self._has(a_section, an_option):
+                    index.remove(a_section, an_option,
+                                 self._get(a_section, an_option))
+        self._forget(section)
+
+    def _reindex(self, section, option):
+        """ Add the current value of option to the index """
+        index = self._derived.get('index')
+        if index:
+            for a_section, an_option in self._affected(section, option):
+                if self._has(a_section, an_option):
+                    index.add(a_section, an_option,
+                              self._get(a_section, an_option))
+        self._forget(section)
+
+    def _forget(self, section):
+        """ Drop the decoded records of a section that changed """
+        self._derived.pop('graph', None)
+        records = self._derived.get('records')
+        if records:
+            records.pop(section, None)
+            for child in self._children(section):
+                records.pop(child, None)
 
     @ErrorHandler
     def sections(self):
@@ -27,25 +564,35 @@ class Template:
         """ Returns a list of tuples of (option, value) for the section """
         # check if the named section exists
         if self.config.has_section(section):
-            return (True, self.config.items(section))
+            return (True, self._items(section))
         return (False, "Section: " + section + " does not exist")
 
     @ErrorHandler
     def options(self, section):
         """ Returns a list of options for a section """
         if self.config.has_section(section):
-            return (True, self.config.options(section))
+            return (True, [item[0] for item in self._items(section)])
         return (False, "Section: " + section + " does not exist")
 
     @ErrorHandler
     def option(self, section, option):
         """ Returns the value of the option """
         if self.config.has_section(section):
-            if self.config.has_option(section, option):
-                return (True, self.config.get(section, option))
+            if self._has(section, option):
+                return (True, self._get(section, option))
             return (False, "Option: " + option + " does not exist")
         return (False, "Section: " + section + " does not exist")
 
+    @ErrorHandler
+    def overrides(self, section):
+        """
+        Returns a list of the options set on the section itself rather than
+        inherited from the section it's an instance of
+        """
+        if self.config.has_section(section):
+            return (True, self.config.options(section))
+        return (False, "Section: " + section + " does not exist")
+
     @ErrorHandler
     def add_section(self, section):
         """
@@ -54,7 +601,9 @@ class Template:
         """
         # check if section already exists
         if not self.config.has_section(section):
+            self._detach()
             self.config.add_section(section)
+            self._changes.append(('add_section', section))
             # return updated sections
             return (True, self.config.sections())
         return (False, "Section: " + section + " already exists")
@@ -72,10 +621,14 @@ class Template:
                 return message
 
         if not self.config.has_option(section, option):
+            self._detach()
             if value:
                 self.config.set(section, option, value)
             else:
                 self.config.set(section, option)
+            self._changes.append(('set', section, option,
+                                  self.config.get(section, option)))
+            self._reindex(section, option)
             return(True, self.config.options(section))
         return(False, "Option: {} already exists @ {}".format(option, section))
 
@@ -83,16 +636,66 @@ class Template:
     def del_section(self, section):
         """ Deletes a section if it exists """
         if self.config.has_section(section):
+            self._detach()
+            # sections inheriting from this one keep what they inherited
+            for child in self._children(section):
+                for option, value in self._items(child):
+                    if not self.config.has_option(child, option):
+                        self.set_option(child, option, value)
+                self.del_option(child, INHERITS)
+            for option in self.config.options(section):
+                self._unindex(section, option)
             self.config.remove_section(section)
+            self._forget(section)
+            self._changes.append(('del_section', section))
             return (True, self.config.sections())
         return (False, "Section: " + section + " does not exist")
 
+    @ErrorHandler
+    def add_instance(self, section, base, name):
+        """
+        Adds section for another instance of the tool in base, the new section
+        only stores the options that differ between instances and inherits
+        everything else from base
+        """
+        if self.config.has_section(section):
+            return (False, "Section: " + section + " already exists")
+        if not self.config.has_section(base):
+            return (False, "Section: " + base + " does not exist")
+        self.add_section(section)
+        self.set_option(section, INHERITS, base)
+        self.set_option(section, 'name', name)
+        self.set_option(section, 'running', 'no')
+        return (True, section)
+
+    @ErrorHandler
+    def rename_section(self, section, new_section):
+        """
+        Moves the options of section to new_section, sections inheriting from
+        section inherit from new_section instead
+        """
+        if not self.config.has_section(section):
+            return (False, "Section: " + section + " does not exist")
+        if self.config.has_section(new_section):
+            return (False, "Section: " + new_section + " already exists")
+        children = self._children(section)
+        self.add_section(new_section)
+        for option, value in self.config.items(section):
+            self.set_option(new_section, option, value)
+        for child in children:
+            self.set_option(child, INHERITS, new_section)
+        return self.del_section(section)
+
     @ErrorHandler
     def del_option(self, section, option):
         """ Deletes an option if the section and option exist """
         if self.config.has_section(section):
             if self.config.has_option(section, option):
+                self._detach()
+                self._unindex(section, option)
                 self.config.remove_option(section, option)
+                self._reindex(section, option)
+                self._changes.append(('del_option', section, option))
                 return (True, self.config.options(section))
             return (False, "Option: " + option + " does not exist")
         return (False, "Section: " + section + " does not exist")
@@ -104,16 +707,176 @@ class Template:
         does not already exist
         """
         if self.config.has_section(section):
+            self._detach()
+            self._unindex(section, option)
             self.config.set(section, option, value)
+            self._changes.append(('set', section, option, value))
+            self._reindex(section, option)
             return (True, self.config.options(section))
         return (False, "Section: " + section + " does not exist")
 
     @ErrorHandler
     def write_config(self):
-        with open(self.template, 'wb') as configfile:
-            self.config.write(configfile)
+        """
+        Atomically writes changes to the template file. If another writer
+        changed the file since it was read, the changes made here are applied
+        on top of theirs rather than overwriting them. Inside a transaction
+        the write is deferred until the outermost transaction exits
+        """
+        if self._depth:
+            self._pending = True
+            return
+        if self._store:
+            self._write_store()
+            return
+        path = os.path.abspath(self.template)
+        with _locked(path):
+            identity = _identity(path)
+            if identity is not None and not self._changes:
+                # nothing to write
+                return
+            if identity is not None and (identity != self._identity or
+                                         _racy(path, identity)):
+                config = _new_config()
+                config.read(path)
+                _replay(config, self._changes)
+                self.config = config
+                self._derived = {}
+            _write_atomic(path, self.config)
+            self._identity = _identity(path)
+            self._log_changes()
+            self._write_snapshot(self._identity)
+            # the written config is now what's on disk, so share it rather
+            # than parsing the file again
+            with _CACHE_LOCK:
+                _CACHE[path] = (self._identity, self.config, self._derived)
+                _PARSED[path] = time.time()
+            self._shared = True
         return
 
+    def _write_store(self):
+        """
+        Commits changes to the database as row updates, then exports it to
+        the template file for readers that only understand INI
+        """
+        if not self._changes:
+            return
+        generation, merged = self._store.commit(self._changes,
+                                                self._identity[1])
+        if merged:
+            # other changes were committed since this was loaded, load the
+            # result of applying these changes on top of them
+            self.config = _new_config()
+            generation = self._store.load(self.config)
+            self._derived = {}
+        self._identity = ('generation', generation)
+        path = os.path.abspath(self.template)
+        with _locked(path):
+            if self._store.generation() != generation:
+                # a later commit may have already been exported, make sure
+                # the newest one is what's left in the file
+                self.config = _new_config()
+                generation = self._store.load(self.config)
+                self._identity = ('generation', generation)
+                self._derived = {}
+            _write_atomic(path, self.config)
+            # readers that only read the file route from the snapshot
+            self._write_snapshot(_identity(path))
+            self._log_changes()
+        with _CACHE_LOCK:
+            _CACHE[self._store.path] = (self._identity, self.config,
+                                        self._derived)
+        self._shared = True
+
+    def _log_changes(self):
+        """
+        Appends the changes just written to the journal, callers must hold
+        the template's lock
+        """
+        if self._journal:
+            self._journal.append(self._changes)
+            self._offset = self._journal.offset()
+            self._derived['offset'] = self._offset
+        self._changes = []
+
+    def _write_snapshot(self, identity):
+        """
+        Compiles the routing table of what was just written to the template
+        file and writes it to the snapshot, callers must hold the template's
+        lock
+        """
+        if self._snapshot:
+            self._snapshot.write(compile_routes(self.config.sections(),
+                                                self.tool_records(),
+                                                identity))
+
+    def _apply(self, change):
+        """ Applies a change written by another writer to self.config """
+        action, section = change[0], change[1]
+        if action == 'del_section':
+            if self.config.has_section(section):
+                for option in self.config.options(section):
+                    self._unindex(section, option)
+                self.config.remove_section(section)
+                self._forget(section)
+            return
+        if not self.config.has_section(section):
+            self.config.add_section(section)
+        if action == 'set':
+            self._unindex(section, change[2])
+            self.config.set(section, change[2], change[3])
+            self._reindex(section, change[2])
+        elif (action == 'del_option' and
+              self.config.has_option(section, change[2])):
+            self._unindex(section, change[2])
+            self.config.remove_option(section, change[2])
+            self._reindex(section, change[2])
+
+    @ErrorHandler
+    def refresh(self):
+        """
+        Brings the template up to date with what has been written to the
+        template file since it was read. For the plugin manifest only the
+        changes appended to its journal since then are applied, otherwise the
+        file is read again if it changed. Changes that haven't been written
+        yet are kept. Returns whether anything changed
+        """
+        changes = None
+        if self._journal:
+            offset, changes = self._journal.since(self._offset)
+        if changes is None:
+            identity = self._identity
+            self._load()
+            if self._changes:
+                self._detach()
+                for change in self._changes:
+                    self._apply(change)
+            return (True, self._journal is not None or
+                    identity != self._identity)
+        self._offset = offset
+        if not changes:
+            return (True, False)
+        self._detach()
+        # apply unwritten changes again on top of the ones from the journal
+        for change in changes + self._changes:
+            self._apply(change)
+        return (True, True)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Batches changes to the template, write_config calls in the block are
+        deferred so the file is written once when the outermost block exits
+        """
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if not self._depth and self._pending:
+                self._pending = False
+                self.write_config()
+
     @ErrorHandler
     def constrained_sections(self, constraints=None, options=None):
         """
@@ -127,22 +890,61 @@ class Template:
             constraints = {}
         if not options:
             options = []
-        all_sections = self.sections()
-        for a_section in all_sections[1]:
-            include = True
-            for constraint in constraints:
-                result = self.option(a_section, constraint)
-                if not result[0] or result[1] != constraints[constraint]:
-                    include = False
-                # handle group membership
-                if (result[0] and
-                   constraint == 'groups' and
-                   constraints[constraint] in result[1]):
-                    include = True
-            if include:
-                sections[a_section] = {}
-                for option in options:
-                    result = self.option(a_section, option)
-                    if result[0]:
-                        sections[a_section][option] = result[1]
+        index = self._index(constraints)
+        # None means every section still matches
+        matches = None
+        for constraint in constraints:
+            value = constraints[constraint]
+            if constraint == 'groups':
+                # handle group membership, a match includes the section
+                # regardless of the constraints checked before it
+                matches = index.groups_containing(value)
+            elif matches is None:
+                matches = index.lookup(constraint, value)
+            else:
+                matches = matches & index.lookup(constraint, value)
+        if matches is None:
+            matches = self.config.sections()
+        for a_section in matches:
+            sections[a_section] = {}
+            for option in options:
+                if self._has(a_section, option):
+                    sections[a_section][option] = self._get(a_section, option)
         return sections
+
+    @ErrorHandler
+    def tool_records(self, sections=None):
+        """
+        Returns a dictionary of sections, or of all sections if none are
+        given, to their ToolRecord. Records are decoded once per version of
+        the template
+        """
+        records = self._derived.setdefault('records', {})
+        if sections is None:
+            sections = self.config.sections()
+        tools = {}
+        for section in sections:
+            if section not in records:
+                if not self.config.has_section(section):
+                    continue
+                records[section] = ToolRecord(section, self._items(section))
+            tools[section] = records[section]
+        return tools
+
+    @ErrorHandler
+    def dependency_graph(self):
+        """
+        Returns the DependencyGraph of the tools in the template, built once
+        per version of the template
+        """
+        graph = self._derived.get('graph')
+        if graph is None:
+            graph = DependencyGraph(self.config.sections(),
+                                    self.tool_records())
+            self._derived['graph'] = graph
+        return graph
+
+    @ErrorHandler
+    def group_members(self, group):
+        """ Returns a list of sections that are in the given group """
+        return (True, sorted(self._index().groups.get(group, ())))
@@ -0,0 +1,81 @@
+import json
+import os
+import shlex
+import threading
+
+from subprocess import check_output, STDOUT
+
+# held while the cache file is written so threads don't interleave writes
+_LOCK = threading.Lock()
+
+
+class ToolCache:
+    """
+    The tools found in each cloned repo, kept along with the commit the repo
+    was at when they were looked for. Checking whether they are still current
+    only takes a git rev-parse of the repo, so the repo only needs to be
+    pulled and walked again when it's refreshed or its commit changed
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def commit(repo_path, branch="master", version="HEAD"):
+        """
+        Returns the commit a version of a repo is at, or the commit its
+        branch is at for HEAD, or None if the repo or the version don't
+        exist locally
+        """
+        ref = branch if version == "HEAD" else version
+        try:
+            commit = check_output(shlex.split("git -C " + repo_path +
+                                              " rev-parse --verify -q " +
+                                              ref + "^{commit}"),
+                                  stderr=STDOUT,
+                                  close_fds=True)
+        except Exception:
+            return None
+        return commit.strip() or None
+
+    @staticmethod
+    def _key(repo, branch, groups):
+        return ' '.join([repo, branch, groups or ''])
+
+    def _entries(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, repo, repo_path, branch="master", version="HEAD",
+            groups=None):
+        """
+        Returns the tools of a repo in the same form as
+        PluginHelper.available_tools, or None if they were never looked for
+        or the repo moved to another commit since
+        """
+        commit = self.commit(repo_path, branch=branch, version=version)
+        entry = self._entries().get(self._key(repo, branch, groups))
+        if commit is None or not entry or entry.get('commit') != commit:
+            return None
+        return [(str(tool), version) for tool in entry['tools']]
+
+    def put(self, repo, repo_path, tools, branch="master", version="HEAD",
+            groups=None):
+        """
+        Saves the tools found in a repo, as returned by
+        PluginHelper.available_tools, for the commit it's at now
+        """
+        commit = self.commit(repo_path, branch=branch, version=version)
+        if commit is None:
+            return
+        with _LOCK:
+            entries = self._entries()
+            entries[self._key(repo, branch, groups)] = {
+                'commit': commit, 'tools': [tool[0] for tool in tools]}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.rename(tmp_path, self.path)
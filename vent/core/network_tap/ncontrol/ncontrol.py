@@ -1,9 +1,9 @@
 #!/usr/bin/env python
-import docker
 import logging
 import sys
 import web
 
+from rest.client import DockerClient
 from rest.create import CreateR
 from rest.delete import DeleteR
 from rest.nics import NICsR
@@ -27,7 +27,7 @@ class NControlServer(object):
             return object.__new__(*args, **kw)
 
     def __init__(self, port=8080, host='0.0.0.0'):  # pragma: no cover
-        d_client = docker.from_env()
+        d_client = DockerClient()
         d_client.images.pull('cyberreboot/vent-ncapture', tag='master')
         nf_inst = NControl()
         urls = nf_inst.urls()
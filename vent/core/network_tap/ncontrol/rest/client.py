@@ -0,0 +1,39 @@
+import docker
+import os
+import threading
+
+# connections kept open to the docker daemon, can be changed with the
+# NCONTROL_POOL_SIZE environment variable
+POOL_SIZE = 10
+
+# the client shared by the endpoints and the pid of the process it was
+# created in
+_CLIENT = None
+_CLIENT_PID = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def DockerClient():
+    """
+    Returns the docker client shared by every endpoint, creating it the
+    first time so requests reuse its pooled connections to the daemon
+    """
+    global _CLIENT, _CLIENT_PID
+    pid = os.getpid()
+    client = _CLIENT
+    if client is not None and _CLIENT_PID == pid:
+        return client
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT_PID != pid:
+            try:
+                pool_size = int(os.environ.get('NCONTROL_POOL_SIZE',
+                                               POOL_SIZE))
+            except ValueError:
+                pool_size = POOL_SIZE
+            try:
+                client = docker.from_env(max_pool_size=max(1, pool_size))
+            except TypeError:  # pragma: no cover
+                # older versions of docker-py have a fixed pool size
+                client = docker.from_env()
+            _CLIENT, _CLIENT_PID = client, pid
+        return _CLIENT
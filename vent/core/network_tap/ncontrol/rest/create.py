@@ -1,10 +1,11 @@
 import ast
-import docker
 import redis
 import socket
 import web
 import uuid
 
+from rest.client import DockerClient
+
 
 class CreateR:
     """
@@ -63,7 +64,7 @@ class CreateR:
         # connect to docker
         c = None
         try:
-            c = docker.from_env()
+            c = DockerClient()
         except Exception as e:  # pragma: no cover
             return (False, 'unable to connect to docker because: ' + str(e))
 
@@ -1,7 +1,8 @@
 import ast
-import docker
 import web
 
+from rest.client import DockerClient
+
 
 class DeleteR:
     """
@@ -32,7 +33,7 @@ class DeleteR:
         # connect to docker and stop the given container
         c = None
         try:
-            c = docker.from_env()
+            c = DockerClient()
         except Exception as e:  # pragma: no cover
             return (False, 'unable to connect to docker because: ' + str(e))
 
@@ -1,6 +1,7 @@
-import docker
 import web
 
+from rest.client import DockerClient
+
 
 class NICsR:
     """
@@ -13,7 +14,7 @@ class NICsR:
 
         # connect to docker
         try:
-            d_client = docker.from_env()
+            d_client = DockerClient()
         except Exception as e:  # pragma: no cover
             return (False, 'unable to connect to docker because: ' + str(e))
 
@@ -1,6 +1,7 @@
-import docker
 import web
 
+from rest.client import DockerClient
+
 
 class ListR:
     """
@@ -13,7 +14,7 @@ class ListR:
 
         # connect to docker
         try:
-            containers = docker.from_env()
+            containers = DockerClient()
         except Exception as e:  # pragma: no cover
             return (False, 'unable to connect to docker because: ' + str(e))
 
@@ -2,17 +2,17 @@ def gpu_queue(options):
     """
     Queued up containers waiting for GPU resources
     """
-    import docker
     import json
     import time
 
+    from vent.helpers.clients import DockerClient
+    from vent.helpers.gpu import GpuSampler
+    from vent.helpers.gpu import PluginUrl
     from vent.helpers.meta import GpuUsage
 
     status = (False, None)
 
     print("gpu queue", str(options))
-    print("gpu queue", str(GpuUsage(base_dir="/vent/",
-                                    meta_dir="/vent")))
 
     options = json.loads(options)
     configs = options['configs']
@@ -60,45 +60,55 @@ def gpu_queue(options):
     print("mem_needed: ", mem_needed)
     print("dedicated: ", dedicated)
     device = None
-    while not device:
-        usage = GpuUsage(base_dir="/vent/", meta_dir="/vent")
+    # the job can wait here a long time for a GPU to free up, so the plugin
+    # is sampled in the background while it does rather than asked again
+    # on every pass
+    sampler = GpuSampler(PluginUrl('/vent/vent.cfg')).start()
+    try:
+        while not device:
+            usage = GpuUsage(sampler=sampler, base_dir="/vent/",
+                             meta_dir="/vent")
 
-        if usage[0]:
-            usage = usage[1]
-        else:
-            return usage
-        print(usage)
-        # {"device": "0",
-        #  "mem_mb": "1024",
-        #  "dedicated": "yes",
-        #  "enabled": "yes"}
-        for d in devices:
-            dev = str(d.split(":")[0].split('nvidia')[1])
-            print(dev)
-            # if the device is already dedicated, can't be used
-            dedicated_gpus = usage['vent_usage']['dedicated']
-            is_dedicated = False
-            for gpu in dedicated_gpus:
-                if dev in gpu:
-                    is_dedicated = True
-            print("is_dedicated: ", is_dedicated)
-            if not is_dedicated:
-                ram_used = 0
-                if dev in usage['vent_usage']['mem_mb']:
-                    ram_used = usage['vent_usage']['mem_mb'][dev]
-                # check for vent usage/processes running
-                if (dedicated and
-                   dev not in usage['vent_usage']['mem_mb'] and
-                   mem_needed <= usage[int(dev)]['global_memory'] and
-                   not usage[int(dev)]['processes']):
-                    device = dev
-                # check for ram constraints
-                elif mem_needed <= (usage[int(dev)]['global_memory'] - ram_used):
-                    device = dev
-
-        # TODO make this sleep incremental up to a point, potentially kill
-        #      after a set time configured from vent.cfg, outputting as it goes
-        time.sleep(1)
+            if usage[0]:
+                usage = usage[1]
+            else:
+                return usage
+            print(usage)
+            # {"device": "0",
+            #  "mem_mb": "1024",
+            #  "dedicated": "yes",
+            #  "enabled": "yes"}
+            for d in devices:
+                dev = str(d.split(":")[0].split('nvidia')[1])
+                print(dev)
+                # if the device is already dedicated, can't be used
+                dedicated_gpus = usage['vent_usage']['dedicated']
+                is_dedicated = False
+                for gpu in dedicated_gpus:
+                    if dev in gpu:
+                        is_dedicated = True
+                print("is_dedicated: ", is_dedicated)
+                if not is_dedicated:
+                    ram_used = 0
+                    if dev in usage['vent_usage']['mem_mb']:
+                        ram_used = usage['vent_usage']['mem_mb'][dev]
+                    # check for vent usage/processes running
+                    if (dedicated and
+                       dev not in usage['vent_usage']['mem_mb'] and
+                       mem_needed <= usage[int(dev)]['global_memory'] and
+                       not usage[int(dev)]['processes']):
+                        device = dev
+                    # check for ram constraints
+                    elif mem_needed <= (usage[int(dev)]['global_memory'] -
+                                        ram_used):
+                        device = dev
+
+            # TODO make this sleep incremental up to a point, potentially
+            #      kill after a set time configured from vent.cfg, outputting
+            #      as it goes
+            time.sleep(1)
+    finally:
+        sampler.stop()
 
     # lock jobs to a specific gpu (no shared GPUs for a single process) this is
     # needed to calculate if memory requested (but not necessarily in use)
@@ -115,7 +125,7 @@ def gpu_queue(options):
                     configs['devices'].remove(dev)
 
     try:
-        d_client = docker.from_env()
+        d_client = DockerClient('/vent/vent.cfg')
         del options['configs']
         del configs['gpu_options']
         params = options.copy()
@@ -135,9 +145,7 @@ def file_queue(path, template_path="/vent/", r_host="redis"):
     Processes files that have been added from the rq-worker, starts plugins
     that match the mime type for the new file.
     """
-    import ConfigParser
-    import ast
-    import docker
+    import copy
     import json
     import requests
     import os
@@ -148,20 +156,23 @@ def file_queue(path, template_path="/vent/", r_host="redis"):
     from subprocess import check_output, Popen, PIPE
     from string import punctuation
 
+    from vent.api.templates import manifest_routes
+    from vent.api.templates import Template
+    from vent.helpers.clients import DockerClient
+
     status = (True, None)
     images = []
     configs = {}
 
     try:
-        d_client = docker.from_env()
-
-        # get the correct path for binding
-        vent_config = ConfigParser.RawConfigParser()
-        vent_config.optionxform = str
-        vent_config.read(template_path+'vent.cfg')
-        if (vent_config.has_section('main') and
-           vent_config.has_option('main', 'files')):
-            files = vent_config.get('main', 'files')
+        d_client = DockerClient(template_path+'vent.cfg')
+
+        # get the correct path for binding, vent.cfg is only parsed again
+        # when it changes
+        vent_config = Template(template_path+'vent.cfg')
+        files = vent_config.option('main', 'files')
+        if files[0]:
+            files = files[1]
         else:
             files = '/'
 
@@ -189,116 +200,85 @@ def file_queue(path, template_path="/vent/", r_host="redis"):
         path = path.replace('/files', files, 1)
         path_copy = path
 
-        # read in configuration of plugins to get the ones that should run
-        # against the path.
+        # get the tools that should run against the path from the routing
+        # table compiled from the plugin manifest, it's only decoded again
+        # when the manifest changes
         # keep track of images that failed getting configurations for
         failed_images = set()
-        config = ConfigParser.RawConfigParser()
-        config.optionxform = str
-        config.read(template_path+'plugin_manifest.cfg')
-        sections = config.sections()
-        name_maps = {}
+        routes = manifest_routes(template_path+'plugin_manifest.cfg')
         orig_path_d = {}
         path_cmd = {}
         labels_d = {}
 
-        # get all name maps
-        for section in sections:
-            link_name = config.get(section, 'link_name')
-            image_name = config.get(section, 'image_name')
-            name_maps[link_name] = image_name.replace(':', '-').replace('/', '-')
+        # only tools handling an extension the path has need to be looked at
+        routed = set()
+        for ext_type, tools in routes['extensions']:
+            if path_copy.endswith(ext_type):
+                routed.update(tools)
 
-        for section in sections:
+        for tool in sorted(routed):
+            tool = routes['tools'][tool]
             path = path_copy
             orig_path = ''
-            repo = config.get(section, 'repo')
-            t_type = config.get(section, 'type')
-            labels = {'vent-plugin': '', 'file': path, 'vent.section': section, 'vent.repo': repo, 'vent.type': t_type}
-            image_name = config.get(section, 'image_name')
-            link_name = config.get(section, 'link_name')
+            section = tool['section']
+            image_name = tool['image_name']
+            # check if this tool should process the file based on where it
+            # is, the base directory is processed by default and subdirs
+            # created by other tools' output only if asked for
+            in_base = directory == '/files'
+            process_file = in_base and tool['process_base']
+            if not in_base:
+                for other_tool in tool['process_from_tool']:
+                    if other_tool in directory:
+                        process_file = True
+            if not process_file:
+                continue
+            labels = {'vent-plugin': '', 'file': path, 'vent.section': section, 'vent.repo': tool['repo'], 'vent.type': tool['type']}
             # doesn't matter if it's a repository or registry because both in manifest
-            if config.has_option(section, 'groups'):
-                if 'replay' in config.get(section, 'groups'):
-                    try:
-                        # read the vent.cfg file to grab the network-mapping
-                        # specified. For replay_pcap
-                        n_name = 'network-mapping'
-                        n_map = []
-                        if vent_config.has_section(n_name):
-                            # make sure that the options aren't empty
-                            if vent_config.options(n_name):
-                                options = vent_config.options(n_name)
-                                for option in options:
-                                    if vent_config.get(n_name, option):
-                                        n_map.append(vent_config.get(
-                                            n_name, option))
-                                orig_path = path
-                                path = str(n_map[0]) + " " + path
-                    except Exception as e:  # pragma: no cover
-                        failed_images.add(image_name)
-                        status = (False, str(e))
-            if config.has_option(section, 'service'):
+            if tool['replay']:
                 try:
-                    options_dict = json.loads(config.get(section, 'service'))
-                    for option in options_dict:
-                        value = options_dict[option]
-                        labels[option] = value
-                except Exception as e:   # pragma: no cover
+                    # read the vent.cfg file to grab the network-mapping
+                    # specified. For replay_pcap
+                    n_name = 'network-mapping'
+                    n_map = []
+                    options = vent_config.options(n_name)
+                    # make sure that the options aren't empty
+                    if options[0] and options[1]:
+                        for option in options[1]:
+                            value = vent_config.option(n_name, option)[1]
+                            if value:
+                                n_map.append(value)
+                        orig_path = path
+                        path = str(n_map[0]) + " " + path
+                except Exception as e:  # pragma: no cover
                     failed_images.add(image_name)
                     status = (False, str(e))
-            if config.has_option(section, 'settings'):
+            if tool['service'] is not None:
                 try:
-                    options_dict = json.loads(config.get(section, 'settings'))
-                    in_base = directory == '/files'
-                    # process base by default
-                    process_file = in_base
-                    # check if this tool shouldn't process the base by default
-                    if 'process_base' in options_dict:
-                        if options_dict['process_base'] == 'no':
-                            process_file = False
-                    # check if this tool should look at subdirs created by
-                    # other tools' output
-                    if 'process_from_tool' in options_dict and not in_base:
-                        for tool in options_dict['process_from_tool'].split(','):
-                            if tool.replace(' ', '-') in directory:
-                                process_file = True
-                    if 'ext_types' in options_dict and process_file:
-                        ext_types = options_dict['ext_types'].split(',')
-                        for ext_type in ext_types:
-                            if path.endswith(ext_type):
-                                images.append(image_name)
-                                configs[image_name] = {}
-
+                    options_dict = tool['service']
+                    for option in options_dict:
+                        value = options_dict[option]
+                        labels[option] = value
                 except Exception as e:   # pragma: no cover
                     failed_images.add(image_name)
                     status = (False, str(e))
-            if image_name in configs:
-                if config.has_option(section, 'docker'):
-                    try:
-                        options_dict = ast.literal_eval(config.get(section, 'docker'))
-                        for option in options_dict:
-                            try:
-                                configs[image_name][option] = ast.literal_eval(options_dict[option])
-                            except Exception as e:  # pragma: no cover
-                                configs[image_name][option] = options_dict[option]
-                        if 'links' in configs[image_name]:
-                            for link in configs[image_name]['links']:
-                                if link in name_maps:
-                                    configs[image_name]['links'][name_maps[link]] = configs[image_name]['links'].pop(link)
-                        # TODO network_mode
-                        # TODO volumes_from
-                        # TODO external services
-                    except Exception as e:   # pragma: no cover
-                        failed_images.add(image_name)
-                        status = (False, str(e))
-
-            if config.has_option(section, 'gpu') and image_name in configs:
+            images.append(image_name)
+            configs[image_name] = {}
+            if tool['docker'] is not None:
+                # the table is shared between jobs, so the decoded options
+                # are copied before being added to
+                configs[image_name] = copy.deepcopy(tool['docker'])
+                # TODO network_mode
+                # TODO volumes_from
+                # TODO external services
+
+            if tool['gpu'] is not None:
                 try:
-                    options_dict = json.loads(config.get(section, 'gpu'))
+                    options_dict = tool['gpu']
                     if 'enabled' in options_dict:
                         enabled = options_dict['enabled']
                         if enabled == 'yes':
-                            configs[image_name]['gpu_options'] = options_dict
+                            configs[image_name]['gpu_options'] = dict(options_dict)
                             labels['vent.gpu'] = 'yes'
                             if 'dedicated' in options_dict:
                                 labels['vent.gpu.dedicated'] = options_dict['dedicated']
@@ -306,16 +286,14 @@ def file_queue(path, template_path="/vent/", r_host="redis"):
                                 labels['vent.gpu.device'] = options_dict['device']
                             if 'mem_mb' in options_dict:
                                 labels['vent.gpu.mem_mb'] = options_dict['mem_mb']
-                            port = ''
-                            host = ''
-                            if (vent_config.has_section('nvidia-docker-plugin') and
-                               vent_config.has_option('nvidia-docker-plugin', 'port')):
-                                port = vent_config.get('nvidia-docker-plugin', 'port')
+                            port = vent_config.option('nvidia-docker-plugin', 'port')
+                            if port[0]:
+                                port = port[1]
                             else:
                                 port = '3476'
-                            if (vent_config.has_section('nvidia-docker-plugin') and
-                               vent_config.has_option('nvidia-docker-plugin', 'host')):
-                                host = vent_config.get('nvidia-docker-plugin', 'host')
+                            host = vent_config.option('nvidia-docker-plugin', 'host')
+                            if host[0]:
+                                host = host[1]
                             else:
                                 # grab the default gateway
                                 try:
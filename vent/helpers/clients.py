@@ -0,0 +1,48 @@
+import docker
+import os
+import threading
+
+from vent.api.templates import Template
+
+# connections kept open to the docker daemon, unless set in vent.cfg
+POOL_SIZE = 10
+
+# the shared client, along with the pid of the process that created it since
+# connections can't be shared with a forked child
+_CLIENT = None
+_CLIENT_PID = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _pool_size(cfg_file):
+    """ Returns the pool size set under [docker] in vent.cfg """
+    pool_size = Template(template=cfg_file).option('docker', 'pool_size')
+    if pool_size[0]:
+        try:
+            return max(1, int(pool_size[1]))
+        except ValueError:
+            pass
+    return POOL_SIZE
+
+
+def DockerClient(cfg_file=os.path.join(os.path.expanduser('~'),
+                                       '.vent/vent.cfg')):
+    """
+    Returns the docker client shared by everything in this process, creating
+    it the first time. The client keeps a pool of connections to the daemon
+    open between calls and only negotiates the API version once
+    """
+    global _CLIENT, _CLIENT_PID
+    pid = os.getpid()
+    client = _CLIENT
+    if client is not None and _CLIENT_PID == pid:
+        return client
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT_PID != pid:
+            try:
+                client = docker.from_env(max_pool_size=_pool_size(cfg_file))
+            except TypeError:  # pragma: no cover
+                # older versions of docker-py have a fixed pool size
+                client = docker.from_env()
+            _CLIENT, _CLIENT_PID = client, pid
+        return _CLIENT
@@ -0,0 +1,82 @@
+import threading
+
+
+class StatusAggregator:
+    """
+    Refreshes the metrics shown on a dashboard in the background, each one in
+    its own thread every so many seconds, and publishes them together as a
+    snapshot. A snapshot is replaced rather than changed once published, so
+    readers only ever read it and never wait on docker or git. Metrics that
+    can't be gotten at the same time, like ones that run git in the working
+    directory, can be listed together to share a thread
+    """
+    def __init__(self, metrics, together=()):
+        # maps the name of a metric to the function returning it and the
+        # seconds between refreshes
+        self.metrics = dict(metrics)
+        self._snapshot = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # the names of the metrics refreshed by each thread
+        grouped = set(name for group in together for name in group)
+        self._groups = [tuple(group) for group in together]
+        self._groups += [(name,) for name in sorted(self.metrics)
+                         if name not in grouped]
+        self._wake = {}
+        for group in self._groups:
+            event = threading.Event()
+            for name in group:
+                self._wake[name] = event
+        self._threads = []
+
+    def refresh(self, name):
+        """
+        Gets a metric again and publishes a new snapshot with it, keeping the
+        previous value if getting it fails. Returns the new snapshot
+        """
+        try:
+            value = self.metrics[name][0]()
+        except Exception:  # pragma: no cover
+            return self._snapshot
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            snapshot[name] = value
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self):
+        """
+        Returns the latest snapshot, a dictionary of the name of each metric
+        to its value, without the metrics that haven't been gotten yet
+        """
+        return self._snapshot
+
+    def expire(self, *names):
+        """ Refreshes the named metrics now instead of at their next turn """
+        for name in names:
+            self._wake[name].set()
+
+    def _run(self, group):
+        interval = min(self.metrics[name][1] for name in group)
+        wake = self._wake[group[0]]
+        while not self._stop.is_set():
+            for name in group:
+                self.refresh(name)
+            wake.wait(interval)
+            wake.clear()
+
+    def start(self):
+        """ Starts refreshing every metric in the background """
+        if not self._threads:
+            for group in self._groups:
+                thread = threading.Thread(target=self._run, args=(group,))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """ Stops refreshing the metrics """
+        self._stop.set()
+        for event in self._wake.values():
+            event.set()
@@ -0,0 +1,193 @@
+import collections
+import json
+import os
+import requests
+import threading
+import time
+
+from subprocess import check_output
+
+from vent.api.templates import Template
+
+# seconds between samples and how many samples are kept
+INTERVAL = 1
+HISTORY = 60
+# seconds sampling goes on after the latest sample was last read
+IDLE = 30
+
+# seconds the detected GPUs are kept for
+INVENTORY_TTL = 24 * 60 * 60
+
+
+def _default_host():
+    """ Returns the IP address of the host's default network device """
+    # now just requires ip, ifconfig
+    route = check_output(('ip', 'route')).split('\n')
+    default = ''
+    # grab the default network device.
+    for device in route:
+        if 'default' in device:
+            default = device.split()[4]
+            break
+
+    # grab the IP address for the default device
+    ip_addr = check_output(('ifconfig', default))
+    return ip_addr.split('\n')[1].split()[1]
+
+
+def PluginUrl(cfg_file):
+    """
+    Returns the url of the nvidia-docker-plugin API set in vent.cfg, falling
+    back to the address of the host's default network device
+    """
+    template = Template(template=cfg_file)
+    port = '3476'
+    # default docker gateway
+    host = '172.17.0.1'
+    result = template.option('nvidia-docker-plugin', 'port')
+    if result[0]:
+        port = result[1]
+    result = template.option('nvidia-docker-plugin', 'host')
+    if result[0]:
+        host = result[1]
+    else:
+        try:
+            host = _default_host()
+        except Exception as e:  # pragma: no cover
+            pass
+    return 'http://' + host + ':' + port + '/v1.0/gpu/'
+
+
+def _host_identity():
+    """
+    Returns the boot id of the host and the pid of the docker daemon, either
+    changes when the GPUs may have changed
+    """
+    identity = []
+    for path in ('/proc/sys/kernel/random/boot_id', '/var/run/docker.pid'):
+        try:
+            with open(path) as f:
+                identity.append(f.read().strip())
+        except (IOError, OSError):
+            identity.append(None)
+    return identity
+
+
+def ReadInventory(path, ttl=INVENTORY_TTL):
+    """
+    Returns the GPUs saved by WriteInventory, or None if there aren't any or
+    they are older than ttl seconds or from before the host rebooted or the
+    docker daemon restarted
+    """
+    try:
+        with open(path) as f:
+            inventory = json.load(f)
+        if (inventory['host'] != _host_identity() or
+                time.time() - inventory['time'] > ttl):
+            return None
+        gpu = inventory['gpu']
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+    return (bool(gpu[0]),) + tuple(str(value) for value in gpu[1:])
+
+
+def WriteInventory(path, gpu):
+    """ Atomically saves the GPUs detected by meta.Gpu """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'gpu': gpu, 'time': time.time(),
+                   'host': _host_identity()}, f)
+    os.rename(tmp_path, path)
+
+
+class GpuSampler:
+    """
+    Samples the info and status of the GPUs from the nvidia-docker-plugin
+    every interval seconds into a ring buffer, so readers get the latest
+    sample without waiting on the plugin. Sampling stops once the latest
+    sample hasn't been read for idle seconds, and starts again when it is
+    """
+    def __init__(self, url, interval=INTERVAL, history=HISTORY, idle=IDLE):
+        self.url = url
+        self.interval = interval
+        self.idle = idle
+        self.samples = collections.deque(maxlen=history)
+        self._sampled = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._read = time.time()
+        self._thread = None
+
+    def _get(self, name):
+        r = requests.get(self.url + name + '/json', timeout=5)
+        if r.status_code != 200:
+            raise ValueError('Unable to get GPU usage request error code: ' +
+                             str(r.status_code))
+        return r.json()
+
+    def sample(self):
+        """
+        Takes a sample, a dictionary of the time it was taken and either the
+        info and status of the GPUs or the error getting them
+        """
+        sample = {'time': time.time(), 'info': None, 'status': None,
+                  'error': None}
+        try:
+            # the info has how much memory is available
+            sample['info'] = self._get('info')
+            sample['status'] = self._get('status')
+        except Exception as e:
+            sample['error'] = str(e)
+        self.samples.append(sample)
+        self._sampled.set()
+        return sample
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if time.time() - self._read > self.idle:
+                    # nobody is reading the samples anymore
+                    self._thread = None
+                    return
+            self.sample()
+            self._stop.wait(self.interval)
+        with self._lock:
+            self._thread = None
+
+    def start(self):
+        """ Starts sampling in the background, unless it's already sampling """
+        with self._lock:
+            self._read = time.time()
+            if self._thread is None:
+                if (self.samples and time.time() - self.samples[-1]['time'] >
+                        self.interval * 2):
+                    # what was sampled before stopping is out of date
+                    self._sampled.clear()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops sampling in the background """
+        self._stop.set()
+
+    def latest(self, timeout=10):
+        """
+        Returns the latest sample, waiting up to timeout seconds for the
+        first one, or None if there isn't one yet. Reading it keeps sampling
+        going, or starts it again if it stopped
+        """
+        if not self._stop.is_set():
+            self.start()
+        self._sampled.wait(timeout)
+        try:
+            return self.samples[-1]
+        except IndexError:
+            return None
+
+    def history(self):
+        """ Returns the samples kept, oldest first """
+        return list(self.samples)
+
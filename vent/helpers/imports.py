@@ -0,0 +1,11 @@
+import importlib
+
+
+def ImportObject(path):
+    """
+    Imports and returns an object by its dotted path, such as
+    vent.menus.main.MainForm, so modules that are slow to import are only
+    imported once they're used
+    """
+    module, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
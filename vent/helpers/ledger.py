@@ -0,0 +1,163 @@
+import calendar
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    file TEXT NOT NULL,
+    plugin TEXT NOT NULL,
+    container TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    finished REAL,
+    PRIMARY KEY (file, plugin)
+);
+CREATE INDEX IF NOT EXISTS runs_by_finished ON runs (finished);
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (key, value) VALUES ('jobs', 0);
+INSERT OR IGNORE INTO counters (key, value) VALUES ('runs', 0);
+"""
+
+# connections are kept per thread since sqlite connections can't be shared
+# between threads, maps a database path to its connection
+_LOCAL = threading.local()
+
+
+def TimestampSeconds(timestamp):
+    """
+    Returns the seconds since the epoch of a docker timestamp such as
+    2017-10-10T12:34:56.123456789Z, or None if it can't be parsed
+    """
+    try:
+        seconds = calendar.timegm(time.strptime(timestamp[:19],
+                                                '%Y-%m-%dT%H:%M:%S'))
+    except (TypeError, ValueError):
+        return None
+    fraction = timestamp[19:].rstrip('Z')
+    if fraction.startswith('.') and fraction[1:].isdigit():
+        seconds += float('0' + fraction[:7])
+    return seconds
+
+
+class JobLedger:
+    """
+    Records the tools that finished running against each file in a SQLite
+    database, with one row per (file, plugin) and running counts of the
+    files processed and the tool runs so they can be read without scanning
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def _connect(self):
+        """ Returns this thread's connection to the database """
+        connections = getattr(_LOCAL, 'connections', None)
+        if connections is None:
+            connections = _LOCAL.connections = {}
+        db = connections.get(self.path)
+        if db is None:
+            # transactions are managed explicitly
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.text_factory = str
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            connections[self.path] = db
+        return db
+
+    @staticmethod
+    def _add(db, run):
+        """ Inserts a run unless it's recorded, returns whether it was new """
+        cursor = db.execute('INSERT OR IGNORE INTO runs (file, plugin, '
+                            'container, started_at, finished_at, finished) '
+                            'VALUES (?, ?, ?, ?, ?, ?)',
+                            (run['FileName'], run['VentPlugin'],
+                             run.get('ID'), run.get('StartedAt'),
+                             run.get('FinishedAt'),
+                             TimestampSeconds(run.get('FinishedAt'))))
+        if not cursor.rowcount:
+            return False
+        db.execute("UPDATE counters SET value = value + 1 WHERE key = 'runs'")
+        cursor = db.execute('INSERT OR IGNORE INTO files (file) VALUES (?)',
+                            (run['FileName'],))
+        if cursor.rowcount:
+            db.execute("UPDATE counters SET value = value + 1 WHERE key = "
+                       "'jobs'")
+        return True
+
+    def record(self, runs):
+        """
+        Records finished runs, dictionaries with the FileName, VentPlugin,
+        ID, StartedAt and FinishedAt of the tool's container. Returns the
+        runs that weren't already recorded
+        """
+        db = self._connect()
+        added = []
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for run in runs:
+                if self._add(db, run):
+                    added.append(run)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return added
+
+    def counts(self, pending=()):
+        """
+        Returns the number of files processed and of tool runs, including
+        the pending runs that haven't been recorded yet
+        """
+        db = self._connect()
+        counters = dict(db.execute('SELECT key, value FROM counters'))
+        jobs, runs = counters['jobs'], counters['runs']
+        files = set()
+        for run in pending:
+            if db.execute('SELECT 1 FROM runs WHERE file = ? AND plugin = ?',
+                          (run['FileName'], run['VentPlugin'])).fetchone():
+                continue
+            runs += 1
+            if run['FileName'] not in files and not db.execute(
+                    'SELECT 1 FROM files WHERE file = ?',
+                    (run['FileName'],)).fetchone():
+                files.add(run['FileName'])
+        return jobs + len(files), runs
+
+    def finished(self, since=None, until=None):
+        """
+        Returns the runs that finished in [since, until), given in seconds
+        since the epoch, ordered by when they finished
+        """
+        query = ('SELECT file, plugin, container, started_at, finished_at '
+                 'FROM runs WHERE finished >= ? AND finished < ? ORDER BY '
+                 'finished')
+        rows = self._connect().execute(query, (since or 0,
+                                               until or float('inf')))
+        return [{'FileName': row[0], 'VentPlugin': row[1], 'ID': row[2],
+                 'StartedAt': row[3], 'FinishedAt': row[4]} for row in rows]
+
+    def import_json(self, path):
+        """
+        Records the runs in a status.json written before there was a ledger,
+        only if nothing has been recorded yet
+        """
+        if self.counts()[1] or not os.path.exists(path):
+            return
+        runs = []
+        with open(path) as infile:
+            for line in infile:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:  # pragma: no cover
+                    pass
+        self.record([run for run in runs if 'FileName' in run and
+                     'VentPlugin' in run])
@@ -1,5 +1,4 @@
 import datetime
-import docker
 import json
 import math
 import multiprocessing
@@ -7,12 +6,20 @@ import os
 import pkg_resources
 import platform
 import re
-import requests
 
 from subprocess import check_output, Popen, PIPE
 
 from vent.api.templates import Template
+from vent.helpers.clients import DockerClient
+from vent.helpers.gpu import GpuSampler
+from vent.helpers.gpu import PluginUrl
+from vent.helpers.gpu import ReadInventory
+from vent.helpers.gpu import WriteInventory
 from vent.helpers.paths import PathDirs
+from vent.helpers.reaper import ExitedTools
+from vent.helpers.reaper import FinishedRuns
+from vent.helpers.reaper import Ledger
+from vent.helpers.state import State
 
 
 def Version():
@@ -38,7 +45,7 @@ def Docker():
 
     # get docker server version
     try:
-        d_client = docker.from_env()
+        d_client = DockerClient()
         docker_info['server'] = d_client.version()
     except Exception as e:  # pragma: no cover
         pass
@@ -70,12 +77,10 @@ def Containers(vent=True, running=True):
     containers = []
 
     try:
-        d_client = docker.from_env()
         if vent:
-            c = d_client.containers.list(all=not running,
-                                         filters={'label': 'vent'})
+            c = State().containers(all=not running, labels={'vent': None})
         else:
-            c = d_client.containers.list(all=not running)
+            c = State().containers(all=not running)
         for container in c:
             containers.append((container.name, container.status))
     except Exception as e:  # pragma: no cover
@@ -94,13 +99,36 @@ def Cpu():
     return cpu
 
 
-def Gpu(pull=False):
-    """ Check for support of GPUs, and return what's available """
+def Gpu(pull=False, refresh=False, **kargs):
+    """
+    Check for support of GPUs, and return what's available. What was found
+    is saved and returned until it expires, the host reboots or the docker
+    daemon restarts, unless refresh is set. GPUs are looked for again when
+    pull is set and none were found before
+    """
+    path_dirs = PathDirs(**kargs)
+    inventory = os.path.join(path_dirs.meta_dir, 'gpu_inventory.json')
+    if not refresh:
+        gpu = ReadInventory(inventory)
+        if gpu is not None and (gpu[0] or not pull):
+            return gpu
+    gpu = _detect_gpu(pull)
+    # errors aren't saved so they're retried next time
+    if len(gpu) == 2:
+        try:
+            WriteInventory(inventory, gpu)
+        except Exception as e:  # pragma: no cover
+            pass
+    return gpu
+
+
+def _detect_gpu(pull):
+    """ Runs nvidia-smi in a container to list the GPUs """
     gpu = (False, "")
     try:
         image = 'nvidia/cuda:8.0-runtime'
         image_name, tag = image.split(":")
-        d_client = docker.from_env()
+        d_client = DockerClient()
         nvidia_image = d_client.images.list(name=image)
 
         if pull and len(nvidia_image) == 0:
@@ -136,18 +164,21 @@ def Gpu(pull=False):
     return gpu
 
 
-def GpuUsage(**kargs):
-    """ Get the current GPU usage of available GPUs """
+def GpuUsage(sampler=None, **kargs):
+    """
+    Get the current GPU usage of available GPUs, from a single sample of the
+    nvidia-docker-plugin or, if given a GpuSampler, from its latest sample
+    for callers that check it again and again
+    """
     usage = (False, None)
     gpu_status = {'vent_usage': {'dedicated': [], 'mem_mb': {}}}
 
     path_dirs = PathDirs(**kargs)
-    path_dirs.host_config()
-    template = Template(template=path_dirs.cfg_file)
 
-    # get running jobs using gpus
+    # get running jobs using gpus, this is called from short lived jobs so
+    # only the vent plugin containers are listed rather than keeping State
     try:
-        d_client = docker.from_env()
+        d_client = DockerClient(path_dirs.cfg_file)
         c = d_client.containers.list(all=False,
                                      filters={'label': 'vent-plugin'})
         for container in c:
@@ -164,65 +195,31 @@ def GpuUsage(**kargs):
     except Exception as e:  # pragma: no cover
         pass
 
-    port = '3476'
-    # default docker gateway
-    host = '172.17.0.1'
-    result = template.option('nvidia-docker-plugin', 'port')
-    if result[0]:
-        port = result[1]
-    result = template.option('nvidia-docker-plugin', 'host')
-    if result[0]:
-        host = result[1]
+    if sampler:
+        # the plugin is sampled in the background, so this doesn't wait on it
+        sample = sampler.latest()
     else:
-        try:
-            # now just requires ip, ifconfig
-            route = check_output(('ip', 'route')).split('\n')
-            default = ''
-            # grab the default network device.
-            for device in route:
-                if 'default' in device:
-                    default = device.split()[4]
-                    break
-
-            # grab the IP address for the default device
-            ip_addr = check_output(('ifconfig', default))
-            ip_addr = ip_addr.split('\n')[1].split()[1]
-            host = ip_addr
-        except Exception as e:  # pragma: no cover
-            pass
-
-    # have to get the info separately to determine how much memory is availabe
-    nd_url = 'http://' + host + ':' + port + '/v1.0/gpu/info/json'
+        path_dirs.host_config()
+        sample = GpuSampler(PluginUrl(path_dirs.cfg_file)).sample()
+    if sample is None:
+        return (False, "Error: no GPU usage sampled yet")
+    if sample['error']:
+        return (False, "Error: " + sample['error'])
     try:
-        r = requests.get(nd_url)
-        if r.status_code == 200:
-            status = r.json()
-            for i, device in enumerate(status['Devices']):
-                gm = int(round(math.log(int(device['Memory']['Global']), 2)))
-                gpu_status[i] = {'global_memory': 2**gm,
-                                 'cores': device['Cores']}
-        else:
-            usage = (False, "Unable to get GPU usage request error code: " +
-                     str(r.status_code))
-    except Exception as e:  # pragma: no cover
-        usage = (False, "Error: " + str(e))
-
-    # get actual status of each gpu
-    nd_url = 'http://' + host + ':' + port + '/v1.0/gpu/status/json'
-    try:
-        r = requests.get(nd_url)
-        if r.status_code == 200:
-            status = r.json()
-            for i, device in enumerate(status['Devices']):
-                if i not in gpu_status:
-                    gpu_status[i] = {}
-                gpu_status[i]['utilization'] = device['Utilization']
-                gpu_status[i]['memory'] = device['Memory']
-                gpu_status[i]['processes'] = device['Processes']
-            usage = (True, gpu_status)
-        else:
-            usage = (False, "Unable to get GPU usage request error code: " +
-                     str(r.status_code))
+        # have to get the info separately to determine how much memory is
+        # availabe
+        for i, device in enumerate(sample['info']['Devices']):
+            gm = int(round(math.log(int(device['Memory']['Global']), 2)))
+            gpu_status[i] = {'global_memory': 2**gm,
+                             'cores': device['Cores']}
+        # actual status of each gpu
+        for i, device in enumerate(sample['status']['Devices']):
+            if i not in gpu_status:
+                gpu_status[i] = {}
+            gpu_status[i]['utilization'] = device['Utilization']
+            gpu_status[i]['memory'] = device['Memory']
+            gpu_status[i]['processes'] = device['Processes']
+        usage = (True, gpu_status)
     except Exception as e:  # pragma: no cover
         usage = (False, "Error: " + str(e))
 
@@ -236,11 +233,10 @@ def Images(vent=True):
     # TODO needs to also check images in the manifest that couldn't have the
     #      label added
     try:
-        d_client = docker.from_env()
         if vent:
-            i = d_client.images.list(filters={'label': 'vent'})
+            i = State().images(labels={'vent': None})
         else:
-            i = d_client.images.list()
+            i = State().images()
         for image in i:
             images.append((image.tags[0], image.short_id))
     except Exception as e:  # pragma: no cover
@@ -258,9 +254,7 @@ def Jobs():
 
     # get running jobs
     try:
-        d_client = docker.from_env()
-        c = d_client.containers.list(all=False,
-                                     filters={'label': 'vent-plugin'})
+        c = State().containers(labels={'vent-plugin': None})
         files = []
         for container in c:
             jobs[1] += 1
@@ -271,78 +265,11 @@ def Jobs():
     except Exception as e:  # pragma: no cover
         pass
 
-    # get finished jobs
+    # get finished jobs from the ledger, along with tools that finished but
+    # haven't been recorded by the reaper yet
     try:
-        d_client = docker.from_env()
-        c = d_client.containers.list(all=True,
-                                     filters={'label': 'vent-plugin',
-                                              'status': 'exited'})
-
-        file_names = []
-        tool_names = []
-        finished_jobs = []
-        path_dirs = PathDirs()
-        manifest = os.path.join(path_dirs.meta_dir, "status.json")
-
-        if os.path.exists(manifest):
-            file_status = 'a'
-        else:
-            file_status = 'w'
-
-        # get a list of past jobs' file names if status.json exists
-        if file_status == 'a':
-            with open(manifest, 'r') as infile:
-                for line in infile:
-                    finished_jobs.append(json.loads(line))
-
-            # get a list of file names so we can check against each container
-            file_names = [d['FileName'] for d in finished_jobs]
-
-            # multiple tools can run on 1 file. Use a tuple to status check
-            tool_names = [(d['FileName'], d['VentPlugin'])
-                          for d in finished_jobs]
-
-        for container in c:
-            jobs[3] += 1
-
-            if 'file' in container.attrs['Config']['Labels']:
-                # make sure the file name and the tool tup exists because
-                # multiple tools can run on 1 file.
-                if (container.attrs['Config']['Labels']['file'],
-                    container.attrs['Config']['Labels']['vent.name']) not in \
-                        tool_names:
-                    # TODO figure out a nicer way of getting desired values
-                    # from containers.attrs.
-                    new_file = {}
-                    new_file['FileName'] = \
-                        container.attrs['Config']['Labels']['file']
-                    new_file['VentPlugin'] = \
-                        container.attrs['Config']['Labels']['vent.name']
-                    new_file['StartedAt'] = \
-                        container.attrs['State']['StartedAt']
-                    new_file['FinishedAt'] = \
-                        container.attrs['State']['FinishedAt']
-                    new_file['ID'] = \
-                        container.attrs['Id'][:12]
-
-                    # create/append a json file with all wanted information
-                    with open(manifest, file_status) as outfile:
-                        json.dump(new_file, outfile)
-                        outfile.write("\n")
-
-                # delete any containers with 'vent-plugin' in the groups
-                if 'vent-plugin' in container.attrs['Config']['Labels']:
-                    container.remove()
-
-        # add extra one to account for file that just finished if the file was
-        # just created since file_names is processed near the beginning
-        if file_status == 'w' and len(file_names) == 1:
-            jobs[2] = len(set(file_names)) + 1
-        else:
-            jobs[2] = len(set(file_names))
-
-        jobs[3] = jobs[3] - jobs[1]
-
+        pending = FinishedRuns(ExitedTools())
+        jobs[2], jobs[3] = Ledger().counts(pending)
     except Exception as e:  # pragma: no cover
         pass
 
@@ -372,12 +299,10 @@ def Services(core, vent=True, external=False, **kargs):
     try:
         # look for internal services
         if not external:
-            d_client = docker.from_env()
             if vent:
-                c_filter = {'label': 'vent'}
-                containers = d_client.containers.list(filters=c_filter)
+                containers = State().containers(labels={'vent': None})
             else:
-                containers = d_client.containers.list()
+                containers = State().containers()
             for c in containers:
                 uri_prefix = ''
                 uri_postfix = ''
@@ -506,32 +431,34 @@ def ParsedSections(file_val):
     return template_dict
 
 
-def Dependencies(tools):
+def DependencyLevels(tools):
     """
-    Takes in a list of tools that are being updated and returns any tools that
-    depend on linking to them
+    Takes in a list of link names of tools that are being updated and returns
+    the running tools that depend on them, directly or through other tools,
+    in levels where each level only depends on the levels before it
     """
-    dependencies = []
+    levels = []
     if tools:
         path_dirs = PathDirs()
         man = Template(os.path.join(path_dirs.meta_dir, 'plugin_manifest.cfg'))
-        for section in man.sections()[1]:
-            # don't worry about dealing with tool if it's not running
-            running = man.option(section, 'running')
-            if not running[0] or running[1] != 'yes':
-                continue
-            t_name = man.option(section, 'name')[1]
-            t_branch = man.option(section, 'branch')[1]
-            t_version = man.option(section, 'version')[1]
-            t_identifier = {'name': t_name,
-                            'branch': t_branch,
-                            'version': t_version}
-            options = man.options(section)[1]
-            if 'docker' in options:
-                d_settings = json.loads(man.option(section,
-                                                   'docker')[1])
-                if 'links' in d_settings:
-                    for link in json.loads(d_settings['links']):
-                        if link in tools:
-                            dependencies.append(t_identifier)
-    return dependencies
+        graph = man.dependency_graph()
+        records = man.tool_records()
+        # don't worry about dealing with tools that aren't running
+        running = [section for section in
+                   graph.dependents(graph.sections(tools))
+                   if records[section].running == 'yes']
+        for level in graph.levels(running):
+            levels.append([{'name': records[section].name,
+                            'branch': records[section].branch,
+                            'version': records[section].version}
+                           for section in level])
+    return levels
+
+
+def Dependencies(tools):
+    """
+    Takes in a list of tools that are being updated and returns any tools that
+    depend on linking to them, in the order they can be restarted in
+    """
+    return [t_identifier for level in DependencyLevels(tools)
+            for t_identifier in level]
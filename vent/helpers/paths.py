@@ -1,9 +1,25 @@
 import errno
 import os
 import platform
+import threading
 
 from vent.api.templates import Template
 
+# held while changing to a repo's directory and running git there, since the
+# working directory is shared by every thread in the process
+WORKING_DIR_LOCK = threading.RLock()
+
+
+def ChangesWorkingDir(function):
+    """
+    Runs function holding WORKING_DIR_LOCK, for anything that changes the
+    working directory and relies on it until it's done
+    """
+    def wrapper(*args, **kwargs):
+        with WORKING_DIR_LOCK:
+            return function(*args, **kwargs)
+    return wrapper
+
 
 class PathDirs:
     """ Global path directories for vent """
@@ -31,6 +47,9 @@ class PathDirs:
         """
         Tries to create directory, if fails, checks if path already exists
         """
+        # nothing to do most of the time, so check before trying
+        if os.path.isdir(path):
+            return (True, "exists")
         try:
             os.makedirs(path)
         except OSError as e:  # pragma: no cover
@@ -82,11 +101,15 @@ class PathDirs:
         sections = {'main': {'files': default_file_dir},
                     'network-mapping': {},
                     'nvidia-docker-plugin': {'port': '3476'}}
+        # only write the file if something was missing from it
+        changed = not os.path.isfile(self.cfg_file)
         for s in sections:
             if sections[s]:
                 for option in sections[s]:
-                    config.add_option(s, option, sections[s][option])
+                    added = config.add_option(s, option, sections[s][option])
+                    changed = changed or added[0]
             else:
-                config.add_section(s)
-        config.write_config()
+                changed = config.add_section(s)[0] or changed
+        if changed:
+            config.write_config()
         return status
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+
+try:
+    # python2
+    import Queue
+except ImportError:  # pragma: no cover
+    # python3
+    import queue as Queue
+
+from vent.api.templates import Template
+from vent.helpers.ledger import JobLedger
+from vent.helpers.ledger import TimestampSeconds
+from vent.helpers.paths import PathDirs
+from vent.helpers.state import State
+
+# seconds between reaps, and how long finished tool containers are kept
+# around for debugging, unless set under [reaper] in vent.cfg
+INTERVAL = 10
+GRACE = 0
+# containers removed at the same time
+REMOVE_THREADS = 4
+
+# the shared reaper, along with the pid of the process that started it
+_REAPER = None
+_REAPER_PID = None
+_REAPER_LOCK = threading.Lock()
+
+
+def FinishedRuns(containers):
+    """
+    Returns the runs to record in the job ledger for exited tool containers
+    """
+    runs = []
+    for container in containers:
+        labels = container.attrs['Config']['Labels']
+        if 'file' in labels and 'vent.name' in labels:
+            # TODO figure out a nicer way of getting desired values
+            # from containers.attrs.
+            new_file = {}
+            new_file['FileName'] = labels['file']
+            new_file['VentPlugin'] = labels['vent.name']
+            new_file['StartedAt'] = container.attrs['State']['StartedAt']
+            new_file['FinishedAt'] = container.attrs['State']['FinishedAt']
+            new_file['ID'] = container.attrs['Id'][:12]
+            runs.append(new_file)
+    return runs
+
+
+def ExitedTools(state=None):
+    """ Returns the tool containers that have exited """
+    state = state or State()
+    return [container for container in
+            state.containers(all=True, labels={'vent-plugin': None})
+            if container.status == 'exited']
+
+
+def Ledger(**kargs):
+    """
+    Returns the job ledger, filled from status.json the first time it's
+    created
+    """
+    path_dirs = PathDirs(**kargs)
+    ledger_path = os.path.join(path_dirs.meta_dir, "jobs.db")
+    new_ledger = not os.path.exists(ledger_path)
+    ledger = JobLedger(ledger_path)
+    if new_ledger:
+        # start from the jobs finished before there was a ledger
+        ledger.import_json(os.path.join(path_dirs.meta_dir, "status.json"))
+    return ledger
+
+
+class ContainerReaper:
+    """
+    Records finished tool containers in the job ledger and removes them once
+    they have been finished for longer than the grace period. Runs every
+    interval seconds, or as soon as a tool container dies
+    """
+    def __init__(self, state=None, grace=None, interval=None, **kargs):
+        self.path_dirs = PathDirs(**kargs)
+        self.kargs = kargs
+        self.state = state
+        template = Template(template=self.path_dirs.cfg_file)
+        self.grace = self._seconds(template, 'grace', grace, GRACE)
+        self.interval = self._seconds(template, 'interval', interval,
+                                      INTERVAL)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _seconds(template, option, value, default):
+        if value is not None:
+            return value
+        result = template.option('reaper', option)
+        if result[0]:
+            try:
+                return max(0, int(result[1]))
+            except ValueError:
+                pass
+        return default
+
+    def _on_event(self, event):
+        """ Reaps as soon as a tool container dies """
+        attributes = (event.get('Actor') or {}).get('Attributes') or {}
+        if (event.get('Type') == 'container' and
+                event.get('Action') == 'die' and
+                'vent-plugin' in attributes):
+            self._wake.set()
+
+    def reap(self):
+        """
+        Records every exited tool container in one batch, then removes the
+        ones past the grace period in parallel. Returns the removed ids
+        """
+        state = self.state or State()
+        exited = ExitedTools(state)
+        added = Ledger(**self.kargs).record(FinishedRuns(exited))
+        if added:
+            # keep status.json for anything reading it directly
+            manifest = os.path.join(self.path_dirs.meta_dir, "status.json")
+            with open(manifest, 'a') as outfile:
+                for new_file in added:
+                    json.dump(new_file, outfile)
+                    outfile.write("\n")
+
+        now = time.time()
+        expired = Queue.Queue()
+        for container in exited:
+            finished = TimestampSeconds(
+                container.attrs['State']['FinishedAt'])
+            if finished is None or finished + self.grace <= now:
+                expired.put(container)
+        removed = []
+
+        def remove():
+            while True:
+                try:
+                    container = expired.get(False)
+                except Queue.Empty:
+                    return
+                try:
+                    container.remove()
+                    removed.append(container.id)
+                except Exception:  # pragma: no cover
+                    pass
+
+        threads = [threading.Thread(target=remove) for _ in
+                   range(min(REMOVE_THREADS, expired.qsize()))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return removed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.reap()
+            except Exception:  # pragma: no cover
+                pass
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        """ Starts reaping in the background """
+        if self._thread is None:
+            (self.state or State()).add_listener(self._on_event)
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops reaping in the background """
+        self._stop.set()
+        self._wake.set()
+
+
+def Reaper(**kargs):
+    """ Returns the reaper shared by this process, starting it if needed """
+    global _REAPER, _REAPER_PID
+    pid = os.getpid()
+    with _REAPER_LOCK:
+        if _REAPER is None or _REAPER_PID != pid:
+            _REAPER, _REAPER_PID = ContainerReaper(**kargs).start(), pid
+        return _REAPER
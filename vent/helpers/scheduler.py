@@ -0,0 +1,75 @@
+import threading
+
+try:
+    # python2
+    import Queue
+except ImportError:  # pragma: no cover
+    # python3
+    import queue as Queue
+
+
+class PhaseScheduler:
+    """
+    Runs phases of work, each in its own thread as soon as the phases it comes
+    after are done, so phases that don't depend on each other run at the same
+    time. Whoever is waiting is woken up as each phase finishes rather than
+    polling for it
+    """
+    def __init__(self):
+        # (name, description, function, names of the phases it comes after)
+        self.phases = []
+
+    def add(self, name, description, target, after=(), kwargs=None):
+        """
+        Adds a phase that calls target with kwargs once the phases named in
+        after are done, whether or not they succeeded
+        """
+        self.phases.append((name, description, target, tuple(after),
+                            kwargs or {}))
+        return self
+
+    @staticmethod
+    def _run(name, target, kwargs, finished):
+        try:
+            finished.put((name, (True, target(**kwargs))))
+        except Exception as e:
+            finished.put((name, (False, str(e))))
+
+    def run(self, progress=None):
+        """
+        Runs every phase and returns a dictionary of the name of each one to
+        (True, what it returned) or (False, why it failed). progress is
+        called with the descriptions of the phases done and of the ones
+        running before the first phase starts and after each one finishes
+        """
+        finished = Queue.Queue()
+        waiting = list(self.phases)
+        running = {}
+        results = {}
+        while waiting or running:
+            for phase in list(waiting):
+                name, description, target, after, kwargs = phase
+                if all(dep in results for dep in after):
+                    waiting.remove(phase)
+                    running[name] = description
+                    thread = threading.Thread(target=self._run,
+                                              args=(name, target, kwargs,
+                                                    finished))
+                    thread.daemon = True
+                    thread.start()
+            if not running:
+                # what's left comes after phases that will never be done
+                for name, _, _, after, _ in waiting:
+                    results[name] = (False, "Never ran, comes after: " +
+                                     ', '.join(after))
+                break
+            if progress:
+                progress([phase[1] for phase in self.phases
+                          if phase[0] in results],
+                         [running[name] for name in sorted(running)])
+            name, result = finished.get()
+            del running[name]
+            results[name] = result
+        if progress:
+            progress([phase[1] for phase in self.phases], [])
+        return results
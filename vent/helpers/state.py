@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+
+from docker.errors import NotFound
+from docker.models.containers import Container
+from docker.models.images import Image
+
+from vent.helpers.clients import DockerClient
+
+# labels that containers and images can be looked up by, vent.groups is
+# indexed by each of the groups in it
+INDEXED_LABELS = ('vent', 'vent.name', 'vent.groups', 'vent-plugin', 'file')
+
+# events that change what inspecting a container or an image returns
+CONTAINER_ACTIONS = frozenset(['create', 'start', 'restart', 'die', 'stop',
+                               'kill', 'pause', 'unpause', 'rename', 'update',
+                               'oom', 'health_status'])
+IMAGE_ACTIONS = frozenset(['pull', 'tag', 'untag', 'load', 'import'])
+
+# the shared state, along with the pid of the process that created it since
+# its event thread doesn't survive a fork
+_STATE = None
+_STATE_PID = None
+_STATE_LOCK = threading.Lock()
+
+
+def _labels(attrs):
+    """ Returns the labels of an inspected container or image """
+    config = attrs.get('Config') or {}
+    return config.get('Labels') or {}
+
+
+class _Objects:
+    """ Inspected objects of one kind along with an index of their labels """
+    def __init__(self):
+        self.attrs = {}
+        # maps a label to its values to the ids of the objects that have it,
+        # the None value holds every object with the label
+        self.labels = {}
+
+    def _keys(self, attrs):
+        labels = _labels(attrs)
+        for label in INDEXED_LABELS:
+            if label not in labels:
+                continue
+            yield label, None
+            if label == 'vent.groups':
+                for group in labels[label].split(','):
+                    yield label, group.strip()
+            else:
+                yield label, labels[label]
+
+    def put(self, attrs):
+        self.remove(attrs['Id'])
+        self.attrs[attrs['Id']] = attrs
+        for label, value in self._keys(attrs):
+            self.labels.setdefault(label, {}).setdefault(
+                value, set()).add(attrs['Id'])
+
+    def remove(self, an_id):
+        attrs = self.attrs.pop(an_id, None)
+        if attrs is None:
+            return
+        for label, value in self._keys(attrs):
+            values = self.labels[label]
+            values[value].discard(an_id)
+            if not values[value]:
+                del values[value]
+
+    def find(self, labels):
+        """
+        Returns the attrs of the objects matching every label, a label
+        mapped to None only needs to be present
+        """
+        ids = None
+        for label, value in (labels or {}).items():
+            if label in INDEXED_LABELS:
+                matches = self.labels.get(label, {}).get(value, set())
+            else:
+                matches = set(an_id for an_id, attrs in self.attrs.items()
+                              if label in _labels(attrs) and
+                              (value is None or
+                               _labels(attrs)[label] == value))
+            ids = matches if ids is None else ids & matches
+        if ids is None:
+            return list(self.attrs.values())
+        return [self.attrs[an_id] for an_id in ids]
+
+
+class DockerState:
+    """
+    In-process copy of the containers and images known to the docker daemon.
+    Everything is listed once, after which it's kept current by following the
+    daemon's events, so lookups don't have to ask the daemon. If the event
+    stream ends, for instance because the daemon restarted, everything is
+    listed again on the next lookup
+    """
+    def __init__(self, client=None, events=None):
+        self.client = client
+        # callable returning the events since a timestamp, for tests
+        self._events = events
+        self._lock = threading.Lock()
+        # held while listing so only one thread lists at a time
+        self._sync_lock = threading.Lock()
+        self._containers = _Objects()
+        self._images = _Objects()
+        self._live = False
+        # called with every event after it's applied
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """ Calls callback with every event after it's applied """
+        self._listeners.append(callback)
+
+    def _client(self):
+        if self.client is None:
+            self.client = DockerClient()
+        return self.client
+
+    def _event_stream(self, since):
+        if self._events:
+            return self._events(since)
+        return self._client().events(decode=True, since=since)
+
+    def _sync(self):
+        """ Lists everything and starts following events from before """
+        api = self._client().api
+        since = int(time.time())
+        # start following before listing so nothing is missed in between,
+        # replayed events only inspect something again
+        stream = self._event_stream(since)
+        containers = _Objects()
+        for summary in api.containers(all=True):
+            try:
+                containers.put(api.inspect_container(summary['Id']))
+            except NotFound:  # pragma: no cover
+                pass
+        images = _Objects()
+        for summary in api.images():
+            try:
+                images.put(api.inspect_image(summary['Id']))
+            except NotFound:  # pragma: no cover
+                pass
+        with self._lock:
+            self._containers, self._images = containers, images
+            self._live = True
+        follow = threading.Thread(target=self._follow, args=(stream,))
+        follow.daemon = True
+        follow.start()
+
+    def _follow(self, stream):
+        """ Applies events to the state until the stream ends """
+        try:
+            for event in stream:
+                self.apply(event)
+                for listener in self._listeners:
+                    try:
+                        listener(event)
+                    except Exception:  # pragma: no cover
+                        pass
+        except Exception:  # pragma: no cover
+            pass
+        with self._lock:
+            self._live = False
+
+    def apply(self, event):
+        """ Updates the state from one event of the daemon's event stream """
+        kind = event.get('Type')
+        action = (event.get('Action') or event.get('status') or '')
+        action = action.split(':', 1)[0]
+        an_id = (event.get('Actor') or {}).get('ID') or event.get('id')
+        if not an_id:
+            return
+        api = self._client().api
+        if kind == 'container':
+            if action == 'destroy':
+                with self._lock:
+                    self._containers.remove(an_id)
+            elif action in CONTAINER_ACTIONS:
+                try:
+                    attrs = api.inspect_container(an_id)
+                    with self._lock:
+                        self._containers.put(attrs)
+                except NotFound:
+                    with self._lock:
+                        self._containers.remove(an_id)
+        elif kind == 'image':
+            if action == 'delete' or action in IMAGE_ACTIONS:
+                try:
+                    attrs = api.inspect_image(an_id)
+                    with self._lock:
+                        self._images.put(attrs)
+                except NotFound:
+                    with self._lock:
+                        self._images.remove(an_id)
+
+    def _current(self):
+        if not self._live:
+            with self._sync_lock:
+                if not self._live:
+                    self._sync()
+
+    def containers(self, all=False, labels=None):
+        """
+        Returns containers with the given labels, a dictionary of label to
+        value or to None to only require the label. By default only running
+        containers are returned
+        """
+        self._current()
+        with self._lock:
+            found = self._containers.find(labels)
+        return [Container(attrs=attrs, client=self.client) for attrs in
+                found if all or attrs['State'].get('Running')]
+
+    def images(self, labels=None):
+        """ Returns images with the given labels, see containers """
+        self._current()
+        with self._lock:
+            found = self._images.find(labels)
+        return [Image(attrs=attrs, client=self.client) for attrs in found]
+
+
+def State():
+    """
+    Returns the docker state shared by everything in this process, listing
+    everything the first time
+    """
+    global _STATE, _STATE_PID
+    pid = os.getpid()
+    with _STATE_LOCK:
+        if _STATE is None or _STATE_PID != pid:
+            _STATE, _STATE_PID = DockerState(), pid
+        return _STATE
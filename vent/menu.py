@@ -3,125 +3,134 @@
 
 import curses
 import npyscreen
-import time
 
-from threading import Thread
-
-from vent.api.actions import Action
-from vent.api.plugins import Plugin
-from vent.helpers.meta import Version
+from vent.helpers.imports import ImportObject
 from vent.helpers.paths import PathDirs
-from vent.menus.help import HelpForm
-from vent.menus.main import MainForm
-from vent.menus.tutorial_forms import TutorialAddingFilesForm
-from vent.menus.tutorial_forms import TutorialAddingPluginsForm
-from vent.menus.tutorial_forms import TutorialBackgroundForm
-from vent.menus.tutorial_forms import TutorialBuildingCoresForm
-from vent.menus.tutorial_forms import TutorialGettingSetupForm
-from vent.menus.tutorial_forms import TutorialIntroForm
-from vent.menus.tutorial_forms import TutorialStartingCoresForm
-from vent.menus.tutorial_forms import TutorialTerminologyForm
-from vent.menus.tutorial_forms import TutorialTroubleshootingForm
+from vent.helpers.scheduler import PhaseScheduler
 
 
 class VentApp(npyscreen.NPSAppManaged):
     """ Main menu app for vent CLI """
     keypress_timeout_default = 10
     repo_value = {}
-    paths = PathDirs()
-    first_time = paths.ensure_file(paths.init_file)
-    if first_time[0] and first_time[1] != "exists":
-        npyscreen.NPSAppManaged.STARTING_FORM = "TUTORIALINTRO"
-    else:
-        npyscreen.NPSAppManaged.STARTING_FORM = "MAIN"
+
+    def __init__(self):
+        super(VentApp, self).__init__()
+        # forms are only imported and created once they're switched to, maps
+        # a form's name to the dotted path of its class and its arguments
+        self.lazy_forms = {}
+        self.paths = PathDirs()
+        self.first_time = self.paths.ensure_file(self.paths.init_file)
+        if self.first_time[0] and self.first_time[1] != "exists":
+            self.STARTING_FORM = "TUTORIALINTRO"
+        else:
+            self.STARTING_FORM = "MAIN"
+        self.NEXT_ACTIVE_FORM = self.STARTING_FORM
+
+    def addLazyForm(self, f_id, path, **keywords):
+        """ Adds a form that's created the first time it's switched to """
+        self.lazy_forms[f_id] = (path, keywords)
+
+    def buildForm(self, f_id):
+        """ Creates a form added with addLazyForm if it wasn't yet """
+        if f_id in self.lazy_forms:
+            path, keywords = self.lazy_forms.pop(f_id)
+            self.addForm(f_id, ImportObject(path), **keywords)
+
+    def setNextForm(self, fmid):
+        """ Overridden to create lazily added forms when needed """
+        self.buildForm(fmid)
+        super(VentApp, self).setNextForm(fmid)
 
     def onStart(self):
         """ Override onStart method for npyscreen """
         curses.mousemask(0)
         self.paths.host_config()
+        # the api and the forms are imported here rather than with this
+        # module so starting the console doesn't wait on what isn't shown
+        from vent.helpers.meta import Version
         version = Version()
 
         # setup initial runtime stuff
         if self.first_time[0] and self.first_time[1] != "exists":
+            from vent.api.actions import Action
+            from vent.api.plugins import Plugin
+            from vent.menus.main import MainForm
             plugins = Plugin()
             actions = Action()
-            thr = Thread(target=MainForm.t_status, args=(), kwargs={'core': True})
-            thr.start()
-            while thr.is_alive():
-                npyscreen.notify_wait("Please wait while Vent initializes...1/4",
-                                      title="Setting up things...")
-                time.sleep(1)
-            thr.join()
-            thr = Thread(target=MainForm.t_status, args=(), kwargs={'core': False})
-            thr.start()
-            while thr.is_alive():
-                npyscreen.notify_wait("Please wait while Vent initializes...2/4",
-                                      title="Setting up things...")
-                time.sleep(1)
-            thr.join()
-            thr = Thread(target=plugins.auto_install, args=(), kwargs={})
-            thr.start()
-            while thr.is_alive():
-                npyscreen.notify_wait("Please wait while Vent initializes...3/4",
-                                      title="Setting up things...")
-                time.sleep(1)
-            thr.join()
-            thr = Thread(target=actions.startup, args=(), kwargs={})
-            thr.start()
-            while thr.is_alive():
-                npyscreen.notify_wait("Please wait while Vent initializes...4/4",
-                                      title="Setting up things...")
-                time.sleep(1)
-            thr.join()
+            # the status scans and installing images found locally run at
+            # the same time, only their clones and checkouts take turns on
+            # the working directory under WORKING_DIR_LOCK, and the startup
+            # file is applied after all of them
+            phases = PhaseScheduler()
+            phases.add('core', 'checking core tools', MainForm.t_status,
+                       kwargs={'core': True})
+            phases.add('plugins', 'checking plugins', MainForm.t_status,
+                       kwargs={'core': False})
+            phases.add('install', 'installing images found',
+                       plugins.auto_install)
+            phases.add('startup', 'applying the startup file',
+                       actions.startup, after=('core', 'plugins', 'install'))
+
+            def progress(done, running):
+                npyscreen.notify("Please wait while Vent initializes..." +
+                                 str(len(done)) + "/" +
+                                 str(len(phases.phases)) + "\n" +
+                                 ', '.join(running),
+                                 title="Setting up things...")
+            phases.run(progress=progress)
 
         quit_s = "\t"*4 + "^Q to quit"
         tab_esc = "\t"*4 + "TAB to close menu popup"
-        self.addForm("MAIN",
-                     MainForm,
-                     name="Vent " + version +
-                     "\t\t\t\t\t^T for help" + quit_s + tab_esc,
-                     color="IMPORTANT")
-        self.addForm("HELP",
-                     HelpForm,
-                     name="Help\t\t\t\t\t\t\t\t^T to toggle previous" +
-                     quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALINTRO",
-                     TutorialIntroForm,
-                     name="Vent Tutorial" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALBACKGROUND",
-                     TutorialBackgroundForm,
-                     name="About Vent" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALTERMINOLOGY",
-                     TutorialTerminologyForm,
-                     name="About Vent" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALGETTINGSETUP",
-                     TutorialGettingSetupForm,
-                     name="About Vent" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALBUILDINGCORES",
-                     TutorialBuildingCoresForm,
-                     name="Working with Cores" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALSTARTINGCORES",
-                     TutorialStartingCoresForm,
-                     name="Working with Cores" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALADDINGPLUGINS",
-                     TutorialAddingPluginsForm,
-                     name="Working with Plugins" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALADDINGFILES",
-                     TutorialAddingFilesForm,
-                     name="Files" + quit_s,
-                     color="DANGER")
-        self.addForm("TUTORIALTROUBLESHOOTING",
-                     TutorialTroubleshootingForm,
-                     name="Troubleshooting" + quit_s,
-                     color="DANGER")
+        self.addLazyForm("MAIN",
+                         'vent.menus.main.MainForm',
+                         name="Vent " + version +
+                         "\t\t\t\t\t^T for help" + quit_s + tab_esc,
+                         color="IMPORTANT")
+        self.addLazyForm("HELP",
+                         'vent.menus.help.HelpForm',
+                         name="Help\t\t\t\t\t\t\t\t^T to toggle previous" +
+                         quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALINTRO",
+                         'vent.menus.tutorial_forms.TutorialIntroForm',
+                         name="Vent Tutorial" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALBACKGROUND",
+                         'vent.menus.tutorial_forms.TutorialBackgroundForm',
+                         name="About Vent" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALTERMINOLOGY",
+                         'vent.menus.tutorial_forms.TutorialTerminologyForm',
+                         name="About Vent" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALGETTINGSETUP",
+                         'vent.menus.tutorial_forms.TutorialGettingSetupForm',
+                         name="About Vent" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALBUILDINGCORES",
+                         'vent.menus.tutorial_forms.TutorialBuildingCoresForm',
+                         name="Working with Cores" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALSTARTINGCORES",
+                         'vent.menus.tutorial_forms.TutorialStartingCoresForm',
+                         name="Working with Cores" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALADDINGPLUGINS",
+                         'vent.menus.tutorial_forms.TutorialAddingPluginsForm',
+                         name="Working with Plugins" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALADDINGFILES",
+                         'vent.menus.tutorial_forms.TutorialAddingFilesForm',
+                         name="Files" + quit_s,
+                         color="DANGER")
+        self.addLazyForm("TUTORIALTROUBLESHOOTING",
+                         'vent.menus.tutorial_forms.'
+                         'TutorialTroubleshootingForm',
+                         name="Troubleshooting" + quit_s,
+                         color="DANGER")
+        # the first form is needed right away
+        self.buildForm(self.NEXT_ACTIVE_FORM)
 
     def change_form(self, name):
         """ Changes the form (window) that is displayed """
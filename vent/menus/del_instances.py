@@ -107,11 +107,14 @@ class DeleteForm(npyscreen.ActionForm):
                 try:
                     # update instances for tools remaining
                     section = self.display_to_section[val]
-                    settings_dict = json.loads(self.manifest.option
-                                               (section, 'settings')[1])
-                    settings_dict['instances'] = self.new_instances
-                    self.manifest.set_option(section, 'settings',
-                                             json.dumps(settings_dict))
+                    # instances inheriting settings get them updated
+                    # through the section they inherit from
+                    if not self.manifest.option(section, 'inherits')[0]:
+                        settings_dict = json.loads(self.manifest.option
+                                                   (section, 'settings')[1])
+                        settings_dict['instances'] = self.new_instances
+                        self.manifest.set_option(section, 'settings',
+                                                 json.dumps(settings_dict))
                     # check if tool name doesn't need to be shifted because
                     # it's already correct
                     identifier = str(shift_num) if shift_num != 1 else ''
@@ -127,12 +130,8 @@ class DeleteForm(npyscreen.ActionForm):
                         new_name = re.split(r'[0-9]', prev_name)[0] + \
                             identifier
                         self.manifest.set_option(section, 'name', new_name)
-                        # copy new contents into shifted version
-                        self.manifest.add_section(new_section)
-                        for val_pair in self.manifest.section(section)[1]:
-                            self.manifest.set_option(new_section, val_pair[0],
-                                                     val_pair[1])
-                        self.manifest.del_section(section)
+                        # move contents into shifted version
+                        self.manifest.rename_section(section, new_section)
                         if run:
                             to_update.append({'name': new_name,
                                               'branch': t[1],
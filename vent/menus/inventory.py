@@ -15,19 +15,22 @@ class InventoryForm(npyscreen.FormBaseNew):
         # get list of all possible group views to display
         self.views = deque()
         possible_groups = set()
-        manifest = Template(self.api_action.plugin.manifest)
         if self.action['cores']:
-            tools = self.api_action.inventory(choices=['core'])[1]['core']
+            choice = 'core'
         else:
-            tools = self.api_action.inventory(choices=['tools'])[1]['tools']
-        for tool in tools:
-            groups = manifest.option(tool, 'groups')[1].split(',')
+            choice = 'tools'
+        inventory = self.api_action.inventory(choices=[choice, 'groups'])[1]
+        for tool in inventory[choice]:
+            groups = (inventory['groups'][tool] or '').split(',')
             for group in groups:
                 # don't do core because that's the purpose of all in views
                 if group != '' and group != 'core':
                     possible_groups.add(group)
         self.views += possible_groups
         self.views.append('all groups')
+        self.manifest = Template(self.api_action.plugin.manifest)
+        # maps the line of each tool displayed to its section
+        self.tool_lines = {}
         super(InventoryForm, self).__init__(*args, **keywords)
 
     def quit(self, *args, **kwargs):
@@ -38,22 +41,16 @@ class InventoryForm(npyscreen.FormBaseNew):
         group = self.views.popleft()
         new_display = []
         new_display.append('Tools for group ' + group + ' found:')
-        manifest = Template(self.api_action.plugin.manifest)
-        cur_repo = ''
+        # sections in the group, from the manifest's index of groups
+        members = set(self.manifest.group_members(group)[1])
         for i in range(1, len(self.all_tools) - 1):
             val = self.all_tools[i]
             # get repo val
             if val.startswith("  Plugin:"):
                 new_display.append(val)
-                cur_repo = val.split(':', 1)[1].strip()
             # determine if tool should be displayed in this group
-            elif val.startswith("    ") and not val.startswith("      "):
-                name = val.strip()
-                constraints = {"repo": cur_repo, "name": name}
-                t_section = self.api_action.p_helper \
-                            .constraint_options(constraints, [])[0]
-                t_section = t_section.keys()[0]
-                if group in manifest.option(t_section, 'groups')[1].split(','):
+            elif i in self.tool_lines:
+                if self.tool_lines[i] in members:
                     new_display += self.all_tools[i:i+5]
             elif val == '':
                 new_display.append(val)
@@ -79,6 +76,8 @@ class InventoryForm(npyscreen.FormBaseNew):
                                                                 'built',
                                                                 'running',
                                                                 'enabled'])
+        # sections of the tools displayed, in the order they are
+        shown = []
         if response[0]:
             inventory = response[1]
             if len(inventory['repos']) == 0:
@@ -102,6 +101,7 @@ class InventoryForm(npyscreen.FormBaseNew):
                         t_name = tool.split(":")
                         if (t_name[0] == repo_name[0] and
                            t_name[1] == repo_name[1]):
+                            shown.append(tool)
                             s_value += "    " + tools[tool] + "\n      Built: "
                             s_value += inventory['built'][tool] + "\n"
                             s_value += "      Enabled: "
@@ -117,4 +117,8 @@ class InventoryForm(npyscreen.FormBaseNew):
             value += " retrieval:\n" + str(response[1])
             value += "\nPlease see vent.log for more details."
         self.all_tools = value.split("\n")
+        shown = iter(shown)
+        for i, val in enumerate(self.all_tools):
+            if val.startswith("    ") and not val.startswith("      "):
+                self.tool_lines[i] = next(shown, None)
         self.display_val = self.add(npyscreen.Pager, values=value.split("\n"))
@@ -1,33 +1,160 @@
 import npyscreen
+import threading
+
+try:
+    # python2
+    import Queue
+except ImportError:  # pragma: no cover
+    # python3
+    import queue as Queue
 
 from vent.api.actions import Action
 
 
+class LogPager(npyscreen.Pager):
+    """ Pager that asks for older lines when scrolled up past the first """
+    on_top = None
+
+    def h_scroll_line_up(self, input):
+        if self.start_display_at <= 0 and self.on_top:
+            self.on_top()
+        super(LogPager, self).h_scroll_line_up(input)
+
+    def h_scroll_page_up(self, input):
+        if self.start_display_at <= 0 and self.on_top:
+            self.on_top()
+        super(LogPager, self).h_scroll_page_up(input)
+
+
 class LogsForm(npyscreen.FormBaseNew):
     """ Logs form for the Vent CLI """
     def quit(self, *args, **kwargs):
         """ Overridden to switch back to MAIN form """
+        # the form is created again next time, so stop fetching for this one
+        self.requests.put(('stop', None))
         self.parentApp.switchForm('MAIN')
 
+    def fetch_logs(self):
+        """
+        Fetches logs in the background as while_waiting asks for them, so
+        the form never waits on docker. Only this thread uses the cursors
+        """
+        cursors = []
+        while True:
+            request, index = self.requests.get()
+            if request == 'stop':
+                return
+            try:
+                if request == 'containers':
+                    cursors = self.action.log_cursors()
+                    self.results.put(('containers', None,
+                                      [cursor.name for cursor in cursors], 0))
+                    continue
+                cursor = cursors[index]
+                added = 0
+                if request == 'show' and not cursor.loaded:
+                    cursor.tail()
+                elif request == 'older':
+                    added = cursor.older()
+                elif request == 'newer':
+                    cursor.newer()
+                self.results.put(('lines', index, cursor.text(), added))
+            except Exception as e:  # pragma: no cover
+                self.results.put(('error', index, str(e), 0))
+
+    def request(self, request, index=None):
+        self.pending += 1
+        self.requests.put((request, index))
+
+    def next_container(self, *args, **kwargs):
+        """ Show the logs of the next container """
+        if self.names:
+            self.current = (self.current + 1) % len(self.names)
+            self.logs_mle.values = ['Fetching logs, please wait...']
+            self.logs_mle.start_display_at = 0
+            self.request('show', self.current)
+            self.show_title()
+
+    def toggle_follow(self, *args, **kwargs):
+        """ Toggle adding new lines to the logs shown as they're logged """
+        self.follow = not self.follow
+        self.show_title()
+
+    def load_older(self):
+        """ Show a page of lines from before the ones shown """
+        if self.names and not self.pending:
+            self.request('older', self.current)
+
+    def show_title(self):
+        if self.names:
+            value = (self.names[self.current] + ' (' +
+                     str(self.current + 1) + '/' + str(len(self.names)) +
+                     ')')
+            if self.follow:
+                value += ', following'
+            self.title.value = value
+            self.title.display()
+
+    def while_waiting(self):
+        """ Show the logs fetched since the last time """
+        while True:
+            try:
+                kind, index, value, added = self.results.get(False)
+            except Queue.Empty:
+                break
+            self.pending -= 1
+            if kind == 'containers':
+                self.names = value
+                if self.names:
+                    self.request('show', self.current)
+                    self.show_title()
+                else:
+                    self.logs_mle.values = ['No Vent containers were found.']
+            elif index != self.current:
+                # the container shown changed since this was asked for
+                continue
+            elif kind == 'error':
+                msg = ("There was an issue retrieving logs for Vent "
+                       "containers: ")
+                self.logs_mle.values = [msg, value,
+                                        "Please see vent.log for more "
+                                        "details."]
+            else:
+                at_end = (self.logs_mle.start_display_at + self.lines_shown
+                          >= len(self.logs_mle.values))
+                self.logs_mle.values = value
+                # keep the lines shown where they were when older lines
+                # are added above them, or keep up with new ones
+                self.logs_mle.start_display_at += added
+                if self.follow and at_end:
+                    self.logs_mle.h_show_end(None)
+        if self.follow and self.names and not self.pending:
+            self.request('newer', self.current)
+        self.logs_mle.display()
+
     def create(self):
         """ Override method for creating FormBaseNew form """
-        self.add_handlers({"^T": self.quit, "^Q": self.quit})
-        self.add(npyscreen.TitleFixedText, name='Logs:', value='')
+        self.add_handlers({"^T": self.quit, "^Q": self.quit,
+                           "^V": self.next_container,
+                           "^F": self.toggle_follow})
+        self.title = self.add(npyscreen.TitleFixedText, name='Logs:',
+                              value='', begin_entry_at=10)
+        self.add(npyscreen.FixedText, editable=False,
+                 value='^V next container, ^F follow new lines, scroll up '
+                       'for older lines')
         msg = 'Checking for container logs, please wait...'
-        self.logs_mle = self.add(npyscreen.Pager,
-                                 values=[msg])
+        self.logs_mle = self.add(LogPager, values=[msg])
+        self.logs_mle.on_top = self.load_older
+        self.lines_shown = self.logs_mle.height
         self.action = Action()
-        response = self.action.logs()
-        if response[0]:
-            value = "Logs for each Vent container found:\n"
-            logs = response[1]
-            for container in logs:
-                value += "\n Container: "+container+"\n"
-                for log in logs[container]:
-                    value += "    "+log+"\n"
-                value += "\n"
-            self.logs_mle.values = value.split("\n")
-        else:
-            msg = "There was an issue retrieving logs for Vent containers: "
-            self.logs_mle.values = [msg, str(response[1]),
-                                    "Please see vent.log for more details."]
+        # logs are fetched a page at a time, only for the container shown
+        self.requests = Queue.Queue()
+        self.results = Queue.Queue()
+        self.pending = 0
+        self.names = []
+        self.current = 0
+        self.follow = False
+        thread = threading.Thread(target=self.fetch_logs)
+        thread.daemon = True
+        thread.start()
+        self.request('containers')
@@ -10,6 +10,7 @@ from threading import Thread
 
 from vent.api.actions import Action
 from vent.api.menu_helpers import MenuHelper
+from vent.api.templates import Template
 from vent.helpers.meta import Containers
 from vent.helpers.meta import Cpu
 from vent.helpers.meta import DropLocation
@@ -18,22 +19,19 @@ from vent.helpers.meta import Images
 from vent.helpers.meta import Jobs
 from vent.helpers.meta import Timestamp
 from vent.helpers.meta import Uptime
+from vent.helpers.dashboard import StatusAggregator
+from vent.helpers.imports import ImportObject
 from vent.helpers.logs import Logger
 from vent.helpers.paths import PathDirs
-from vent.menus.add import AddForm
-from vent.menus.ntap import CreateNTap
-from vent.menus.ntap import DeleteNTap
-from vent.menus.ntap import ListNTap
-from vent.menus.ntap import NICsNTap
-from vent.menus.ntap import StartNTap
-from vent.menus.ntap import StopNTap
-from vent.menus.backup import BackupForm
-from vent.menus.editor import EditorForm
-from vent.menus.inventory_forms import InventoryCoreToolsForm
-from vent.menus.inventory_forms import InventoryToolsForm
-from vent.menus.logs import LogsForm
-from vent.menus.services import ServicesForm
-from vent.menus.tools import ToolForm
+from vent.helpers.reaper import Reaper
+
+# seconds between refreshes of each metric on the dashboard, the tool
+# statuses check every plugin repo so they are refreshed the least often
+DASHBOARD_INTERVALS = {'containers': 2,
+                       'core': 60,
+                       'plugins': 60,
+                       'jobs': 5,
+                       'drop_location': 5}
 
 
 class MainForm(npyscreen.FormBaseNewWithMenus):
@@ -103,79 +101,100 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
         self.addfield.display()
         self.addfield2.value = Uptime()
         self.addfield2.display()
-        self.addfield3.value = str(len(Containers()))+" running"
-        if len(Containers()) > 0:
-            self.addfield3.labelColor = "GOOD"
-        else:
-            self.addfield3.labelColor = "DEFAULT"
-        self.addfield3.display()
+
+        # the tool statuses are gotten again as soon as the plugin manifest
+        # changes, only reading the changes appended to its journal
+        changed = self.manifest.refresh()
+        if changed and changed[1]:
+            self.dashboard.expire('core', 'plugins')
+
+        # everything else is read from what the status aggregator last
+        # published, metrics it hasn't gotten yet are left as they are
+        status = self.dashboard.snapshot()
+        if 'containers' in status:
+            self.addfield3.value = str(status['containers']) + " running"
+            if status['containers'] > 0:
+                self.addfield3.labelColor = "GOOD"
+            else:
+                self.addfield3.labelColor = "DEFAULT"
+            self.addfield3.display()
 
         # update core tool status
-        self.addfield5.value, values = MainForm.t_status(True)
-        if values[0] + values[1] == 0:
-            color = "DANGER"
-            self.addfield4.labelColor = "CAUTION"
-            self.addfield4.value = "Idle"
-        elif values[0] >= int(values[2]):
-            color = "GOOD"
-            self.addfield4.labelColor = color
-            self.addfield4.value = "Ready to start jobs"
-        else:
-            color = "CAUTION"
-            self.addfield4.labelColor = color
-            self.addfield4.value = "Ready to start jobs"
-        self.addfield5.labelColor = color
+        if 'core' in status:
+            self.addfield5.value, values = status['core']
+            if values[0] + values[1] == 0:
+                color = "DANGER"
+                self.addfield4.labelColor = "CAUTION"
+                self.addfield4.value = "Idle"
+            elif values[0] >= int(values[2]):
+                color = "GOOD"
+                self.addfield4.labelColor = color
+                self.addfield4.value = "Ready to start jobs"
+            else:
+                color = "CAUTION"
+                self.addfield4.labelColor = color
+                self.addfield4.value = "Ready to start jobs"
+            self.addfield5.labelColor = color
 
         # update plugin tool status
-        plugin_str, values = MainForm.t_status(False)
-        plugin_str += ", " + str(values[3]) + " plugin(s) installed"
-        self.addfield6.value = plugin_str
+        if 'plugins' in status:
+            plugin_str, values = status['plugins']
+            plugin_str += ", " + str(values[3]) + " plugin(s) installed"
+            self.addfield6.value = plugin_str
 
         # get jobs
-        jobs = Jobs()
-
-        # number of jobs, number of tool containers
-        self.addfield7.value = str(jobs[0]) + " jobs running (" + str(jobs[1])
-        self.addfield7.value += " tool containers), " + str(jobs[2])
-        self.addfield7.value += " completed jobs"
-
-        if jobs[0] > 0:
-            self.addfield4.labelColor = "GOOD"
-            self.addfield4.value = "Processing jobs"
-            self.addfield7.labelColor = "GOOD"
-        else:
-            self.addfield7.labelColor = "DEFAULT"
+        if 'jobs' in status:
+            jobs = status['jobs']
+
+            # number of jobs, number of tool containers
+            self.addfield7.value = str(jobs[0]) + " jobs running ("
+            self.addfield7.value += str(jobs[1]) + " tool containers), "
+            self.addfield7.value += str(jobs[2]) + " completed jobs"
+
+            if jobs[0] > 0:
+                self.addfield4.labelColor = "GOOD"
+                self.addfield4.value = "Processing jobs"
+                self.addfield7.labelColor = "GOOD"
+            else:
+                self.addfield7.labelColor = "DEFAULT"
         self.addfield4.display()
         self.addfield5.display()
         self.addfield6.display()
         self.addfield7.display()
 
         # if file drop location changes deal with it
-        logger = Logger(__name__)
-        status = (False, None)
-        if self.file_drop.value != DropLocation()[1]:
-            logger.info("Starting: file drop restart")
-            try:
-                self.file_drop.value = DropLocation()[1]
-                logger.info("Path given: " + str(self.file_drop.value))
-                # restart if the path is valid
-                if DropLocation()[0]:
-                    status = self.api_action.clean(name='file_drop')
-                    status = self.api_action.prep_start(name='file_drop')
-                else:
-                    logger.error("file drop path name invalid" +
-                                 DropLocation()[1])
-                if status[0]:
-                    tool_d = status[1]
-                    status = self.api_action.start(tool_d)
-                    logger.info("Status of file drop restart: " +
-                                str(status[0]))
-            except Exception as e:  # pragma no cover
-                logger.error("file drop restart failed with error: " + str(e))
-            logger.info("Finished: file drop restart")
+        drop_location = status.get('drop_location')
+        if (drop_location is not None and
+                self.file_drop.value != drop_location[1]):
+            self.restart_file_drop(drop_location)
         self.file_drop.display()
         return
 
+    def restart_file_drop(self, drop_location):
+        """ Restart the file drop tool watching a new location """
+        logger = Logger(__name__)
+        status = (False, None)
+        logger.info("Starting: file drop restart")
+        try:
+            self.file_drop.value = drop_location[1]
+            logger.info("Path given: " + str(self.file_drop.value))
+            # restart if the path is valid
+            if drop_location[0]:
+                status = self.api_action.clean(name='file_drop')
+                status = self.api_action.prep_start(name='file_drop')
+            else:
+                logger.error("file drop path name invalid" +
+                             drop_location[1])
+            if status[0]:
+                tool_d = status[1]
+                status = self.api_action.start(tool_d)
+                logger.info("Status of file drop restart: " +
+                            str(status[0]))
+                self.dashboard.expire('containers', 'jobs')
+        except Exception as e:  # pragma no cover
+            logger.error("file drop restart failed with error: " + str(e))
+        logger.info("Finished: file drop restart")
+
     @staticmethod
     def core_tools(action):
         """ Perform actions for core tools """
@@ -220,7 +239,12 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
         return
 
     def add_form(self, form, form_name, form_args):
-        """ Add new form and switch to it """
+        """
+        Add new form and switch to it, form can be the dotted path of its
+        class so its module is only imported when it's first used
+        """
+        if isinstance(form, str):
+            form = ImportObject(form)
         self.parentApp.addForm(form_name, form, **form_args)
         self.parentApp.change_form(form_name)
         return
@@ -236,7 +260,7 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
 
     def perform_action(self, action):
         """ Perform actions in the api from the CLI """
-        form = ToolForm
+        form = 'vent.menus.tools.ToolForm'
         s_action = action.split("_")[0]
         if 'core' in action:
             form_action = s_action + ' (only core tools are shown)'
@@ -284,39 +308,39 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
             form_args['names'].append('save_configure')
             form_args['names'].append('restart_tools')
         if action == 'add':
-            form = AddForm
+            form = 'vent.menus.add.AddForm'
             forms = ['ADD', 'ADDOPTIONS', 'CHOOSETOOLS']
             form_args['name'] = "Add plugins"
             form_args['name'] += "\t"*6 + "^Q to quit"
         elif action == "inventory":
-            form = InventoryToolsForm
+            form = 'vent.menus.inventory_forms.InventoryToolsForm'
             forms = ['INVENTORY']
             form_args = {'color': "STANDOUT", 'name': "Inventory of tools"}
         elif action == 'logs':
-            form = LogsForm
+            form = 'vent.menus.logs.LogsForm'
             forms = ['LOGS']
             form_args = {'color': "STANDOUT", 'name': "Logs"}
         elif action == 'services_core':
-            form = ServicesForm
+            form = 'vent.menus.services.ServicesForm'
             forms = ['SERVICES']
             form_args = {'color': "STANDOUT",
                          'name': "Core Services",
                          'core': True}
         elif action == 'services':
-            form = ServicesForm
+            form = 'vent.menus.services.ServicesForm'
             forms = ['SERVICES']
             form_args = {'color': "STANDOUT",
                          'name': "Plugin Services",
                          'core': False}
         elif action == 'services_external':
-            form = ServicesForm
+            form = 'vent.menus.services.ServicesForm'
             forms = ['SERVICES']
             form_args = {'color': "STANDOUT",
                          'name': "External Services",
                          'core': False,
                          'external': True}
         elif action == "inventory_core":
-            form = InventoryCoreToolsForm
+            form = 'vent.menus.inventory_forms.InventoryCoreToolsForm'
             forms = ['COREINVENTORY']
             form_args = {'color': "STANDOUT",
                          'name': "Inventory of core tools"}
@@ -372,7 +396,7 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
                          'save_configure': self.api_action.save_configure,
                          'restart_tools': self.api_action.restart_tools,
                          'vent_cfg': True}
-            add_kargs = {'form': EditorForm,
+            add_kargs = {'form': 'vent.menus.editor.EditorForm',
                          'form_name': 'CONFIGUREVENT',
                          'form_args': form_args}
             self.add_form(**add_kargs)
@@ -410,7 +434,7 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
                          'name': "Pick a version to restore from" + "\t"*8 +
                                  "^T to toggle main",
                          'color': 'CONTROL'}
-            add_kargs = {'form': BackupForm,
+            add_kargs = {'form': 'vent.menus.backup.BackupForm',
                          'form_name': 'CHOOSEBACKUP',
                          'form_args': form_args}
             self.add_form(**add_kargs)
@@ -428,12 +452,12 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
             output = self.api_action.tool_status_output('network_tap')
 
             # create a dict with substring as keys and forms as values
-            ntap_form = {'create': CreateNTap,
-                         'delete': DeleteNTap,
-                         'list': ListNTap,
-                         'nics': NICsNTap,
-                         'start': StartNTap,
-                         'stop': StopNTap}
+            ntap_form = {'create': 'vent.menus.ntap.CreateNTap',
+                         'delete': 'vent.menus.ntap.DeleteNTap',
+                         'list': 'vent.menus.ntap.ListNTap',
+                         'nics': 'vent.menus.ntap.NICsNTap',
+                         'start': 'vent.menus.ntap.StartNTap',
+                         'stop': 'vent.menus.ntap.StopNTap'}
             if output[0]:
                 if output[1]:
                     notify_confirm(output[1])
@@ -462,6 +486,29 @@ class MainForm(npyscreen.FormBaseNewWithMenus):
                            wrap=True)
             MainForm.exit()
 
+        # finished tool containers are recorded and removed in the
+        # background rather than while the jobs count is updated
+        Reaper()
+
+        # kept up to date with the manifest's journal by while_waiting
+        self.manifest = Template(template=self.api_action.plugin.manifest)
+
+        # what the dashboard shows is gotten in the background, each at its
+        # own pace, so waiting on keypresses never waits on docker or git. The
+        # tool statuses may clone and check out repos in the working
+        # directory, so they share a thread
+        self.dashboard = StatusAggregator({
+            'containers': (lambda: len(Containers()),
+                           DASHBOARD_INTERVALS['containers']),
+            'core': (lambda: MainForm.t_status(True),
+                     DASHBOARD_INTERVALS['core']),
+            'plugins': (lambda: MainForm.t_status(False),
+                        DASHBOARD_INTERVALS['plugins']),
+            'jobs': (Jobs, DASHBOARD_INTERVALS['jobs']),
+            'drop_location': (DropLocation,
+                              DASHBOARD_INTERVALS['drop_location'])},
+            together=[('core', 'plugins')]).start()
+
         self.add_handlers({"^T": self.help_form, "^Q": MainForm.exit})
         # all forms that can toggle view by group
         self.view_togglable = ['inventory', 'remove', 'update', 'enable',
@@ -39,11 +39,12 @@ class ToolForm(npyscreen.ActionForm):
         possible_groups = set()
         manifest = Template(self.api_action.plugin.manifest)
         if self.action['cores']:
-            tools = self.api_action.inventory(choices=['core'])[1]['core']
+            choice = 'core'
         else:
-            tools = self.api_action.inventory(choices=['tools'])[1]['tools']
-        for tool in tools:
-            groups = manifest.option(tool, 'groups')[1].split(',')
+            choice = 'tools'
+        inventory = self.api_action.inventory(choices=[choice, 'groups'])[1]
+        for tool in inventory[choice]:
+            groups = (inventory['groups'][tool] or '').split(',')
             for group in groups:
                 # don't do core because that's the purpose of all in views
                 if group != '' and group != 'core':
@@ -62,10 +63,11 @@ class ToolForm(npyscreen.ActionForm):
         """ Toggles the view between different groups """
         group_to_display = self.views.popleft()
         self.cur_view.value = group_to_display
+        # sections in the group, from the manifest's index of groups
+        members = set(self.manifest.group_members(group_to_display)[1])
         for repo in self.tools_tc:
             for tool in self.tools_tc[repo]:
-                t_groups = self.manifest.option(tool, 'groups')[1]
-                if group_to_display not in t_groups and \
+                if tool not in members and \
                         group_to_display != 'all groups':
                     self.tools_tc[repo][tool].value = False
                     self.tools_tc[repo][tool].hidden = True
@@ -274,6 +276,13 @@ class ToolForm(npyscreen.ActionForm):
                         i += 3
         return
 
+    def build_progress(self, tag, done, steps, timings):
+        """ Keeps how far along the image being built is for the popup """
+        progress = tag + ": " + str(done) + "/" + str(steps) + " steps"
+        if timings:
+            progress += ", slowest took " + str(int(max(timings))) + "s"
+        self.progress_str = progress + "\n"
+
     def on_ok(self):
         """
         Take the tool selections and perform the provided action on them
@@ -302,7 +311,8 @@ class ToolForm(npyscreen.ActionForm):
                 for entry in info:
                     info_str = entry[0] + ": " + entry[1] + "\n" + info_str
                 if self.action['action_name'] != 'configure':
-                    npyscreen.notify_wait(info_str, title=title)
+                    npyscreen.notify_wait(self.progress_str + info_str,
+                                          title=title)
                     time.sleep(1)
 
             thr.join()
@@ -320,6 +330,7 @@ class ToolForm(npyscreen.ActionForm):
                 pass
             return
 
+        self.progress_str = ""
         if self.action['type'] == 'images':
             originals = Images()
         else:
@@ -397,6 +408,9 @@ class ToolForm(npyscreen.ActionForm):
                         # add core recognition
                         if self.action['cores']:
                             kargs.update({'groups': 'core'})
+                        # show how far along each image is as it builds
+                        if self.action['action_name'] == 'build':
+                            kargs.update({'progress': self.build_progress})
                         # use latest version for update, not necessarily
                         # version in manifest
                         if self.action['action_name'] == 'update':